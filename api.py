@@ -1,5 +1,6 @@
 """Flask Api Service"""
 import argparse
+import datetime
 import json
 import warnings
 
@@ -7,6 +8,15 @@ from flask import Flask, request
 from waitress import serve
 
 from model.data_extraction import DataExtractor
+from model.helpers import Deadline
+from model.history import RateHistory, TARGET_COLUMNS
+from model.memory import MemoryAccounting, MemoryBudget
+from model.parallel import ParallelExtractor
+from model.recycler import ModelRecycler
+from model.reloader import ContextReloader
+from utils.admission import AdmissionController
+from utils.profiler import SamplingProfiler
+from utils import serialization
 
 warnings.filterwarnings('ignore')
 
@@ -17,9 +27,50 @@ parser.add_argument('--query_key', default='text', help="default query key name
 parser.add_argument('--debug', action="store_true", help="enable debugging")
 parser.add_argument('--logging', action="store_true", help="enable logging")
 parser.add_argument('--log_file', default='logs.txt', help="log file name")
+parser.add_argument('--context_file', default=None, help="context json file name")
+parser.add_argument('--relation_model', default=None,
+                    help="directory of trained relation parser used instead of English model and contexts")
+parser.add_argument('--context_sets', default=None,
+                    help="additional named context sets as comma separated name=file pairs, matched against the same "
+                         "parse as the default set when requested with 'sets' query parameter")
+parser.add_argument('--watch_contexts', default=0, type=float,
+                    help="reload contexts when context file changes, polling interval in seconds (0 - disabled)")
+parser.add_argument('--admin_token', default=None, help="token for admin endpoints (disabled if not set)")
+parser.add_argument('--max_in_flight', default=4, type=int, help="maximum number of concurrently running analyses")
+parser.add_argument('--max_queue', default=16, type=int, help="maximum number of requests waiting for analysis")
+parser.add_argument('--queue_timeout', default=10.0, type=float, help="maximum seconds request waits for analysis")
+parser.add_argument('--max_text_length', default=0, type=int, help="maximum length of one text (0 - unlimited)")
+parser.add_argument('--max_batch_size', default=0, type=int, help="maximum number of texts in POST (0 - unlimited)")
+parser.add_argument('--max_body_size', default=64, type=float,
+                    help="maximum size of decompressed POST body in MB (0 - unlimited)")
+parser.add_argument('--request_timeout', default=0, type=float,
+                    help="seconds after which analysis returns partial results (0 - unlimited), "
+                         "requests may ask for shorter timeout with 'timeout' query parameter")
+parser.add_argument('--history', default=None,
+                    help="rate history database for /history queries (see utils.rate_history), disabled if not set")
+parser.add_argument('--memory_accounting', action="store_true",
+                    help="trace memory allocated by extraction stages, reported on /stats (slow, for diagnostics)")
+parser.add_argument('--request_memory', default=0, type=float,
+                    help="MB process memory may grow by during one request, requests over it get 413 (0 - unlimited), "
+                         "growth is measured for the whole process, so it needs --max_in_flight 1")
+parser.add_argument('--max_profile_seconds', default=60, type=float,
+                    help="maximum duration of profiling started with /admin/profile")
+parser.add_argument('--recycle_requests', default=0, type=int,
+                    help="reload spacy model after this many requests to drop grown vocab (0 - never)")
+parser.add_argument('--recycle_strings', default=0, type=int,
+                    help="reload spacy model when its StringStore has more strings (0 - never)")
+parser.add_argument('--recycle_memory', default=0, type=int,
+                    help="reload spacy model when process resident memory in MB is over the limit (0 - never)")
+parser.add_argument('--recycle_interval', default=60, type=float, help="minimum seconds between model reloads")
+parser.add_argument('--parallel_processes', default=0, type=int,
+                    help="number of processes analysing chunks of very large texts in parallel (0 - disabled)")
+parser.add_argument('--parallel_min_length', default=50000, type=int, help="minimum text length for parallel analysis")
+parser.add_argument('--parallel_chunk_size', default=20000, type=int, help="maximum chunk length for parallel analysis")
 
 app = Flask(__name__)
 
+DEFAULT_SET = 'default'
+
 
 @app.route('/', methods=['GET', 'POST'])
 def info():
@@ -27,35 +78,379 @@ def info():
     Gets POST or GET request containing bank news text string or list of strings, analyses them and returns
     json formatted result containing original news text, found bank rate and quantitative easing number if exists.
 
+    POST body may be MessagePack ('Content-Type: application/msgpack') and gzip or zstd compressed
+    ('Content-Encoding'). Response format and compression are negotiated with 'Accept' and 'Accept-Encoding' headers.
+    With 'news' query parameter 'none' echoed news texts are omitted, with a number they are truncated to that many
+    characters, and every result gets 'id' - position of its text in the request.
+
     Returns:
-        response: (list) containing dictionaries with keys: [news, Bank_Rate, QE]
+        response: (list) containing dictionaries with keys: [news, Bank_Rate, QE] and [status] if request has timeout
+        (see DataExtractor.analyse) or, if context sets are requested with 'sets' query parameter, dictionaries with
+        keys: [news, parse_seconds, sets] (see DataExtractor.analyse_sets)
 
     """
-    response = json.dumps({}, ensure_ascii=False)
+    deadline = request_deadline()
+    names = request.args.get('sets')
+    if names is not None:
+        names = [name.strip() for name in names.split(',') if name.strip() != '']
+        unknown = [name for name in names if name not in reloaders]
+        if len(names) == 0 or len(unknown) > 0:
+            return json.dumps({'error': f'unknown context sets {unknown}', 'sets': list(reloaders)}), 400
+        if args.relation_model is not None:
+            return json.dumps({'error': 'context sets are not used with relation model'}), 400
+
+    news = request.args.get('news', 'full')
+    if news not in ('full', 'none') and not news.isdigit():
+        return json.dumps({'error': f"news should be 'full', 'none' or a number, got {news}"}), 400
+
+    results = {}
+    texts = None
     if request.method == 'GET':
-        text = request.args.get(args.query_key)
-        if text is not None:
-            results = data_extractor.analyse(text)
-            response = json.dumps(results, ensure_ascii=False)
+        texts = request.args.get(args.query_key)
 
     elif request.method == 'POST':
-        data = json.loads(request.data.decode())
+        encoding = request.headers.get('Content-Encoding', 'identity').strip().lower()
+        if encoding not in serialization.content_encodings() + ['identity', 'x-gzip']:
+            return json.dumps({'error': f'unsupported content encoding {encoding}'}), 415
+        try:
+            body = serialization.decompress(request.get_data(), encoding, int(args.max_body_size * 2 ** 20))
+            data = serialization.loads(body, request.mimetype)
+        except serialization.BodyTooLarge as error:
+            return json.dumps({'error': str(error)}), 413
+        except (ValueError, OSError, EOFError) as error:
+            return json.dumps({'error': f'invalid request body: {error}'}), 400
         if data is not None and isinstance(data, list):
-            results = data_extractor.analyse(data)
-            response = json.dumps(results, ensure_ascii=False)
+            texts = data
+
+    if texts is not None:
+        error = check_limits(texts)
+        if error is not None:
+            return error
+
+        if not admission.acquire():
+            return json.dumps({'error': 'service is overloaded'}), 503, {'Retry-After': str(admission.retry_after())}
+        generation = recycler.acquire()
+        try:
+            memory_budget = MemoryBudget.growth(int(args.request_memory * 2 ** 20)) if args.request_memory > 0 else None
+            # take extractor once, so request finishes on the same contexts even if they are reloaded meanwhile
+            data_extractor = reloader.data_extractor
+            if names is not None:
+                context_sets = {name: reloaders[name].data_extractor for name in names}
+                results = data_extractor.analyse_sets(texts, context_sets, deadline, memory_budget)
+            elif parallel is not None:
+                results = parallel.analyse(data_extractor, texts, deadline, memory_budget)
+            else:
+                results = data_extractor.analyse(texts, deadline, memory_budget)
+            analysed = count_analysed(results)
+            if memory_budget is not None and analysed < len(results):
+                return json.dumps({'error': f'request exceeded memory budget of {args.request_memory} MB after '
+                                            f'{analysed} of {len(results)} texts, send smaller batches',
+                                   'analysed': analysed}), 413
+        finally:
+            admission.release()
+            profiler.request_finished()
+            recycler.release(generation)
+        results = serialization.compact(results, news)
 
     if args.logging:
         with open(args.log_file, 'a') as file:
-            file.write(response + "\n")
-    return response
+            file.write(json.dumps(results, ensure_ascii=False) + "\n")
+    return negotiated_response(results)
+
+
+def negotiated_response(value):
+    """
+    Serializes and compresses response body as requested by 'Accept' and 'Accept-Encoding' headers,
+    json without compression by default.
+
+    Args:
+        value: response object
+
+    Returns:
+        response: (tuple) response body, status and headers
+    """
+    content_type = request.accept_mimetypes.best_match(serialization.content_types(), serialization.JSON)
+    encoding = request.accept_encodings.best_match(serialization.content_encodings())
+    data, encoding = serialization.compress(serialization.dumps(value, content_type), encoding)
+
+    headers = {'Content-Type': content_type, 'Vary': 'Accept, Accept-Encoding'}
+    if encoding is not None:
+        headers['Content-Encoding'] = encoding
+    return data, 200, headers
+
+
+def context_set_files(value):
+    """
+    Parses --context_sets argument
+
+    Args:
+        value: (str) comma separated name=file pairs
+
+    Returns:
+        files: (dict) set names as keys and context file names as values
+    """
+    files = {}
+    for pair in (value or '').split(','):
+        if pair.strip() == '':
+            continue
+        name, separator, context_file = pair.partition('=')
+        assert separator == '=' and name.strip() != '', f'context set {pair} should be given as name=file!'
+        assert name.strip() != DEFAULT_SET, f'context set name {DEFAULT_SET} is reserved for --context_file!'
+        files[name.strip()] = context_file.strip()
+    return files
+
+
+def request_deadline():
+    """
+    Builds deadline of the request from service timeout and request 'timeout' query parameter, whichever is shorter.
+
+    Returns:
+        deadline: (Deadline) request deadline or None if request has no timeout
+    """
+    timeouts = [args.request_timeout] if args.request_timeout > 0 else []
+    try:
+        timeouts.append(float(request.args.get('timeout', 0)))
+    except ValueError:
+        pass
+    timeouts = [timeout for timeout in timeouts if timeout > 0]
+
+    if len(timeouts) == 0:
+        return None
+    return Deadline(min(timeouts))
+
+
+def count_analysed(results):
+    """
+    Args:
+        results: (list) analysis results (see DataExtractor.analyse and DataExtractor.analyse_sets)
+
+    Returns:
+        count: (int) number of leading results which weren't skipped because request was over its memory budget
+    """
+    for index, result in enumerate(results):
+        statuses = [result.get('status')] + [set_result.get('status') for set_result in result.get('sets', {}).values()]
+        if 'memory' in statuses:
+            return index
+    return len(results)
+
+
+def check_limits(texts):
+    """
+    Checks request size limits: number of texts in batch and length of every text.
+
+    Args:
+        texts: (str or list) requested bank news
+
+    Returns:
+        error: (tuple) error response if limits are exceeded else None
+    """
+    if isinstance(texts, list) and 0 < args.max_batch_size < len(texts):
+        return json.dumps({'error': f'batch size {len(texts)} exceeds limit {args.max_batch_size}'}), 413
+
+    if args.max_text_length > 0:
+        for text in texts if isinstance(texts, list) else [texts]:
+            if isinstance(text, str) and len(text) > args.max_text_length:
+                return json.dumps({'error': f'text length {len(text)} exceeds limit {args.max_text_length}'}), 413
+
+    return None
+
+
+@app.route('/stats', methods=['GET'])
+def stats():
+    """
+    Returns:
+        response: (dict) admission statistics: in flight and waiting requests, shed counts and queue waiting times,
+        and memory allocated by extraction stages in 'memory' if memory accounting is enabled, and vocab size,
+        resident memory and model recycling statistics in 'model' (see ModelRecycler.stats)
+
+    """
+    response = admission.stats()
+    response['model'] = recycler.stats()
+    memory = reloader.data_extractor.memory
+    if memory is not None:
+        response['memory'] = memory.report()
+    return json.dumps(response)
+
+
+@app.route('/history/as_of', methods=['GET'])
+def history_as_of():
+    """
+    Answers value of target ('target' query parameter, Bank_Rate by default) in force on 'date' (ISO date) from rate
+    history without analysing statements.
+
+    Returns:
+        response: (dict) with keys [date, value, url, key, precision] of the latest meeting on or before the date,
+        404 if no meeting is known
+
+    """
+    error = check_history_query(['date'])
+    if error is not None:
+        return error
+
+    record = history.as_of(request.args['date'], request.args.get('target', 'Bank_Rate'))
+    if record is None:
+        return json.dumps({'error': f'no {request.args.get("target", "Bank_Rate")} known before '
+                                    f'{request.args["date"]}'}), 404
+    return json.dumps(record, ensure_ascii=False)
+
+
+@app.route('/history/range', methods=['GET'])
+def history_range():
+    """
+    Answers values of target ('target' query parameter, Bank_Rate by default) decided on meetings between 'start'
+    and 'end' ISO dates, only changes of the value with 'changes=1'.
+
+    Returns:
+        response: (list) of dictionaries with keys [date, value, url, key, precision] ordered by date
+
+    """
+    error = check_history_query(['start', 'end'])
+    if error is not None:
+        return error
+
+    records = history.range(request.args['start'], request.args['end'], request.args.get('target', 'Bank_Rate'),
+                            request.args.get('changes', '0') in ('1', 'true'))
+    return json.dumps(records, ensure_ascii=False)
+
+
+def check_history_query(dates):
+    """
+    Checks that rate history is enabled and query has valid target and dates
+
+    Args:
+        dates: (list) names of required date query parameters
+
+    Returns:
+        error: (tuple) error response or None
+    """
+    if history is None:
+        return json.dumps({'error': 'rate history is disabled'}), 404
+    if request.args.get('target', 'Bank_Rate') not in TARGET_COLUMNS:
+        return json.dumps({'error': f'target should be one of {list(TARGET_COLUMNS)}'}), 400
+    for name in dates:
+        try:
+            datetime.date.fromisoformat(request.args.get(name, ''))
+        except ValueError:
+            return json.dumps({'error': f'{name} should be ISO date (YYYY-MM-DD)'}), 400
+    return None
+
+
+def authorized():
+    """
+    Checks admin token of the request given in 'X-Admin-Token' header or 'token' query parameter.
+
+    Returns:
+        result: (bool) admin endpoints are enabled and token is correct
+    """
+    token = request.headers.get('X-Admin-Token', request.args.get('token'))
+    return args.admin_token is not None and token == args.admin_token
+
+
+@app.route('/admin/reload', methods=['POST'])
+def reload_contexts():
+    """
+    Validates and builds contexts from context file and swaps them in, spacy model stays shared.
+    Context set is chosen with 'set' query parameter, default set by default.
+
+    Returns:
+        response: (dict) containing keys [set, reloaded, version, context_file, contexts_fingerprint, last_error]
+
+    """
+    if not authorized():
+        return json.dumps({'error': 'forbidden'}), 403
+
+    name = request.args.get('set', DEFAULT_SET)
+    if name not in reloaders:
+        return json.dumps({'error': f'unknown context set {name}', 'sets': list(reloaders)}), 404
+
+    reloaded = reloaders[name].reload()
+    response = dict(reloaders[name].status(), set=name, reloaded=reloaded)
+    return json.dumps(response, ensure_ascii=False), 200 if reloaded else 422
+
+
+@app.route('/admin/recycle', methods=['POST'])
+def recycle_model():
+    """
+    Reloads spacy model of all context sets in background, requests running on the old model are drained.
+    With 'wait=1' response is sent after recycling is finished.
+
+    Returns:
+        response: (dict) model recycling statistics (see ModelRecycler.stats), 409 if recycling is already running
+
+    """
+    if not authorized():
+        return json.dumps({'error': 'forbidden'}), 403
+
+    if not recycler.start('admin'):
+        return json.dumps({'error': 'model recycling is already running'}), 409
+    if request.args.get('wait', '0') in ('1', 'true'):
+        recycler.wait()
+    return json.dumps(recycler.stats())
+
+
+@app.route('/admin/profile', methods=['POST'])
+def profile():
+    """
+    Profiles running service for 'seconds' query parameter seconds or until next 'requests' analysis requests are
+    finished (at most --max_profile_seconds). Only analysis request threads are sampled.
+
+    Returns:
+        response: (str) flame graph compatible collapsed stacks rooted at extraction stages or, with 'format=stages',
+        json with keys [samples, stages] containing fraction of samples of every stage
+
+    """
+    if not authorized():
+        return json.dumps({'error': 'forbidden'}), 403
+
+    try:
+        seconds = min(float(request.args.get('seconds', args.max_profile_seconds)), args.max_profile_seconds)
+        requests = int(request.args['requests']) if 'requests' in request.args else None
+    except ValueError as error:
+        return json.dumps({'error': str(error)}), 400
+
+    if not profiler.profile(seconds, requests):
+        return json.dumps({'error': 'profiling is already running'}), 409
+
+    if request.args.get('format') == 'stages':
+        return json.dumps({'samples': profiler.samples, 'stages': profiler.stage_totals()})
+    return profiler.collapsed(), 200, {'Content-Type': 'text/plain; charset=utf-8'}
 
 
 if __name__ == '__main__':
     args = parser.parse_args()
+    if args.relation_model is not None and args.context_sets is not None:
+        parser.error('--context_sets are not used with --relation_model')
+    if args.request_memory > 0 and args.max_in_flight > 1:
+        # concurrent requests would be charged for each other's memory
+        parser.error('--request_memory measures memory of the whole process and needs --max_in_flight 1')
 
-    data_extractor = DataExtractor()
+    data_extractor = DataExtractor(context_file=args.context_file, relation_model=args.relation_model)
+    if args.memory_accounting:
+        data_extractor.memory = MemoryAccounting()
+        data_extractor.memory.start()
+    reloader = ContextReloader(data_extractor)
+    reloaders = {DEFAULT_SET: reloader}
+    for name, context_file in context_set_files(args.context_sets).items():
+        reloaders[name] = ContextReloader(reloader.data_extractor.share_model(context_file))
+    parallel = None
+    if args.parallel_processes > 0:
+        # workers are forked before any other thread is started
+        parallel = ParallelExtractor(reloader.data_extractor, args.parallel_processes, args.parallel_chunk_size,
+                                     args.parallel_min_length)
+    if args.watch_contexts > 0:
+        for context_reloader in reloaders.values():
+            context_reloader.watch(args.watch_contexts)
+    history = RateHistory(args.history) if args.history is not None else None
+    # parallel workers are restarted with the recycled model too
+    recyclable = list(reloaders.values()) + ([parallel] if parallel is not None else [])
+    recycler = ModelRecycler(recyclable, args.recycle_requests, args.recycle_strings,
+                             args.recycle_memory * 1024 * 1024, args.recycle_interval)
+    admission = AdmissionController(args.max_in_flight, args.max_queue, args.queue_timeout)
+    # sampling thread is started only by /admin/profile
+    profiler = SamplingProfiler(roots=[info])
 
     if args.debug:
         app.run(host=args.port, port=args.port, debug=True)
     else:
-        serve(app.wsgi_app, host=args.host, port=args.port, threads=True)
+        # enough threads for waiting requests to reach admission queue and for fast rejections
+        serve(app.wsgi_app, host=args.host, port=args.port, threads=args.max_in_flight + args.max_queue + 2)
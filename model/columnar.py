@@ -0,0 +1,102 @@
+import multiprocessing
+
+import pandas as pd
+
+from model.tree import SentenceTrees
+
+COLUMNS = ['Bank_Rate', 'QE', 'Bank_Rate_case', 'QE_case', 'status']
+
+_worker = {}
+
+
+def _init_worker(data_extractor):
+    _worker['data_extractor'] = data_extractor
+
+
+def _analyse_chunk(texts):
+    return analyse_chunk(_worker['data_extractor'], texts)
+
+
+def analyse_chunk(data_extractor, texts):
+    """
+    Analyses chunk of texts into result columns. Texts are parsed together with spacy pipe and results are appended
+    straight to column lists, without result dictionaries and echoed news texts.
+
+    Args:
+        data_extractor: (DataExtractor) extractor for analysing texts
+        texts: (list) bank news, missing values are allowed
+
+    Returns:
+        columns: (dict) column names (see COLUMNS) as keys and lists of values as values
+    """
+    targets = data_extractor.targets()
+    columns = {column: [] for column in COLUMNS}
+    news = [data_extractor.filter(text) if isinstance(text, str) else '' for text in texts]
+
+    to_parse = [index for index, text in enumerate(news) if text != '']
+    docs = dict(zip(to_parse, data_extractor.spacy.pipe([news[index] for index in to_parse])))
+    for index in range(len(news)):
+        doc = docs.pop(index, None)
+        if doc is None:
+            for target, _ in targets:
+                columns[target].append('')
+                columns[f'{target}_case'].append(None)
+            columns['status'].append('empty')
+            continue
+
+        sentences = SentenceTrees(doc, data_extractor.memory_stage)
+        for target, context_trees in targets:
+            if data_extractor.relation_parser is not None:
+                values = data_extractor.relation_parser.search(doc, target)
+                trace = {'case': 'relations' if len(values) > 0 else None}
+            else:
+                trace = {}
+                values = data_extractor.search(doc, context_trees, trace, sentences=sentences)
+            columns[target].append(values[0] if len(values) > 0 else '')
+            columns[f'{target}_case'].append(trace['case'])
+        columns['status'].append('complete')
+    return columns
+
+
+def _slice(texts, start, stop):
+    if isinstance(texts, pd.Series):
+        return texts.iloc[start:stop].tolist()
+    if hasattr(texts, 'to_pylist'):
+        # pyarrow Array or ChunkedArray, only the slice is converted to python strings
+        return texts.slice(start, stop - start).to_pylist()
+    return list(texts[start:stop])
+
+
+def analyse_frame(data_extractor, texts, chunk_size=256, processes=0, arrow=False):
+    """
+    Columnar batch analysis: takes texts as pandas Series, pyarrow array or list and returns results as columns
+    [Bank_Rate, QE, Bank_Rate_case, QE_case, status] where case columns contain name of matched context case and
+    status is 'complete' or 'empty' for missing or empty texts. Texts are processed in chunks, optionally by forked
+    worker processes.
+
+    Args:
+        data_extractor: (DataExtractor) extractor for analysing texts
+        texts: (Series, pyarrow Array or list) bank news
+        chunk_size: (int) number of texts parsed at once
+        processes: (int) number of worker processes, texts are analysed in the calling process if 0
+        arrow: (bool) return pyarrow Table instead of DataFrame
+
+    Returns:
+        results: (DataFrame or pyarrow.Table) one row per text, DataFrame keeps index of given Series
+    """
+    chunks = [_slice(texts, start, start + chunk_size) for start in range(0, len(texts), chunk_size)]
+    if processes > 0 and len(chunks) > 1:
+        # forked workers share loaded model and current contexts with the parent process
+        context = multiprocessing.get_context('fork')
+        with context.Pool(processes, initializer=_init_worker, initargs=(data_extractor,)) as pool:
+            chunk_columns = pool.map(_analyse_chunk, chunks)
+    else:
+        chunk_columns = [analyse_chunk(data_extractor, chunk) for chunk in chunks]
+
+    columns = {column: [value for chunk in chunk_columns for value in chunk[column]] for column in COLUMNS}
+    if arrow:
+        import pyarrow
+        return pyarrow.Table.from_pydict(columns)
+
+    index = texts.index if isinstance(texts, pd.Series) else None
+    return pd.DataFrame(columns, columns=COLUMNS, index=index)
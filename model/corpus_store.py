@@ -0,0 +1,209 @@
+import json
+import os
+import pickle
+from array import array
+
+import numpy as np
+
+
+class CorpusStore(object):
+    """
+    Compact columnar store of scraped pages (url, header, content) which is read through memory mapping.
+    Every column is kept as utf-8 encoded text of all rows concatenated in '<column>.data' file and text index
+    '<column>.offsets' - int64 array of row start offsets (with total size at the end). So a row is read by slicing
+    memory mapped file without loading the whole corpus or unpickling anything.
+    """
+    columns = ('url', 'header', 'content')
+
+    def __init__(self, path):
+        meta_file = os.path.join(path, 'meta.json')
+        assert os.path.exists(meta_file), f'{meta_file} not exists!'
+
+        with open(meta_file, 'r') as file:
+            self.meta = json.load(file)
+
+        self.path = path
+        self.columns = tuple(self.meta['columns'])
+        self.size = self.meta['rows']
+        self._data = {}
+        self._offsets = {}
+        self._url_index = None
+
+    def __len__(self):
+        return self.size
+
+    def _column(self, column):
+        assert column in self.columns, f'column {column} not found in {self.path}!'
+        if column not in self._offsets:
+            self._offsets[column] = np.memmap(os.path.join(self.path, f'{column}.offsets'), dtype=np.int64, mode='r')
+            data_file = os.path.join(self.path, f'{column}.data')
+            if os.path.getsize(data_file) > 0:
+                self._data[column] = np.memmap(data_file, dtype=np.uint8, mode='r')
+            else:
+                self._data[column] = np.empty(0, dtype=np.uint8)
+        return self._data[column], self._offsets[column]
+
+    def get(self, index, column='content'):
+        """
+        Reads one value of the store
+
+        Args:
+            index: (int) row index
+            column: (str) column name
+
+        Returns:
+            value: (str) decoded text
+        """
+        assert 0 <= index < self.size, f'row {index} out of range!'
+        data, offsets = self._column(column)
+        return data[offsets[index]:offsets[index + 1]].tobytes().decode('utf-8')
+
+    def find(self, url):
+        """
+        Finds row index of the page with given url. Url index is built on first call.
+
+        Args:
+            url: (str) page url
+
+        Returns:
+            index: (int) row index or None if not found
+        """
+        if self._url_index is None:
+            self._url_index = {}
+            for start in range(0, self.size, 1000):
+                for index, value in enumerate(self.read(start, start + 1000, 'url'), start):
+                    self._url_index.setdefault(value, index)
+        return self._url_index.get(url)
+
+    def read(self, start, stop, column='content'):
+        """
+        Reads consecutive values of one column
+
+        Args:
+            start: (int) first row index
+            stop: (int) row index after the last one
+            column: (str) column name
+
+        Returns:
+            values: (list) decoded texts
+        """
+        data, offsets = self._column(column)
+        stop = min(stop, self.size)
+        if start >= stop:
+            return []
+
+        chunk = data[offsets[start]:offsets[stop]].tobytes()
+        base = offsets[start]
+        return [chunk[offsets[index] - base:offsets[index + 1] - base].decode('utf-8') for index in range(start, stop)]
+
+    def iter_chunks(self, chunk_size=100, columns=('url', 'content')):
+        """
+        Lazily iterates over the store in chunks
+
+        Args:
+            chunk_size: (int) number of rows in chunk
+            columns: (tuple) column names to read
+
+        Returns:
+            chunks: (generator) of dictionaries with column names as keys and lists of chunk values as values
+        """
+        for start in range(0, self.size, chunk_size):
+            yield {column: self.read(start, start + chunk_size, column) for column in columns}
+
+    def documents(self, text_column='content', chunk_size=100):
+        """
+        Lazily iterates over documents of the store in the form accepted by corpus processing
+
+        Args:
+            text_column: (str) column containing document text
+            chunk_size: (int) number of rows read at once
+
+        Returns:
+            documents: (generator) of (url, text) tuples
+        """
+        for chunk in self.iter_chunks(chunk_size, ('url', text_column)):
+            for url, text in zip(chunk['url'], chunk[text_column]):
+                yield url or None, text
+
+    @staticmethod
+    def write(path, rows, columns=None):
+        """
+        Writes rows into new store
+
+        Args:
+            path: (str) store directory, created if not exists
+            rows: (iterable) of dictionaries with column names as keys and strings as values
+            columns: (tuple) column names, defaults to (url, header, content)
+
+        Returns:
+            store: (CorpusStore) written store
+        """
+        columns = tuple(columns) if columns is not None else CorpusStore.columns
+        os.makedirs(path, exist_ok=True)
+
+        offsets = {column: array('q', [0]) for column in columns}
+        files = {column: open(os.path.join(path, f'{column}.data'), 'wb') for column in columns}
+        size = 0
+        try:
+            for row in rows:
+                for column in columns:
+                    value = row.get(column) or ''
+                    encoded = str(value).encode('utf-8')
+                    files[column].write(encoded)
+                    offsets[column].append(offsets[column][-1] + len(encoded))
+                size += 1
+        finally:
+            for file in files.values():
+                file.close()
+
+        for column in columns:
+            np.asarray(offsets[column], dtype=np.int64).tofile(os.path.join(path, f'{column}.offsets'))
+
+        with open(os.path.join(path, 'meta.json'), 'w') as file:
+            json.dump({'columns': list(columns), 'rows': size, 'version': 1}, file)
+
+        return CorpusStore(path)
+
+
+def filter_content(content):
+    """
+    Joins scraped text pieces and removes unnecessary spaces and newlines
+
+    Args:
+        content: (list or str) scraped text pieces
+
+    Returns:
+        text: (str) filtered text
+    """
+    if isinstance(content, (list, tuple)):
+        content = ' '.join(str(x) for x in content)
+    return ' '.join(str(content).split())
+
+
+def scraped_pages(filename):
+    """
+    Reads scraped pages from pickle file (e.g. data/nnmb.pkl) once for ingestion, pages with repeated urls are skipped.
+    Pickle contains lxml string objects, so lxml has to be installed for this step.
+
+    Args:
+        filename: (str) pickle file name
+
+    Returns:
+        pages: (generator) of dictionaries with keys [url, header, content]
+    """
+    assert os.path.exists(filename), f'{filename} not exists!'
+
+    with open(filename, 'rb') as file:
+        data = pickle.load(file)
+
+    if isinstance(data, dict):
+        data = [dict(zip(data.keys(), values)) for values in zip(*data.values())]
+
+    urls = set()
+    for page in data:
+        url = str(page.get('url') or '')
+        if url and url in urls:
+            continue
+        urls.add(url)
+        yield {'url': url, 'header': filter_content(page.get('header', '')),
+               'content': filter_content(page.get('content', ''))}
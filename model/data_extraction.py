@@ -1,8 +1,15 @@
+import itertools
 import json
+import time
 import warnings
 import os
+from contextlib import nullcontext
 import spacy
-from model.tree import ContextTree, ParentedTreeWrapper
+from spacy.tokens import Doc
+from model.helpers import fingerprint
+from model.normalizer import TextNormalizer
+from model.relation_parser import RelationParser
+from model.tree import ContextTree, SentenceTrees
 
 warnings.filterwarnings('ignore')
 
@@ -13,19 +20,33 @@ class DataExtractor(object):
     analysis.
     """
 
-    def __init__(self, spacy_model=None, context_file=None):
+    def __init__(self, spacy_model=None, context_file=None, relation_model=None):
+        """
+        Args:
+            spacy_model: (Language) loaded spacy model, English model is loaded if not given
+            context_file: (str) context json file name
+            relation_model: (str) directory of trained relation parser (see utils/train_relations.py), if given it's
+            used instead of spacy model and values are taken from predicted relations instead of matched contexts
+        """
         self.spacy = spacy_model
+        self.relation_model = relation_model
+        self.relation_parser = None
         self.bank_rate_context_trees = []
         self.qe_context_trees = []
         self.context_file = context_file
         self.filter_dict = None
+        self.normalizer = None
+        self.validators = {}
+        self.memory = None
         self.set_default_params()
         self.from_json(self.context_file)
 
     def set_default_params(self):
         """Set Default parameters"""
         if self.spacy is None:
-            self.spacy = spacy.load('en')
+            self.spacy = spacy.load(self.relation_model or 'en')
+        if self.relation_model is not None and self.relation_parser is None:
+            self.relation_parser = RelationParser(self.spacy)
         if self.context_file is None:
             self.context_file = "model/contexts.json"
         if self.filter_dict is None:
@@ -40,23 +61,151 @@ class DataExtractor(object):
 
         """
         if isinstance(context_tree, list):
+            self.share_validators(context_tree)
             self.bank_rate_context_trees.extend(context_tree)
         elif isinstance(context_tree, ContextTree):
+            self.share_validators([context_tree])
             self.bank_rate_context_trees.append(context_tree)
 
     def set_qe_context_tree(self, context_tree):
         if isinstance(context_tree, list):
+            self.share_validators(context_tree)
             self.qe_context_trees.extend(context_tree)
         elif isinstance(context_tree, ContextTree):
+            self.share_validators([context_tree])
             self.qe_context_trees.append(context_tree)
 
-    def analyse(self, text):
+    def share_validators(self, context_trees):
+        """
+        Merges identical validators of context tree nodes across all cases and targets: such nodes reference the same
+        validator object and key, so each distinct validator is evaluated once per sentence (see ValidatorCache).
+
+        Args:
+            context_trees: (list) containing ContextTree objects
+
+        """
+        for context_tree in context_trees:
+            for node in context_tree.iter_traverse():
+                key = fingerprint(node.validator)
+                node.validator = self.validators.setdefault(key, node.validator)
+                node.validator_key = key
+
+    def share_model(self, context_file):
+        """
+        Builds extractor of another context set which shares spacy model and filtering rules with this one,
+        so documents parsed by this extractor can be matched by both.
+
+        Args:
+            context_file: (str) context json file name
+
+        Returns:
+            data_extractor: (DataExtractor) extractor with contexts from context_file
+        """
+        data_extractor = DataExtractor(spacy_model=self.spacy, context_file=context_file,
+                                       relation_model=self.relation_model)
+        data_extractor.filter_dict = dict(self.filter_dict)
+        data_extractor.memory = self.memory
+        data_extractor.relation_parser = self.relation_parser
+        return data_extractor
+
+    def reload_model(self):
+        """
+        Builds extractor with the same contexts and filtering rules as this one, but with freshly loaded spacy model.
+        Vocab and StringStore of the new model contain only strings of the stored model, not the ones added by
+        analysed texts (see ModelRecycler).
+
+        Returns:
+            data_extractor: (DataExtractor) extractor with new spacy model
+        """
+        path = getattr(self.spacy, 'path', None)
+        spacy_model = spacy.load(path if path is not None else self.relation_model or 'en')
+        data_extractor = DataExtractor(spacy_model=spacy_model, context_file=self.context_file,
+                                       relation_model=self.relation_model)
+        data_extractor.filter_dict = dict(self.filter_dict)
+        data_extractor.memory = self.memory
+        return data_extractor
+
+    def memory_stage(self, name):
+        """
+        Accounts memory allocated by extraction stage if memory accounting is enabled (see MemoryAccounting)
+
+        Args:
+            name: (str) stage name
+
+        Returns:
+            context: (context manager) of the stage
+        """
+        return self.memory.stage(name) if self.memory is not None else nullcontext()
+
+    def targets(self):
+        """
+        Extraction targets with their context trees in matching order
+
+        Returns:
+            targets: (list) of (target name, context trees) tuples
+        """
+        return [('Bank_Rate', self.bank_rate_context_trees), ('QE', self.qe_context_trees)]
+
+    @staticmethod
+    def case_name(context_tree, index):
+        """
+        Name of the context case, e.g. 'case_4'. Trees which were not loaded from json are named by their position.
+
+        Args:
+            context_tree: (ContextTree) root of context case tree
+            index: (int) position of context case in target context trees
+
+        Returns:
+            name: (str) context case name
+        """
+        return context_tree.case if context_tree.case is not None else f'#{index}'
+
+    def case_fingerprints(self):
+        """
+        Fingerprints of every context case of every target in matching order.
+
+        Returns:
+            result: (dict) target names as keys and lists of [case name, case fingerprint] as values
+        """
+        return {target: [[self.case_name(tree, index), tree.fingerprint()] for index, tree in enumerate(trees)]
+                for target, trees in self.targets()}
+
+    def contexts_fingerprint(self):
+        """
+        Fingerprint of all loaded context trees. Changes whenever any context case is added, removed or modified.
+
+        Returns:
+            result: (str) hex digest of bank rate and qe context trees
+        """
+        return fingerprint(self.case_fingerprints())
+
+    def model_fingerprint(self):
+        """
+        Fingerprint of text processing pipeline: spacy version, model name and version and filtering rules.
+
+        Returns:
+            result: (str) hex digest of text processing pipeline
+        """
+        meta = getattr(self.spacy, 'meta', {})
+        return fingerprint({'spacy': spacy.about.__version__,
+                            'lang': meta.get('lang'),
+                            'name': meta.get('name'),
+                            'version': meta.get('version'),
+                            'filter': self.filter_dict})
+
+    def analyse(self, text, deadline=None, memory_budget=None):
         """
         Takes bank news string, finds bank rate percentage and quantitative easing number.
         Uses dependency tree for analysing contexts.
 
         Args:
             text: (str) bank news
+            deadline: (Deadline) time budget checked between documents, sentences and context cases. If given, every
+            result gets 'status': 'complete', 'partial' if analysis was cut short before some value was found or
+            'timeout' if document wasn't analysed at all. Found values are always final, because first found value
+            can't change by analysing further sentences.
+            memory_budget: (MemoryBudget) checked between documents, documents left when it's exceeded aren't
+            analysed and get 'status': 'memory'
 
         Returns:
             results: (dict) contains original string, bank rate percentage number
@@ -73,59 +222,258 @@ class DataExtractor(object):
             texts = text
 
         all_results = []
+        over_budget = False
         for news in texts:
             news = self.filter(news)
-            bank_rate_result = self.search(news, self.bank_rate_context_trees)
-            qe_result = self.search(news, self.qe_context_trees)
+            over_budget = over_budget or (memory_budget is not None and memory_budget.exceeded())
+            if over_budget or (deadline is not None and deadline.expired()):
+                result = {'news': news}
+                result.update({target: "" for target, _ in self.targets()})
+                result['status'] = 'memory' if over_budget else 'timeout'
+                all_results.append(result)
+                continue
 
-            if len(bank_rate_result) > 0:
-                bank_rate = bank_rate_result[0]
-            else:
-                bank_rate = ""
+            with self.memory_stage('results'):
+                all_results.append(self.analyse_news(news, deadline=deadline))
 
-            if len(qe_result) > 0:
-                qe = qe_result[0]
-            else:
-                qe = ""
+        return all_results
 
-            result = {'news': news, 'Bank_Rate': bank_rate, 'QE': qe}
+    def analyse_sets(self, text, context_sets, deadline=None, memory_budget=None):
+        """
+        Analyses bank news with several named context sets (e.g. production and candidate rules). Every text is
+        filtered and parsed once by this extractor and all sets are matched against the same parse, so extractors of
+        the sets have to share spacy model with this one (see share_model). Sets can't be compared when relation
+        model is used, because values are then taken from predicted relations and not from contexts of the sets.
 
+        Args:
+            text: (str or list) bank news
+            context_sets: (dict) set names as keys and DataExtractor objects as values
+            deadline: (Deadline) time budget shared by all sets (see analyse)
+            memory_budget: (MemoryBudget) memory budget checked between documents (see analyse)
+
+        Returns:
+            results: (list) of dictionaries with keys [news, parse_seconds, sets], where sets contains result of every
+            set (see analyse_news) with its matching time in 'seconds'
+        """
+        if text is None or (not isinstance(text, str) and not isinstance(text, list)):
+            texts = ['']
+        elif isinstance(text, str):
+            texts = [text]
+        else:
+            texts = text
+        assert self.relation_parser is None, 'context sets are not used with relation model!'
+
+        all_results = []
+        over_budget = False
+        for news in texts:
+            news = self.filter(news)
+            result = {'news': news, 'parse_seconds': 0.0, 'sets': {}}
+            over_budget = over_budget or (memory_budget is not None and memory_budget.exceeded())
+            if over_budget or (deadline is not None and deadline.expired()):
+                for name, data_extractor in context_sets.items():
+                    set_result = {target: "" for target, _ in data_extractor.targets()}
+                    set_result.update({'status': 'memory' if over_budget else 'timeout', 'seconds': 0.0})
+                    result['sets'][name] = set_result
+                all_results.append(result)
+                continue
+
+            start = time.perf_counter()
+            doc = self.spacy(news)
+            result['parse_seconds'] = time.perf_counter() - start
+            # validators are cached by their fingerprint, so sets share evaluations of identical nodes too
+            sentences = SentenceTrees(doc, self.memory_stage)
+
+            for name, data_extractor in context_sets.items():
+                start = time.perf_counter()
+                set_result = data_extractor.analyse_news(news, doc=doc, deadline=deadline, sentences=sentences)
+                set_result.pop('news')
+                set_result['seconds'] = time.perf_counter() - start
+                result['sets'][name] = set_result
             all_results.append(result)
 
         return all_results
 
-    def search(self, text, context_trees):
+    def analyse_news(self, news, doc=None, traces=None, targets=None, deadline=None, sentences=None):
+        """
+        Analyses single filtered bank news. Text is parsed once and its sentence trees are built once, both are
+        shared between all targets (see SentenceTrees). With relation model values are read from relations of the
+        whole parse at once, so deadline only bounds parsing (which is skipped by analyse when deadline is already
+        expired) and status is always 'complete'.
+
+        Args:
+            news: (str) filtered bank news
+            doc: (Doc) already parsed news, parsed here if not given
+            traces: (dict) if given, filled with search trace of every analysed target (see search)
+            targets: (list) names of targets to analyse, all targets if not given
+            deadline: (Deadline) time budget, if given result gets 'status' (see analyse)
+            sentences: (SentenceTrees) already built sentence trees of doc, e.g. shared by context sets (see
+            analyse_sets), built here if not given
+
+        Returns:
+            result: (dict) contains news string and found values of analysed targets
+        """
+        if doc is None:
+            with self.memory_stage('doc'):
+                doc = self.spacy(news)
+
+        partial = False
+        result = {'news': news}
+        if sentences is None:
+            sentences = SentenceTrees(doc, self.memory_stage)
+        for target, context_trees in self.targets():
+            if targets is not None and target not in targets:
+                continue
+
+            trace = {} if traces is not None else None
+            if self.relation_parser is not None:
+                target_result = self.relation_parser.search(doc, target)
+                if trace is not None:
+                    trace.update({'case': 'relations' if len(target_result) > 0 else None, 'sentence': None,
+                                  'tried': []})
+            else:
+                target_result = self.search(doc, context_trees, trace, deadline, sentences)
+            if len(target_result) > 0:
+                result[target] = target_result[0]
+            else:
+                result[target] = ""
+                partial = partial or (deadline is not None and deadline.exceeded)
+
+            if traces is not None:
+                traces[target] = trace
+
+        if deadline is not None:
+            result['status'] = 'partial' if partial else 'complete'
+
+        return result
+
+    def search(self, text, context_trees, trace=None, deadline=None, sentences=None):
         """
         Takes text and context tree. Splits text into sentences, builds dependency trees and matches contexts.
 
         Args:
-            text: (str) containing bank news statement
+            text: (str or Doc) containing bank news statement or already parsed statement
             context_trees: (list) containing ContextTree objects
+            trace: (dict) if given, filled with information about first found result: 'case' - name of context case
+            which produced it, 'sentence' - index of its sentence and 'tried' - list of [case name, case fingerprint]
+            of all context cases tried before it was found
+            deadline: (Deadline) time budget checked before every sentence and context case, when it's expired
+            results found so far are returned
+            sentences: (SentenceTrees) sentence trees of the parsed text shared with other targets, built here if not
+            given
 
         Returns:
             results: (list) found bank rate and qe numbers if available else empty list
 
         """
-        doc = self.spacy(text)
+        if sentences is None:
+            sentences = SentenceTrees(self.spacy(text) if isinstance(text, str) else text, self.memory_stage)
         results = []
-        for span in doc.sents:
-            tree = ParentedTreeWrapper.from_spacy_tree(span.root)
+        tried = set()
+        for sentence, (tree, cache) in enumerate(sentences):
+            if deadline is not None and deadline.expired():
+                break
+
             # tree.draw()
-            for context_tree in [x.deepcopy() for x in context_trees]:
-                context_result = self.context_search(tree, context_tree)
+            for index, context_tree in enumerate(context_trees):
+                if deadline is not None and deadline.expired():
+                    break
+
+                with self.memory_stage('context_copies'):
+                    context_copy = context_tree.deepcopy()
+                context_result = self.context_search(tree, context_copy, cache)
                 # print(context_result)
 
-                validated_nodes = context_result.traverse_and_get('validated')
-                if sum(validated_nodes) == len(validated_nodes):
+                matched = context_result.matched()
+
+                if trace is not None and len(results) == 0:
+                    tried.add(index)
+                    if matched:
+                        trace['case'] = self.case_name(context_tree, index)
+                        trace['sentence'] = sentence
+
+                if matched:
                     results.extend(context_result.traverse_and_extract())
                     break
 
+        if trace is not None:
+            trace.setdefault('case', None)
+            trace.setdefault('sentence', None)
+            trace['tried'] = [[self.case_name(context_trees[index], index), context_trees[index].fingerprint()]
+                              for index in sorted(tried)]
+
         return results
 
+    @staticmethod
+    def is_affected(trace, cases):
+        """
+        Checks if result described by search trace may change with given context cases.
+        Result is affected if any tried case was modified or removed, if added case would have been tried (always
+        when nothing was found or result was found after the first sentence, otherwise only if added case comes
+        before the case which produced result), or if a case which came after the matched one now comes before it,
+        because in the sentence of the result only cases up to the matched one were tried.
+
+        Args:
+            trace: (dict) search trace of the result (see search)
+            cases: (list) of [case name, case fingerprint] of current context cases in matching order
+
+        Returns:
+            result: (bool)
+        """
+        if trace is None:
+            return True
+
+        current = {name: case_fingerprint for name, case_fingerprint in cases}
+        tried = {name: case_fingerprint for name, case_fingerprint in trace['tried']}
+        for name, case_fingerprint in tried.items():
+            if current.get(name) != case_fingerprint:
+                return True
+
+        names = [name for name, _ in cases]
+        if trace['case'] is None:
+            return any(name not in tried for name in names)
+        if trace['sentence'] > 0 and any(name not in tried for name in names):
+            return True
+
+        # cases tried before the matched one in its sentence, 'tried' is in matching order
+        tried_names = [name for name, _ in trace['tried']]
+        before = set(tried_names[:tried_names.index(trace['case'])])
+        return any(name not in before for name in names[:names.index(trace['case'])])
+
+    def doc_to_bytes(self, doc):
+        """
+        Serializes parsed document for parse store. Strings used by tokens are stored too, so document can be
+        restored in other process with fresh vocabulary.
+
+        Args:
+            doc: (Doc) parsed document
+
+        Returns:
+            result: (tuple) of serialized document (bytes) and json list of strings (str)
+        """
+        strings = set()
+        for token in doc:
+            strings.update([token.orth_, token.lemma_, token.tag_, token.dep_, token.ent_type_])
+        return doc.to_bytes(tensor=False), json.dumps(sorted(strings), ensure_ascii=False)
+
+    def doc_from_bytes(self, data, strings):
+        """
+        Restores parsed document serialized with doc_to_bytes
+
+        Args:
+            data: (bytes) serialized document
+            strings: (str) json list of strings used by document tokens
+
+        Returns:
+            doc: (Doc) parsed document
+        """
+        for string in json.loads(strings):
+            self.spacy.vocab.strings.add(string)
+        return Doc(self.spacy.vocab).from_bytes(data, tensor=False)
+
     def filter(self, text):
         """
         Takes incoming text, removes unnecessary spaces, capitalises and replaces some keys with appropriate values.
-        These key, value pairs are defined in this class.
+        These key, value pairs are defined in this class (see TextNormalizer).
 
         Args:
             text: (str) bank news statement
@@ -133,13 +481,21 @@ class DataExtractor(object):
         Returns:
             filtered_text: (str) filtered bank news statement
         """
-        filtered_text = ' '.join([x.strip() for x in text.split()]).capitalize()
-        for key, replacement in self.filter_dict.items():
-            filtered_text = filtered_text.replace(key, replacement)
-        return filtered_text
+        return self.get_normalizer().normalize(text)
+
+    def get_normalizer(self):
+        """
+        Returns text normalizer compiled from filter dictionary. It's compiled again if filter dictionary was changed.
+
+        Returns:
+            normalizer: (TextNormalizer) normalizer used by filter
+        """
+        if self.normalizer is None or self.normalizer.replacements != self.filter_dict:
+            self.normalizer = TextNormalizer(self.filter_dict)
+        return self.normalizer
 
     @staticmethod
-    def context_search(tree, context_tree):
+    def context_search(tree, context_tree, cache=None):
         """
         Given sentence dependency tree and context tree objects matches context and returns context tree itself
         which contains all information in its nodes.
@@ -148,20 +504,27 @@ class DataExtractor(object):
         Args:
             tree: (ParentedTreeWrapper) dependency tree of sentence
             context_tree: (ContextTree) context tree
+            cache: (ValidatorCache) validator evaluations shared by all context trees matched on this sentence
 
         Returns:
             context_tree: (ContextTree) the same context tree object with results contained inside
 
         """
-        curr_candidates = tree.find_with_properties(**context_tree.validator)
+        def find(candidate, node):
+            if cache is None:
+                return candidate.find_with_properties(**node.validator)
+            key = node.validator_key if node.validator_key is not None else fingerprint(node.validator)
+            return cache.find_with_properties(candidate, key, node.validator)
+
+        curr_candidates = find(tree, context_tree)
         if len(curr_candidates) > 0:
             context_tree.validated = True
             context_tree.found_value = curr_candidates[0].text
             context_tree.candidates.extend(curr_candidates)
 
-            for node in context_tree.traverse()[1:]:
+            for node in itertools.islice(context_tree.iter_traverse(), 1, None):
                 for prev_candidate in node.parent.candidates:
-                    curr_candidates = prev_candidate.find_with_properties(**node.validator)
+                    curr_candidates = find(prev_candidate, node)
                     if len(curr_candidates) > 0:
                         node.validated = True
                         node.found_value = curr_candidates[0].text
@@ -184,11 +547,16 @@ class DataExtractor(object):
         Returns:
             context_trees: (list) containing list of built ContextTree objects
         """
+        assert isinstance(data, dict), f'contexts must be a dictionary of cases, not {type(data).__name__}!'
+
         context_trees = []
         for case in data.keys():
+            assert isinstance(data[case], list), f'nodes of {case} must be a list, not {type(data[case]).__name__}!'
             case_tree_nodes = {}
             for context_dict in data[case]:
                 tree_node = ContextTree.from_dict(context_dict)
+                assert isinstance(tree_node.validator, dict), f'validator of node with label {tree_node.label} ' \
+                                                               f'in {case} must be a dictionary!'
                 case_tree_nodes[tree_node.label] = tree_node
 
             tree_root = None
@@ -215,6 +583,8 @@ class DataExtractor(object):
 
                 tree_node.children = children_nodes
 
+            assert tree_root is not None, f'root node (node with empty parent) of {case} not found!'
+            tree_root.case = case
             context_trees.append(tree_root)
 
         return context_trees
@@ -235,6 +605,8 @@ class DataExtractor(object):
         with open(filename, 'r') as file:
             data = json.load(file)
 
+        assert isinstance(data, dict), f'{filename} must contain a dictionary of targets, not {type(data).__name__}!'
+
         bank_rate_contexts = data.get("Bank_Rate", None)
         qe_contexts = data.get("QE", None)
 
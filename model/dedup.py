@@ -0,0 +1,162 @@
+import re
+import zlib
+
+import numpy as np
+
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+
+
+class NearDuplicateIndex(object):
+    """
+    Incremental MinHash/LSH index for grouping near-duplicate documents (summary pages, minutes pages, reprints with
+    small boilerplate differences) into clusters, so extraction runs once per cluster representative.
+
+    Documents are represented by word shingles, MinHash signatures are split into bands and documents sharing a band
+    become candidates. Candidate is accepted as duplicate of cluster representative if estimated Jaccard similarity
+    is above threshold and, with match_numbers, both documents contain the same numbers. Statements of different
+    meetings differ mostly in numbers, so it prevents copying results between them.
+    """
+
+    def __init__(self, threshold=0.9, num_perm=128, bands=32, shingle_size=5, match_numbers=True, seed=1):
+        assert num_perm % bands == 0, f'number of permutations {num_perm} is not divisible by bands {bands}!'
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.match_numbers = match_numbers
+
+        generator = np.random.RandomState(seed)
+        self.a = generator.randint(1, MAX_HASH, size=num_perm, dtype=np.uint64)
+        self.b = generator.randint(0, MAX_HASH, size=num_perm, dtype=np.uint64)
+
+        self.buckets = [{} for _ in range(bands)]
+        self.representatives = {}
+        self.members = {}
+
+    def shingles(self, text):
+        """
+        Hashes of lowercased word shingles of the text
+
+        Args:
+            text: (str) document text
+
+        Returns:
+            hashes: (ndarray) unique 32 bit shingle hashes
+        """
+        words = text.lower().split()
+        size = min(self.shingle_size, len(words)) or 1
+        hashes = {zlib.crc32(' '.join(words[i:i + size]).encode('utf-8'))
+                  for i in range(max(len(words) - size + 1, 1))}
+        return np.fromiter(hashes, dtype=np.uint64, count=len(hashes))
+
+    def signature(self, text):
+        """
+        MinHash signature of the text
+
+        Args:
+            text: (str) document text
+
+        Returns:
+            signature: (ndarray) of num_perm minimal hash values
+        """
+        hashes = self.shingles(text)
+        # (a * x + b) mod p fits into uint64 because a, b and x are below 2^32
+        permuted = (np.outer(hashes, self.a) + self.b) % MERSENNE_PRIME
+        return permuted.min(axis=0)
+
+    @staticmethod
+    def numbers(text):
+        """
+        Returns:
+            numbers: (frozenset) of numbers contained in the text
+        """
+        return frozenset(re.findall(r'\d+(?:[.,]\d+)*', text))
+
+    def add(self, key, text):
+        """
+        Adds document to the index
+
+        Args:
+            key: (hashable) document key
+            text: (str) document text
+
+        Returns:
+            representative: key of cluster representative, key itself if document starts new cluster
+        """
+        signature = self.signature(text)
+        numbers = self.numbers(text) if self.match_numbers else None
+        bands = [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+        checked = set()
+        for band, bucket in zip(bands, self.buckets):
+            for candidate in bucket.get(band, []):
+                if candidate in checked:
+                    continue
+                checked.add(candidate)
+                candidate_signature, candidate_numbers = self.representatives[candidate]
+                if self.match_numbers and candidate_numbers != numbers:
+                    continue
+                if np.mean(candidate_signature == signature) >= self.threshold:
+                    self.members[candidate].append(key)
+                    return candidate
+
+        self.representatives[key] = (signature, numbers)
+        self.members[key] = [key]
+        for band, bucket in zip(bands, self.buckets):
+            bucket.setdefault(band, []).append(key)
+        return key
+
+    def clusters(self):
+        """
+        Returns:
+            clusters: (dict) representative keys as keys and lists of cluster member keys as values
+        """
+        return dict(self.members)
+
+    def stats(self):
+        """
+        Returns:
+            stats: (dict) with keys [documents, clusters, duplicates, duplication_rate, largest_cluster]
+        """
+        documents = sum(len(members) for members in self.members.values())
+        clusters = len(self.members)
+        return {'documents': documents,
+                'clusters': clusters,
+                'duplicates': documents - clusters,
+                'duplication_rate': (documents - clusters) / documents if documents > 0 else 0.0,
+                'largest_cluster': max([len(members) for members in self.members.values()] or [0])}
+
+
+def analyse_deduplicated(data_extractor, texts, **kwargs):
+    """
+    Groups near-duplicate texts and analyses only one representative per cluster. Duplicates get extracted values of
+    their representative and their own filtered news text.
+
+    Args:
+        data_extractor: (DataExtractor) extractor for analysing texts
+        texts: (list) bank news texts
+        **kwargs: (dict) NearDuplicateIndex parameters [threshold, num_perm, bands, shingle_size, match_numbers]
+
+    Returns:
+        results: (list) analysis results in order of texts (see DataExtractor.analyse)
+        stats: (dict) cluster statistics (see NearDuplicateIndex.stats)
+    """
+    index = NearDuplicateIndex(**kwargs)
+
+    news = [data_extractor.filter(text) for text in texts]
+    representatives = [index.add(position, text) for position, text in enumerate(news)]
+
+    found = {}
+    for position, representative in enumerate(representatives):
+        if representative == position:
+            found[position] = data_extractor.analyse_news(news[position])
+
+    results = []
+    for position, representative in enumerate(representatives):
+        result = dict(found[representative])
+        result['news'] = news[position]
+        results.append(result)
+
+    return results, index.stats()
@@ -1,6 +1,40 @@
+import hashlib
+import json
+import time
+from functools import lru_cache
+
+
+def content_hash(text):
+    """
+    Hash of a document text, used to find out whether a document has changed since it was processed last time.
+
+    Args:
+        text: (str) document text
+
+    Returns:
+        result: (str) hex digest of the text
+    """
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def fingerprint(data):
+    """
+    Stable fingerprint of json serializable data (dictionaries are hashed with sorted keys).
+
+    Args:
+        data: (dict, list, str, ...) json serializable data
+
+    Returns:
+        result: (str) hex digest of the data
+    """
+    serialized = json.dumps(data, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(serialized.encode('utf-8')).hexdigest()
+
+
 def found(text, keys, mode='all', substring=False):
     """
-    Searches key elements in given text string(s) with three different modes: all, any, none
+    Searches key elements in given text string(s) with three different modes: all, any, none.
+    Keys are compiled once into KeywordMatcher which is cached and reused by calls with the same keys.
 
     Args:
         text: (list or str)
@@ -13,19 +47,162 @@ def found(text, keys, mode='all', substring=False):
 
     """
     assert mode in ['all', 'any', 'none']
-    if isinstance(text, str):
-        text = [text]
+    return keyword_matcher(tuple(keys), substring).found(text, mode)
+
 
-    count = 0
-    for key in keys:
+@lru_cache(maxsize=4096)
+def keyword_matcher(keys, substring=False):
+    """
+    Cached KeywordMatcher of the keys
+
+    Args:
+        keys: (tuple) keys to search
+        substring: (bool) search in substrings or fully match
+
+    Returns:
+        matcher: (KeywordMatcher) compiled matcher
+    """
+    return KeywordMatcher(keys, substring)
+
+
+class KeywordMatcher(object):
+    """
+    Case-insensitive multi-pattern matcher compiled once for a list of keys. Exact matching looks items up in a hash
+    set of lowercased keys. Substring matching of many keys uses Aho-Corasick automaton, so every item is scanned once
+    regardless of number of keys; a few keys are simply searched with str 'in', which is faster for them.
+    """
+    automaton_min_keys = 8
+
+    def __init__(self, keys, substring=False):
+        self.keys = sorted({key.lower() for key in keys})
+        self.substring = substring
+        self.key_set = frozenset(self.keys)
+        self.goto = None
+        if substring and len(self.keys) >= self.automaton_min_keys:
+            self._build_automaton()
+
+    def _build_automaton(self):
+        self.goto = [{}]
+        self.output = [frozenset()]
+        for index, key in enumerate(self.keys):
+            state = 0
+            for char in key:
+                if char not in self.goto[state]:
+                    self.goto.append({})
+                    self.output.append(frozenset())
+                    self.goto[state][char] = len(self.goto) - 1
+                state = self.goto[state][char]
+            self.output[state] = self.output[state] | {index}
+
+        # breadth first, so fail state of every state is computed before its children
+        self.fail = [0] * len(self.goto)
+        queue = list(self.goto[0].values())
+        for state in queue:
+            for char, child in self.goto[state].items():
+                fail = self.fail[state]
+                while fail and char not in self.goto[fail]:
+                    fail = self.fail[fail]
+                self.fail[child] = self.goto[fail].get(char, 0)
+                self.output[child] = self.output[child] | self.output[self.fail[child]]
+                queue.append(child)
+
+    def matches(self, text, stop=None):
+        """
+        Finds keys contained in text string(s)
+
+        Args:
+            text: (list or str) text string(s)
+            stop: (int) stop searching when this number of keys is found
+
+        Returns:
+            result: (set) found lowercased keys
+        """
+        if isinstance(text, str):
+            text = [text]
+        stop = len(self.keys) if stop is None else stop
+
+        if not self.substring:
+            return self.key_set.intersection([item.lower() for item in text])
+
+        result = set()
+        if stop == 0:
+            return result
         for item in text:
-            if not substring and key.lower() == item.lower() or substring and key.lower() in item.lower():
-                count += 1
+            item = item.lower()
+            if self.goto is None:
+                result.update(key for key in self.keys if key in item)
+            else:
+                state = 0
+                for char in item:
+                    while state and char not in self.goto[state]:
+                        state = self.fail[state]
+                    state = self.goto[state].get(char, 0)
+                    if self.output[state]:
+                        result.update(self.keys[index] for index in self.output[state])
+            if len(result) >= stop:
                 break
+        return result
+
+    def found(self, text, mode='all'):
+        """
+        Same as found function with keys of this matcher
+
+        Args:
+            text: (list or str) text string(s)
+            mode: (str) ['all', 'any', 'none']
+
+        Returns:
+            result: (bool)
+        """
+        if mode == 'all':
+            return len(self.matches(text)) == len(self.keys)
+        elif mode == 'any':
+            return len(self.matches(text, stop=1)) > 0
+        else:
+            return len(self.matches(text, stop=1)) == 0
+
+
+class Deadline(object):
+    """
+    Time budget for analysis. Once expired call returns True, exceeded flag is set, so callers can find out later
+    that some work was cut short.
+    """
+
+    def __init__(self, timeout):
+        """
+        Args:
+            timeout: (float) time budget in seconds starting from now
+        """
+        self.end = time.monotonic() + timeout
+        self.exceeded = False
+
+    @staticmethod
+    def until(end):
+        """
+        Builds deadline expiring at absolute time, e.g. deadline of another process (time.monotonic is system-wide)
+
+        Args:
+            end: (float) time.monotonic() value when deadline expires
+
+        Returns:
+            deadline: (Deadline)
+        """
+        deadline = Deadline(0)
+        deadline.end = end
+        return deadline
+
+    def remaining(self):
+        """
+        Returns:
+            result: (float) seconds left, negative if deadline is expired
+        """
+        return self.end - time.monotonic()
 
-    if mode == 'all':
-        return len(keys) == count
-    elif mode == 'any':
-        return count > 0
-    else:
-        return count == 0
+    def expired(self):
+        """
+        Returns:
+            result: (bool) deadline is expired
+        """
+        if not self.exceeded and time.monotonic() >= self.end:
+            self.exceeded = True
+        return self.exceeded
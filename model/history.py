@@ -0,0 +1,198 @@
+import datetime
+import json
+import re
+import sqlite3
+import time
+
+MONTHS = ['january', 'february', 'march', 'april', 'may', 'june', 'july', 'august', 'september', 'october',
+          'november', 'december']
+MONTH = '(' + '|'.join(MONTHS) + ')'
+MEETING_DATE = re.compile(r'meeting\s+(?:ending\s+)?on\s+(?:\w+day\s+)?(\d{1,2})(?:st|nd|rd|th)?\s+' + MONTH +
+                          r'\s+(\d{4})', re.IGNORECASE)
+DAY_DATE = re.compile(r'\b(\d{1,2})(?:st|nd|rd|th)?\s+' + MONTH + r'\s+(\d{4})', re.IGNORECASE)
+MONTH_DATE = re.compile(r'\b' + MONTH + r'[\s,-]+(\d{4})\b', re.IGNORECASE)
+
+TARGET_COLUMNS = {'Bank_Rate': 'bank_rate', 'QE': 'qe'}
+
+
+def meeting_date(text, url=None):
+    """
+    Finds date of the policy meeting of the statement: date of meeting mentioned in the text, date in the heading
+    (first 300 characters), month and year of the statement from its url (e.g. '.../2018/august-2018') or heading, or
+    the first date in the text.
+
+    Args:
+        text: (str) statement
+        url: (str) statement url
+
+    Returns:
+        date: (str) ISO date or None if not found
+        precision: (str) 'day' or 'month' (date is the first day of month) or None
+    """
+    def iso(year, month, day=1):
+        try:
+            return datetime.date(int(year), MONTHS.index(month.lower()) + 1, int(day)).isoformat()
+        except ValueError:
+            return None
+
+    heading = (text or '')[:300]
+    for pattern, source in [(MEETING_DATE, text or ''), (DAY_DATE, heading)]:
+        match = pattern.search(source)
+        if match is not None and iso(match.group(3), match.group(2), match.group(1)) is not None:
+            return iso(match.group(3), match.group(2), match.group(1)), 'day'
+
+    for source in [url or '', heading]:
+        match = MONTH_DATE.search(source)
+        if match is not None:
+            return iso(match.group(2), match.group(1)), 'month'
+
+    match = DAY_DATE.search(text or '')
+    if match is not None and iso(match.group(3), match.group(2), match.group(1)) is not None:
+        return iso(match.group(3), match.group(2), match.group(1)), 'day'
+    return None, None
+
+
+def parse_value(value):
+    """
+    Parses extracted value: '0.5' or '0.5%' to 0.5, '£435' to 435.0
+
+    Args:
+        value: (str) extracted value
+
+    Returns:
+        value: (float) number or None if value is empty or not a number
+    """
+    value = str(value or '').replace('£', '').replace('%', '').replace(',', '').strip()
+    match = re.match(r'^\d+(?:\.\d+)?', value)
+    return float(match.group(0)) if match is not None else None
+
+
+class RateHistory(object):
+    """
+    Indexed SQLite store of extracted Bank Rate and QE values by meeting date, which answers point-in-time and range
+    queries without analysing statements again.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.connection = sqlite3.connect(filename, check_same_thread=False)
+        self.create_tables()
+
+    def create_tables(self):
+        """Create history table and its indexes if they don't exist"""
+        with self.connection:
+            self.connection.execute('CREATE TABLE IF NOT EXISTS history ('
+                                    'key TEXT PRIMARY KEY, '
+                                    'url TEXT, '
+                                    'meeting_date TEXT NOT NULL, '
+                                    'date_precision TEXT NOT NULL, '
+                                    'bank_rate REAL, '
+                                    'qe REAL, '
+                                    'result TEXT NOT NULL, '
+                                    'updated REAL NOT NULL)')
+            for column in TARGET_COLUMNS.values():
+                self.connection.execute(f'CREATE INDEX IF NOT EXISTS history_{column} ON history '
+                                        f'(meeting_date, {column}) WHERE {column} IS NOT NULL')
+
+    def put(self, key, result, url=None, date=None):
+        """
+        Stores extraction result. Results without meeting date or without any value aren't stored.
+
+        Args:
+            key: (str) document key (see Manifest.document_key)
+            result: (dict) analysis result (see DataExtractor.analyse)
+            url: (str) statement url
+            date: (str) ISO meeting date, found in statement text or url if not given
+
+        Returns:
+            result: (bool) result was stored
+        """
+        precision = 'day'
+        if date is None:
+            date, precision = meeting_date(result.get('news', ''), url)
+        values = {column: parse_value(result.get(target)) for target, column in TARGET_COLUMNS.items()}
+        if date is None or all(value is None for value in values.values()):
+            return False
+
+        with self.connection:
+            self.connection.execute('INSERT OR REPLACE INTO history (key, url, meeting_date, date_precision, '
+                                    'bank_rate, qe, result, updated) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                                    (key, url, date, precision, values['bank_rate'], values['qe'],
+                                     json.dumps(result, ensure_ascii=False), time.time()))
+        return True
+
+    def import_manifest(self, manifest):
+        """
+        Stores all results of corpus processing manifest, manifest keys are urls of statements if they are known
+
+        Args:
+            manifest: (Manifest) manifest of processed documents
+
+        Returns:
+            stored: (int) number of stored results
+        """
+        stored = 0
+        for record in manifest.records():
+            url = record['key'] if not record['key'].startswith('sha256:') else None
+            stored += int(self.put(record['key'], record['result'], url))
+        return stored
+
+    def as_of(self, date, target='Bank_Rate'):
+        """
+        Value of the target in force on the date: value of the latest meeting on or before the date
+
+        Args:
+            date: (str) ISO date
+            target: (str) Bank_Rate or QE
+
+        Returns:
+            record: (dict) with keys [date, value, url, key, precision] or None if no meeting is known before date
+        """
+        column = TARGET_COLUMNS[target]
+        row = self.connection.execute(f'SELECT meeting_date, {column}, url, key, date_precision FROM history '
+                                      f'WHERE {column} IS NOT NULL AND meeting_date <= ? '
+                                      f'ORDER BY meeting_date DESC, key DESC LIMIT 1', (date,)).fetchone()
+        return self._record(row) if row is not None else None
+
+    def range(self, start, end, target='Bank_Rate', changes=False):
+        """
+        Values of the target decided on meetings between dates
+
+        Args:
+            start: (str) ISO date, inclusive
+            end: (str) ISO date, inclusive
+            target: (str) Bank_Rate or QE
+            changes: (bool) return only meetings which changed the value in force before them
+
+        Returns:
+            records: (list) of dictionaries with keys [date, value, url, key, precision] ordered by date
+        """
+        column = TARGET_COLUMNS[target]
+        rows = self.connection.execute(f'SELECT meeting_date, {column}, url, key, date_precision FROM history '
+                                       f'WHERE {column} IS NOT NULL AND meeting_date >= ? AND meeting_date <= ? '
+                                       f'ORDER BY meeting_date, key', (start, end)).fetchall()
+        records = [self._record(row) for row in rows]
+        if not changes:
+            return records
+
+        previous = self.connection.execute(f'SELECT {column} FROM history WHERE {column} IS NOT NULL AND '
+                                           f'meeting_date < ? ORDER BY meeting_date DESC, key DESC LIMIT 1',
+                                           (start,)).fetchone()
+        value = previous[0] if previous is not None else None
+        changed = []
+        for record in records:
+            if record['value'] != value:
+                changed.append(record)
+                value = record['value']
+        return changed
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM history').fetchone()[0]
+
+    def close(self):
+        """Close database connection"""
+        self.connection.close()
+
+    @staticmethod
+    def _record(row):
+        return {'date': row[0], 'value': row[1], 'url': row[2], 'key': row[3], 'precision': row[4]}
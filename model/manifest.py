@@ -0,0 +1,167 @@
+import json
+import sqlite3
+import time
+
+from model.helpers import content_hash
+
+
+class Manifest(object):
+    """
+    Persistent SQLite manifest of already processed documents.
+    Every document is keyed by its url (or content hash if url is unknown) and stores content hash, extraction result,
+    search traces (context cases which were tried and produced result for every target) and fingerprints of contexts
+    and model used for producing this result. So re-runs over the same corpus process only new, changed or stale
+    documents. Optionally parsed documents are kept in parse store, so contexts changes don't need re-parsing.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.connection = sqlite3.connect(filename, check_same_thread=False)
+        self.create_tables()
+
+    def create_tables(self):
+        """Create manifest tables if they don't exist"""
+        with self.connection:
+            self.connection.execute('CREATE TABLE IF NOT EXISTS documents ('
+                                    'key TEXT PRIMARY KEY, '
+                                    'content_hash TEXT NOT NULL, '
+                                    'contexts_fingerprint TEXT NOT NULL, '
+                                    'model_fingerprint TEXT NOT NULL, '
+                                    'result TEXT NOT NULL, '
+                                    'trace TEXT, '
+                                    'updated REAL NOT NULL)')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS parses ('
+                                    'content_hash TEXT NOT NULL, '
+                                    'model_fingerprint TEXT NOT NULL, '
+                                    'doc BLOB NOT NULL, '
+                                    'strings TEXT NOT NULL, '
+                                    'PRIMARY KEY (content_hash, model_fingerprint))')
+
+    @staticmethod
+    def document_key(text, url=None):
+        """
+        Key of the document in manifest: its url if available, else hash of its content.
+
+        Args:
+            text: (str) document text
+            url: (str) document url
+
+        Returns:
+            key: (str) manifest key
+        """
+        if url:
+            return url
+        return 'sha256:' + content_hash(text)
+
+    def get(self, key):
+        """
+        Get manifest record of the document
+
+        Args:
+            key: (str) manifest key
+
+        Returns:
+            record: (dict) with keys [key, content_hash, contexts_fingerprint, model_fingerprint, result, trace,
+            updated] or None if document isn't processed yet
+        """
+        row = self.connection.execute('SELECT key, content_hash, contexts_fingerprint, model_fingerprint, result, '
+                                      'trace, updated FROM documents WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        return self._record(row)
+
+    def is_stale(self, key, text_hash, contexts_fingerprint, model_fingerprint):
+        """
+        Checks if document needs to be (re)processed: it's new, its content changed or it was processed with other
+        contexts or model.
+
+        Args:
+            key: (str) manifest key
+            text_hash: (str) current content hash of the document
+            contexts_fingerprint: (str) current contexts fingerprint
+            model_fingerprint: (str) current model fingerprint
+
+        Returns:
+            result: (bool)
+        """
+        record = self.get(key)
+        return record is None or record['content_hash'] != text_hash or \
+            record['contexts_fingerprint'] != contexts_fingerprint or \
+            record['model_fingerprint'] != model_fingerprint
+
+    def put(self, records):
+        """
+        Insert or update processed documents in one transaction.
+
+        Args:
+            records: (list) of dictionaries with keys [key, content_hash, contexts_fingerprint, model_fingerprint,
+            result] and optional key trace
+
+        """
+        now = time.time()
+        with self.connection:
+            self.connection.executemany('INSERT OR REPLACE INTO documents (key, content_hash, contexts_fingerprint, '
+                                        'model_fingerprint, result, trace, updated) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                                        [(record['key'], record['content_hash'], record['contexts_fingerprint'],
+                                          record['model_fingerprint'],
+                                          json.dumps(record['result'], ensure_ascii=False),
+                                          json.dumps(record.get('trace'), ensure_ascii=False), now)
+                                         for record in records])
+
+    def get_parse(self, text_hash, model_fingerprint):
+        """
+        Get parsed document from parse store
+
+        Args:
+            text_hash: (str) content hash of the document
+            model_fingerprint: (str) fingerprint of model which parsed the document
+
+        Returns:
+            result: (tuple) serialized document and its strings (see DataExtractor.doc_to_bytes) or None
+        """
+        return self.connection.execute('SELECT doc, strings FROM parses WHERE content_hash = ? AND '
+                                       'model_fingerprint = ?', (text_hash, model_fingerprint)).fetchone()
+
+    def put_parse(self, text_hash, model_fingerprint, doc, strings):
+        """
+        Store parsed document in parse store
+
+        Args:
+            text_hash: (str) content hash of the document
+            model_fingerprint: (str) fingerprint of model which parsed the document
+            doc: (bytes) serialized document
+            strings: (str) json list of strings used by document tokens
+
+        """
+        with self.connection:
+            self.connection.execute('INSERT OR REPLACE INTO parses (content_hash, model_fingerprint, doc, strings) '
+                                    'VALUES (?, ?, ?, ?)', (text_hash, model_fingerprint, doc, strings))
+
+    def records(self):
+        """
+        Iterates over all processed documents
+
+        Returns:
+            records: (generator) of manifest records
+        """
+        cursor = self.connection.execute('SELECT key, content_hash, contexts_fingerprint, model_fingerprint, result, '
+                                         'trace, updated FROM documents ORDER BY key')
+        for row in cursor:
+            yield self._record(row)
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM documents').fetchone()[0]
+
+    def close(self):
+        """Close database connection"""
+        self.connection.close()
+
+    @staticmethod
+    def _record(row):
+        return {'key': row[0],
+                'content_hash': row[1],
+                'contexts_fingerprint': row[2],
+                'model_fingerprint': row[3],
+                'result': json.loads(row[4]),
+                'trace': json.loads(row[5]) if row[5] is not None else None,
+                'updated': row[6]}
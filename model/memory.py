@@ -0,0 +1,132 @@
+import os
+import threading
+import tracemalloc
+from contextlib import contextmanager
+
+
+class MemoryAccounting(object):
+    """
+    Diagnostic accounting of memory allocated by extraction stages (parsed Doc, sentence trees, context copies,
+    results) using tracemalloc. For every stage it keeps number of calls and memory still allocated when the stage
+    finished, i.e. size of what the stage produced, in total and the largest one. Tracing slows analysis down
+    considerably, so it's meant for diagnostics only.
+
+    tracemalloc counts allocations of the whole process, so stages run one at a time: a thread entering a stage waits
+    until stages of other threads are finished, otherwise memory of concurrent requests would be accounted to each
+    other. Stages nested in the same thread are accounted to both.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.serial = threading.RLock()
+        self.stages = {}
+        self.started = False
+
+    def start(self):
+        """Starts tracing memory allocations"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started = True
+
+    def stop(self):
+        """Stops tracing if it was started by this object"""
+        if self.started:
+            tracemalloc.stop()
+            self.started = False
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Accounts memory allocated within the block to the stage
+
+        Args:
+            name: (str) stage name
+
+        """
+        with self.serial:
+            before = tracemalloc.get_traced_memory()[0]
+            try:
+                yield
+            finally:
+                allocated = tracemalloc.get_traced_memory()[0] - before
+                with self.lock:
+                    stage = self.stages.setdefault(name, {'calls': 0, 'allocated': 0, 'max_allocated': 0})
+                    stage['calls'] += 1
+                    stage['allocated'] += allocated
+                    stage['max_allocated'] = max(stage['max_allocated'], allocated)
+
+    def report(self):
+        """
+        Returns:
+            report: (dict) with keys [current, peak] - traced memory in bytes and stages - stage names as keys and
+            dictionaries with keys [calls, allocated, max_allocated] as values
+        """
+        current, peak = tracemalloc.get_traced_memory()
+        with self.lock:
+            stages = {name: dict(stage) for name, stage in self.stages.items()}
+        return {'current': current, 'peak': peak, 'stages': stages}
+
+
+class MemoryBudget(object):
+    """
+    Memory limit of batch processing. Processing checks it between documents and flushes results or splits batches
+    when process memory is over the limit instead of growing without bound.
+
+    Freed memory is often not given back to the system, so resident memory may stay over the limit after a flush.
+    Then the budget is raised to current usage plus headroom (see flushed) until usage falls under the limit again,
+    otherwise every next document would be flushed alone.
+    """
+
+    def __init__(self, limit, headroom=0.1):
+        """
+        Args:
+            limit: (int) memory limit in bytes
+            headroom: (float) fraction of the limit memory may grow by after a flush which didn't get under the limit
+        """
+        self.limit = limit
+        self.headroom = int(limit * headroom)
+        self.threshold = limit
+        self.page_size = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+    def usage(self):
+        """
+        Returns:
+            usage: (int) resident memory of the process in bytes, or traced memory if it can't be read
+        """
+        try:
+            with open('/proc/self/statm', 'r') as file:
+                return int(file.read().split()[1]) * self.page_size
+        except (OSError, IndexError, ValueError):
+            return tracemalloc.get_traced_memory()[0]
+
+    def exceeded(self):
+        """
+        Returns:
+            result: (bool) memory usage is over the limit (raised after flushes)
+        """
+        usage = self.usage()
+        if usage <= self.limit:
+            self.threshold = self.limit
+        return usage > self.threshold
+
+    def flushed(self):
+        """
+        Registers that memory held by processing was released because budget was exceeded. If usage is still over the
+        limit, budget is raised to current usage plus headroom.
+
+        """
+        self.threshold = max(self.limit, self.usage() + self.headroom)
+
+    @classmethod
+    def growth(cls, limit):
+        """
+        Args:
+            limit: (int) bytes the process may grow by from now on
+
+        Returns:
+            budget: (MemoryBudget) budget exceeded when memory grows over limit from current usage, memory of the
+            whole process is measured, so other threads' allocations count too
+        """
+        budget = cls(0)
+        budget.limit = budget.threshold = budget.usage() + limit
+        return budget
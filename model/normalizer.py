@@ -0,0 +1,222 @@
+import re
+from bisect import bisect_right
+
+
+class TextNormalizer(object):
+    """
+    Text normalizer compiled once from replacement rules: removes unnecessary spaces, capitalises and replaces keys
+    with appropriate values. For independent rules gives the same result as joining stripped words with single
+    spaces, capitalising and replacing every key.
+
+    Keys are matched case-insensitively against normalized text, spaces in keys match any whitespace of the input.
+    All rules are applied in the same pass, so output of one rule isn't matched by other rules and, like with
+    str.replace, adjacent matches can't share a space.
+
+    normalize collapses spaces with str.split and join, which run at C speed, and replaces all keys with one
+    alternation of lowercased keys. Only offsets and streaming scan the raw text with the position aware pattern.
+    """
+
+    def __init__(self, replacements=None):
+        self.replacements = dict(replacements or {})
+
+        # keys as they appear in lowercased normalized text
+        self.lowered = {}
+        for key in sorted([key for key in self.replacements if key != ''], key=len, reverse=True):
+            self.lowered.setdefault(re.sub(r'\s+', ' ', key).lower(), self.replacements[key])
+        self.fast_pattern = None
+        if len(self.lowered) > 1:
+            self.fast_pattern = re.compile('|'.join(re.escape(key) for key in self.lowered))
+
+        keys = sorted([key for key in self.replacements if key != ''], key=len, reverse=True)
+        alternatives = []
+        self.group_replacements = {}
+        for index, key in enumerate(keys):
+            alternatives.append(f'(?P<key{index}>{self.key_pattern(key)})')
+            self.group_replacements[f'key{index}'] = self.replacements[key]
+        alternatives.append(r'(?P<space>\s+)')
+
+        self.pattern = re.compile('|'.join(alternatives), re.IGNORECASE)
+        # number of non-space characters which are enough to decide every match before them while streaming
+        self.margin = max([len(key) for key in keys] or [0]) + 2
+
+    @staticmethod
+    def key_pattern(key):
+        """
+        Builds regular expression matching key in raw text as it would be matched in normalized text:
+        spaces match whitespace runs, leading and trailing spaces match only between words.
+
+        Args:
+            key: (str) replacement key
+
+        Returns:
+            pattern: (str) regular expression
+        """
+        parts = re.split(r'(\s+)', key)
+        pattern = ''
+        for index, part in enumerate(parts):
+            if part == '':
+                continue
+            if part.isspace():
+                part_pattern = r'\s+'
+                if index == 1 and parts[0] == '':
+                    part_pattern = r'(?<=\S)' + part_pattern
+                if index == len(parts) - 2 and parts[-1] == '':
+                    part_pattern = part_pattern + r'(?=\S)'
+                pattern += part_pattern
+            else:
+                pattern += re.escape(part)
+        return pattern
+
+    def normalize(self, text, offsets=False):
+        """
+        Normalizes text in a single pass
+
+        Args:
+            text: (str) bank news statement
+            offsets: (bool) return offsets of normalized text pieces in original text too
+
+        Returns:
+            normalized: (str) normalized text
+            spans: (list) only if offsets is True, (output start, output end, source start, source end) tuples
+            for every piece of normalized text (see source_offset)
+        """
+        if not offsets:
+            return self._normalize_fast(text)
+
+        state = {'started': False, 'length': 0}
+        pieces = []
+        spans = []
+        self._process(text, 0, len(text), True, state, pieces, spans, 0)
+        return ''.join(pieces), spans
+
+    def _normalize_fast(self, text):
+        normalized = ' '.join(text.split()).lower()
+        if len(self.lowered) == 0:
+            return normalized[:1].capitalize() + normalized[1:]
+
+        if self.fast_pattern is None:
+            key, replacement = next(iter(self.lowered.items()))
+            starts_with_key = normalized.startswith(key)
+            normalized = normalized.replace(key, replacement)
+        else:
+            starts_with_key = self.fast_pattern.match(normalized) is not None
+            normalized = self.fast_pattern.sub(lambda match: self.lowered[match.group(0)], normalized)
+
+        # replacement at the beginning isn't capitalised, as replacing keys in capitalised text
+        if starts_with_key:
+            return normalized
+        return normalized[:1].capitalize() + normalized[1:]
+
+    def normalize_batch(self, texts):
+        """
+        Args:
+            texts: (list) bank news statements
+
+        Returns:
+            normalized: (list) normalized texts
+        """
+        return [self.normalize(text) for text in texts]
+
+    def normalize_stream(self, chunks):
+        """
+        Normalizes text given in chunks (e.g. read from file or socket) without joining it first.
+        Concatenation of yielded pieces equals to normalized concatenation of chunks.
+
+        Args:
+            chunks: (iterable) of text chunks
+
+        Returns:
+            pieces: (generator) of normalized text pieces
+        """
+        state = {'started': False, 'length': 0}
+        buffer = ''
+        position = 0
+        offset = 0
+        for chunk in chunks:
+            buffer += chunk
+            stop = self._safe_stop(buffer)
+            if stop <= position:
+                continue
+
+            pieces = []
+            position = self._process(buffer, position, stop, False, state, pieces, None, offset)
+            yield ''.join(pieces)
+
+            # keep one processed character, so lookbehind of keys sees it
+            cut = max(position - 1, 0)
+            buffer = buffer[cut:]
+            offset += cut
+            position -= cut
+
+        pieces = []
+        self._process(buffer, position, len(buffer), True, state, pieces, None, offset)
+        yield ''.join(pieces)
+
+    @staticmethod
+    def source_offset(spans, index):
+        """
+        Maps position in normalized text to position in original text
+
+        Args:
+            spans: (list) spans returned by normalize
+            index: (int) position in normalized text
+
+        Returns:
+            offset: (int) position in original text
+        """
+        if len(spans) == 0:
+            return 0
+
+        span = spans[max(bisect_right(spans, (index, float('inf'))) - 1, 0)]
+        output_start, output_end, source_start, source_end = span
+        if output_end - output_start == source_end - source_start:
+            return source_start + min(index - output_start, source_end - source_start)
+        return source_start
+
+    def _safe_stop(self, buffer):
+        count = 0
+        for index in range(len(buffer) - 1, -1, -1):
+            if not buffer[index].isspace():
+                count += 1
+                if count == self.margin:
+                    return index
+        return 0
+
+    def _process(self, text, position, stop, final, state, pieces, spans, offset):
+        for match in self.pattern.finditer(text, position):
+            if match.start() >= stop:
+                break
+
+            if match.start() > position:
+                self._emit_text(text[position:match.start()], offset + position, state, pieces, spans)
+
+            if match.lastgroup == 'space':
+                if state['started'] and not (final and match.end() == len(text)):
+                    self._emit(' ', offset + match.start(), offset + match.end(), state, pieces, spans)
+            else:
+                state['started'] = True
+                self._emit(self.group_replacements[match.lastgroup], offset + match.start(), offset + match.end(),
+                           state, pieces, spans)
+            position = match.end()
+
+        end = len(text) if final else stop
+        if position < end:
+            self._emit_text(text[position:end], offset + position, state, pieces, spans)
+            position = end
+
+        return position
+
+    def _emit_text(self, piece, source_start, state, pieces, spans):
+        if state['started']:
+            normalized = piece.lower()
+        else:
+            normalized = piece.capitalize()
+            state['started'] = True
+        self._emit(normalized, source_start, source_start + len(piece), state, pieces, spans)
+
+    @staticmethod
+    def _emit(piece, source_start, source_end, state, pieces, spans):
+        pieces.append(piece)
+        if spans is not None:
+            spans.append((state['length'], state['length'] + len(piece), source_start, source_end))
+        state['length'] += len(piece)
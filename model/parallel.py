@@ -0,0 +1,259 @@
+import itertools
+import multiprocessing
+import queue
+import re
+import threading
+import time
+
+import spacy
+
+from model.data_extraction import DataExtractor
+from model.helpers import Deadline
+from model.tree import SentenceTrees
+
+SENTENCE_END = re.compile(r'(?<=[.;!?])\s+')
+# chunks running when request deadline expires stop at the next sentence, their results are waited for a bit longer
+DEADLINE_GRACE = 1.0
+
+_worker = {}
+
+
+def split_sentences(text, chunk_size=20000):
+    """
+    Splits text into chunks at sentence ends, so that every chunk is not longer than chunk_size characters
+    (unless a single sentence is longer).
+
+    Args:
+        text: (str) bank news statement
+        chunk_size: (int) maximum number of characters in chunk
+
+    Returns:
+        chunks: (list) of text chunks in document order
+    """
+    chunks = []
+    start = 0
+    previous = None
+    for match in SENTENCE_END.finditer(text):
+        if previous is not None and match.start() - start > chunk_size:
+            chunks.append(text[start:previous.start()])
+            start = previous.end()
+        previous = match
+
+    if previous is not None and len(text) - start > chunk_size and previous.start() > start:
+        chunks.append(text[start:previous.start()])
+        start = previous.end()
+
+    chunks.append(text[start:])
+    return [chunk for chunk in chunks if len(chunk) > 0]
+
+
+def _init_worker(nlp, model, context_file, active, relation_model=None):
+    if nlp is None:
+        nlp = spacy.load(relation_model or model)
+    _worker['data_extractor'] = DataExtractor(spacy_model=nlp, context_file=context_file,
+                                              relation_model=relation_model)
+    _worker['active'] = active
+
+
+class RequestDeadline(Deadline):
+    """
+    Deadline of request in worker process: expires at request's absolute end time or as soon as the request
+    abandons its remaining chunks (its slot in shared 'active' array doesn't hold its token anymore).
+    """
+
+    def __init__(self, end, slot, token):
+        super(RequestDeadline, self).__init__(0)
+        self.end = end if end is not None else float('inf')
+        self.slot = slot
+        self.token = token
+
+    def abandoned(self):
+        """
+        Returns:
+            result: (bool) request doesn't need results of its chunks anymore
+        """
+        return _worker['active'][self.slot] != self.token
+
+    def expired(self):
+        if not self.exceeded and (self.abandoned() or time.monotonic() >= self.end):
+            self.exceeded = True
+        return self.exceeded
+
+
+def _search_chunk(chunk, targets, end, slot, token):
+    data_extractor = _worker['data_extractor']
+    deadline = RequestDeadline(end, slot, token)
+    if deadline.expired():
+        return {target: [] for target, _ in targets}, True
+
+    doc = data_extractor.spacy(chunk)
+    if data_extractor.relation_parser is not None:
+        results = {target: data_extractor.relation_parser.search(doc, target) for target, _ in targets}
+    else:
+        sentences = SentenceTrees(doc)
+        results = {target: data_extractor.search(doc, context_trees, deadline=deadline, sentences=sentences)
+                   for target, context_trees in targets}
+    return results, deadline.exceeded
+
+
+class ParallelExtractor(object):
+    """
+    Analyses very large statements (e.g. full Inflation Report pages) in parallel: text is split into sentence aligned
+    chunks which are parsed and matched in a process pool. Chunk results are merged in document order, so the first
+    found value is the same as analysing the whole text at once (sentences are never split, but spacy may split
+    sentences slightly differently at chunk edges). Smaller texts are analysed in the calling process.
+    """
+
+    def __init__(self, data_extractor, processes=None, chunk_size=20000, min_length=50000, model='en', slots=64,
+                 max_wait=600.0):
+        """
+        Args:
+            data_extractor: (DataExtractor) extractor whose spacy model, context file and relation model are used by
+            workers
+            processes: (int) number of worker processes, number of cpus by default
+            chunk_size: (int) maximum number of characters in chunk
+            min_length: (int) texts shorter than this are analysed without splitting
+            model: (str) spacy model name to load in workers if processes can't be forked with loaded model
+            slots: (int) maximum number of texts analysed in parallel at the same time
+            max_wait: (float) maximum time in seconds to wait for chunks of text analysed without deadline, results of
+            chunks lost by killed or crashed workers never come
+        """
+        self.chunk_size = chunk_size
+        self.min_length = min_length
+        self.max_wait = max_wait
+        self.tokens = itertools.count(1)
+        self.tokens_lock = threading.Lock()
+        self.free_slots = queue.Queue()
+        for slot in range(slots):
+            self.free_slots.put(slot)
+
+        self.processes = processes
+        self.model = model
+        start_methods = multiprocessing.get_all_start_methods()
+        if 'fork' in start_methods:
+            # forked workers share already loaded model with the parent process
+            self.context = multiprocessing.get_context('fork')
+        else:
+            self.context = multiprocessing.get_context()
+        # restarted workers load the model themselves, forking from a process running other threads may deadlock
+        self.restart_context = multiprocessing.get_context('forkserver' if 'forkserver' in start_methods else 'spawn')
+        # token of the text analysed in every slot, chunks of abandoned texts are skipped or stopped early
+        self.active = self.context.RawArray('q', slots)
+        self.pool_lock = threading.Lock()
+        self.pool = self._start_pool(data_extractor)
+
+    def _start_pool(self, data_extractor, context=None):
+        context = context if context is not None else self.context
+        nlp = data_extractor.spacy if context.get_start_method() == 'fork' else None
+        initargs = (nlp, self.model, data_extractor.context_file, self.active, data_extractor.relation_model)
+        return context.Pool(self.processes, initializer=_init_worker, initargs=initargs)
+
+    def replace_model(self, data_extractor):
+        """
+        Restarts worker processes with freshly loaded spacy model, so their vocab doesn't grow forever
+        (see ModelRecycler). New workers aren't forked from this process (it runs request threads by now), they are
+        started by forkserver or spawned and load the model themselves. Chunks already queued in the old pool are
+        finished by its workers, which stop then.
+
+        Args:
+            data_extractor: (DataExtractor) extractor whose context file and relation model are used by new workers
+
+        Returns:
+            result: (bool) workers were restarted
+        """
+        with self.pool_lock:
+            pool = self.pool
+            self.pool = self._start_pool(data_extractor, self.restart_context)
+            pool.close()
+        threading.Thread(target=pool.join, name='parallel-pool-stop', daemon=True).start()
+        return True
+
+    def analyse(self, data_extractor, text, deadline=None, memory_budget=None):
+        """
+        Same as DataExtractor.analyse, but texts longer than min_length are analysed in parallel.
+
+        Args:
+            data_extractor: (DataExtractor) extractor with current contexts
+            text: (str or list) bank news
+            deadline: (Deadline) time budget (see DataExtractor.analyse)
+            memory_budget: (MemoryBudget) memory budget checked between texts (see DataExtractor.analyse)
+
+        Returns:
+            results: (list) analysis results (see DataExtractor.analyse)
+        """
+        if text is None or (not isinstance(text, str) and not isinstance(text, list)):
+            return data_extractor.analyse(text)
+
+        texts = [text] if isinstance(text, str) else text
+        all_results = []
+        for news in texts:
+            if len(news) < self.min_length or (deadline is not None and deadline.expired()) or \
+                    (memory_budget is not None and memory_budget.exceeded()):
+                all_results.extend(data_extractor.analyse(news, deadline, memory_budget))
+            else:
+                all_results.append(self.analyse_news(data_extractor, data_extractor.filter(news), deadline))
+        return all_results
+
+    def analyse_news(self, data_extractor, news, deadline=None):
+        """
+        Analyses single filtered bank news in parallel chunks
+
+        Args:
+            data_extractor: (DataExtractor) extractor with current contexts
+            news: (str) filtered bank news
+            deadline: (Deadline) time budget (see DataExtractor.analyse)
+
+        Returns:
+            result: (dict) contains news string and found values of all targets, status is partial if deadline was
+            exceeded or results of some chunk didn't come in time
+        """
+        targets = data_extractor.targets()
+        end = deadline.end if deadline is not None else None
+        wait_end = end + DEADLINE_GRACE if end is not None else time.monotonic() + self.max_wait
+
+        slot = self.free_slots.get()
+        with self.tokens_lock:
+            token = next(self.tokens)
+        self.active[slot] = token
+        try:
+            # chunks are separate tasks, so other requests' chunks are interleaved with them in the pool
+            chunks = split_sentences(news, self.chunk_size)
+            with self.pool_lock:
+                tasks = [self.pool.apply_async(_search_chunk, (chunk, targets, end, slot, token)) for chunk in chunks]
+
+            found = {}
+            exceeded = False
+            timed_out = False
+            # results are taken in document order, stop waiting as soon as every target has its first value
+            for task in tasks:
+                try:
+                    results, chunk_exceeded = task.get(timeout=max(0.0, wait_end - time.monotonic()))
+                except multiprocessing.TimeoutError:
+                    # worker running the chunk may be dead, remaining chunks are abandoned
+                    timed_out = True
+                    break
+                exceeded = exceeded or chunk_exceeded
+                for target, _ in targets:
+                    if target not in found and len(results[target]) > 0:
+                        found[target] = results[target][0]
+                # values found in later chunks may not be the first ones if this chunk was cut short
+                if len(found) == len(targets) or chunk_exceeded:
+                    break
+        finally:
+            # remaining chunks of this text return immediately or stop at the next sentence
+            self.active[slot] = 0
+            self.free_slots.put(slot)
+
+        result = {'news': news}
+        for target, _ in targets:
+            result[target] = found.get(target, "")
+        if timed_out:
+            result['status'] = 'partial'
+        elif deadline is not None:
+            result['status'] = 'partial' if exceeded and len(found) < len(targets) else 'complete'
+        return result
+
+    def close(self):
+        """Stops worker processes"""
+        self.pool.terminate()
+        self.pool.join()
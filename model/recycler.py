@@ -0,0 +1,193 @@
+import gc
+import threading
+import time
+
+from model.memory import MemoryBudget
+
+
+class ModelRecycler(object):
+    """
+    Keeps memory of long running service flat. spacy adds every unseen token of analysed texts to vocab and its
+    StringStore, which never shrink, so after max_requests requests or when StringStore or process memory is over its
+    limit, a fresh model is loaded in background and swapped into all context reloaders. Requests which started on
+    the old model finish on it (they are drained) before the old model is released and next recycling may start.
+
+    Every request has to call acquire before it takes data_extractor from reloader and release after it's finished.
+
+    Freed memory is often not given back to the system, so if resident memory stays over max_memory after recycling,
+    the next recycling for memory starts only when it grows by another 10% of max_memory (see MemoryBudget.flushed).
+    """
+
+    def __init__(self, reloaders, max_requests=0, max_strings=0, max_memory=0, min_interval=60.0,
+                 drain_timeout=60.0, loader=None):
+        """
+        Args:
+            reloaders: (list) ContextReloader objects sharing one spacy model, the first one holds the model, and
+            ParallelExtractor whose workers are restarted with the new model
+            max_requests: (int) number of requests after which model is recycled (0 - unlimited)
+            max_strings: (int) size of StringStore after which model is recycled (0 - unlimited)
+            max_memory: (int) resident memory of the process in bytes after which model is recycled (0 - unlimited)
+            min_interval: (float) minimum seconds between two recyclings, memory which isn't given back to the
+            system right after recycling doesn't trigger it again immediately
+            drain_timeout: (float) maximum seconds to wait for requests running on the old model
+            loader: (callable) builds extractor with fresh model from current one, DataExtractor.reload_model by
+            default
+        """
+        self.reloaders = reloaders
+        self.max_requests = max_requests
+        self.max_strings = max_strings
+        self.budget = MemoryBudget(max_memory) if max_memory > 0 else None
+        self.min_interval = min_interval
+        self.drain_timeout = drain_timeout
+        self.loader = loader if loader is not None else lambda data_extractor: data_extractor.reload_model()
+
+        self.condition = threading.Condition()
+        self.generation = 0
+        self.in_flight = {}
+        self.requests = 0
+        self.recycling = None
+        self.last_recycled = time.monotonic()
+        self.counters = {'recycled': 0, 'failed': 0}
+        self.last = None
+
+    def acquire(self):
+        """
+        Registers started request
+
+        Returns:
+            generation: (int) model generation of the request, has to be given to release
+        """
+        with self.condition:
+            self.in_flight[self.generation] = self.in_flight.get(self.generation, 0) + 1
+            return self.generation
+
+    def release(self, generation):
+        """
+        Registers finished request and starts recycling if it's due
+
+        Args:
+            generation: (int) model generation returned by acquire
+
+        """
+        with self.condition:
+            # requests of the old model which weren't drained in time are already forgotten
+            remaining = self.in_flight.pop(generation, 0) - 1
+            if remaining > 0 or generation == self.generation:
+                self.in_flight[generation] = max(remaining, 0)
+            self.requests += 1
+            self.condition.notify_all()
+
+        reason = self.due()
+        if reason is not None:
+            self.start(reason)
+
+    def strings(self):
+        """
+        Returns:
+            size: (int) number of strings in StringStore of current model
+        """
+        return len(self.reloaders[0].data_extractor.spacy.vocab.strings)
+
+    def due(self):
+        """
+        Returns:
+            reason: (str) 'requests', 'strings' or 'memory' if model should be recycled else None
+        """
+        if self.recycling is not None or time.monotonic() - self.last_recycled < self.min_interval:
+            return None
+        if 0 < self.max_requests <= self.requests:
+            return 'requests'
+        if 0 < self.max_strings < self.strings():
+            return 'strings'
+        if self.budget is not None and self.budget.exceeded():
+            return 'memory'
+        return None
+
+    def start(self, reason):
+        """
+        Starts recycling in background thread
+
+        Args:
+            reason: (str) reason reported in stats
+
+        Returns:
+            result: (bool) recycling was started, False if it's already running
+        """
+        with self.condition:
+            if self.recycling is not None:
+                return False
+            recycling = threading.Thread(target=self.recycle, args=(reason,), name='model-recycler', daemon=True)
+            self.recycling = recycling
+        recycling.start()
+        return True
+
+    def wait(self, timeout=None):
+        """
+        Waits until running recycling is finished
+
+        Args:
+            timeout: (float) maximum seconds to wait
+
+        Returns:
+            result: (bool) no recycling is running
+        """
+        recycling = self.recycling
+        if recycling is not None:
+            recycling.join(timeout)
+        return self.recycling is None
+
+    def recycle(self, reason='manual'):
+        """
+        Loads fresh model, swaps it into all reloaders and waits until requests on the old model are finished
+
+        Args:
+            reason: (str) reason reported in stats
+
+        """
+        report = {'reason': reason, 'requests': self.requests, 'strings_before': self.strings(),
+                  'memory_before': MemoryBudget(0).usage()}
+        try:
+            start = time.monotonic()
+            fresh = self.loader(self.reloaders[0].data_extractor)
+            report['load_seconds'] = time.monotonic() - start
+
+            swapped = [reloader.replace_model(fresh) for reloader in self.reloaders]
+            del fresh
+            with self.condition:
+                # requests acquired from now on take new model
+                old_generation = self.generation
+                self.generation += 1
+                self.requests = 0
+                self.last_recycled = time.monotonic()
+                start = time.monotonic()
+                drained = self.condition.wait_for(lambda: self.in_flight.get(old_generation, 0) == 0,
+                                                  self.drain_timeout)
+                self.in_flight.pop(old_generation, None)
+            report.update({'swapped': sum(swapped), 'drained': drained, 'drain_seconds': time.monotonic() - start})
+
+            gc.collect()
+            report.update({'strings_after': self.strings(), 'memory_after': MemoryBudget(0).usage()})
+            self.counters['recycled'] += 1
+        except Exception as error:
+            report['error'] = f'{type(error).__name__}: {error}'
+            self.counters['failed'] += 1
+            with self.condition:
+                self.last_recycled = time.monotonic()
+        finally:
+            if self.budget is not None:
+                self.budget.flushed()
+            self.last = report
+            with self.condition:
+                self.recycling = None
+
+    def stats(self):
+        """
+        Returns:
+            stats: (dict) with keys [generation, requests, strings, memory, in_flight, recycling, recycled, failed,
+            last], last is report of the last recycling
+        """
+        with self.condition:
+            in_flight = sum(self.in_flight.values())
+        return dict(self.counters, generation=self.generation, requests=self.requests, strings=self.strings(),
+                    memory=MemoryBudget(0).usage(), in_flight=in_flight, recycling=self.recycling is not None,
+                    last=self.last)
@@ -0,0 +1,196 @@
+import random
+
+from model.history import parse_value
+
+# target names as keys and relation labels predicted by the parser as values
+LABELS = {'Bank_Rate': 'BANK_RATE', 'QE': 'QE'}
+NO_RELATION = '-'
+
+# phrases (lowercased token texts) which values of the target are related to, value is attached to the last token
+ANCHORS = {'Bank_Rate': [('bank', 'rate')],
+           'QE': [('purchased', 'assets'), ('asset', 'purchases'), ('asset', 'purchase'), ('gilt', 'purchases'),
+                  ('stock',)]}
+
+
+def find_phrases(words, phrases):
+    """
+    Args:
+        words: (list) lowercased token texts
+        phrases: (list) of tuples of lowercased token texts
+
+    Returns:
+        indexes: (list) sorted indexes of last tokens of found phrases
+    """
+    indexes = set()
+    for phrase in phrases:
+        for start in range(len(words) - len(phrase) + 1):
+            if tuple(words[start:start + len(phrase)]) == phrase:
+                indexes.add(start + len(phrase) - 1)
+    return sorted(indexes)
+
+
+def find_relation(words, target, value):
+    """
+    Finds the token of labeled value and the anchor token it's related to. Of all occurrences of the value the one
+    closest after an anchor is chosen (or closest before one if value never follows an anchor).
+
+    Args:
+        words: (list) lowercased token texts
+        target: (str) Bank_Rate or QE
+        value: (str) labeled value, e.g. '0.5%' or '£375'
+
+    Returns:
+        relation: (tuple) (anchor index, value index) or None if value or anchor isn't found
+    """
+    number = parse_value(value)
+    anchors = find_phrases(words, ANCHORS[target])
+    if number is None or len(anchors) == 0:
+        return None
+
+    best = None
+    for index, word in enumerate(words):
+        if parse_value(word) != number:
+            continue
+        for anchor in anchors:
+            # anchors before the value are preferred over anchors after it
+            distance = (0, index - anchor) if anchor < index else (1, anchor - index)
+            if best is None or distance < best[0]:
+                best = (distance, anchor, index)
+    return best[1:] if best is not None else None
+
+
+def annotate(words, values):
+    """
+    Builds parser annotation of text with known values: every value token is attached to its anchor with relation
+    label of its target, other tokens get NO_RELATION label. Tokens between an anchor and its value are attached
+    to the anchor and all remaining tokens to the root (anchor of the first relation), so the tree is projective.
+    Relations whose spans overlap an earlier relation are dropped.
+
+    Args:
+        words: (list) lowercased token texts
+        values: (dict) target names as keys and labeled values as values, empty values are skipped
+
+    Returns:
+        annotation: (dict) with keys [heads, deps] or None if no relation is found
+    """
+    relations = []
+    for target, value in values.items():
+        relation = find_relation(words, target, value) if value else None
+        if relation is None:
+            continue
+        span = (min(relation), max(relation))
+        if all(span[1] < other[0] or span[0] > other[1] for other, _, _ in relations):
+            relations.append((span, relation, LABELS[target]))
+    if len(relations) == 0:
+        return None
+
+    relations.sort()
+    root = relations[0][1][0]
+    heads = [root] * len(words)
+    deps = [NO_RELATION] * len(words)
+    for (start, end), (anchor, value), label in relations:
+        for index in range(start, end + 1):
+            if index != anchor:
+                heads[index] = anchor
+        deps[value] = label
+    deps[root] = 'ROOT'
+    return {'heads': heads, 'deps': deps}
+
+
+def build_examples(nlp, texts, labels, rules=None):
+    """
+    Builds training examples from labeled texts. Values of targets without labels are labeled by context rules of
+    given extractor (weak labels), so values which aren't labeled aren't learned as negative examples.
+
+    Args:
+        nlp: (Language) pipeline whose tokenizer is used
+        texts: (list) filtered bank news (see DataExtractor.filter)
+        labels: (dict) target names as keys and lists of labeled values as values, may be empty
+        rules: (DataExtractor) extractor labeling targets which aren't in labels
+
+    Returns:
+        examples: (list) of (Doc, annotation) tuples, texts without any found relation are skipped
+    """
+    weak = [target for target in LABELS if target not in labels]
+    weak_results = rules.analyse(list(texts)) if rules is not None and len(weak) > 0 else None
+
+    examples = []
+    for index, text in enumerate(texts):
+        doc = nlp.make_doc(text)
+        values = {target: target_labels[index] for target, target_labels in labels.items()}
+        if weak_results is not None:
+            values.update({target: weak_results[index][target] for target in weak})
+        annotation = annotate([token.lower_ for token in doc], values)
+        if annotation is not None:
+            examples.append((doc, annotation))
+    return examples
+
+
+def train(examples, n_iter=20, dropout=0.2, seed=0, lang='en'):
+    """
+    Trains parser of relation labels on blank pipeline of the language, as in utils/spacy_example.py. Pipeline
+    contains only tokenizer and the parser, so it's much smaller and faster than general English model.
+
+    Args:
+        examples: (list) of (Doc, annotation) tuples (see build_examples)
+        n_iter: (int) number of training iterations
+        dropout: (float) dropout rate
+        seed: (int) random seed of example shuffling
+        lang: (str) language of the blank pipeline
+
+    Returns:
+        nlp: (Language) trained pipeline
+        losses: (list) parser loss of every iteration
+    """
+    import spacy
+    from spacy.util import minibatch, compounding
+
+    nlp = spacy.blank(lang)
+    parser = nlp.create_pipe('parser')
+    nlp.add_pipe(parser, first=True)
+    for label in list(LABELS.values()) + [NO_RELATION]:
+        parser.add_label(label)
+    nlp.meta['name'] = 'bank_relations'
+
+    examples = [(nlp.make_doc(doc.text), annotation) for doc, annotation in examples]
+    shuffler = random.Random(seed)
+    optimizer = nlp.begin_training()
+    iteration_losses = []
+    for _ in range(n_iter):
+        shuffler.shuffle(examples)
+        losses = {}
+        for batch in minibatch(examples, size=compounding(4.0, 32.0, 1.001)):
+            docs, annotations = zip(*batch)
+            nlp.update(list(docs), list(annotations), sgd=optimizer, drop=dropout, losses=losses)
+        iteration_losses.append(losses.get('parser', 0.0))
+    return nlp, iteration_losses
+
+
+class RelationParser(object):
+    """
+    Extracts bank rate and qe values from relation labels predicted by trained relation parser (see train) instead
+    of matching context trees on general dependency parse.
+    """
+
+    def __init__(self, nlp):
+        """
+        Args:
+            nlp: (Language or str) trained pipeline or its directory
+        """
+        if isinstance(nlp, str):
+            import spacy
+            nlp = spacy.load(nlp)
+        assert 'parser' in nlp.pipe_names, 'relation model has no parser!'
+        self.nlp = nlp
+
+    def search(self, doc, target):
+        """
+        Args:
+            doc: (Doc) news parsed by relation pipeline
+            target: (str) Bank_Rate or QE
+
+        Returns:
+            results: (list) values related to the target in order of text
+        """
+        label = LABELS[target]
+        return [token.text for token in doc if token.dep_ == label]
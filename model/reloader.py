@@ -0,0 +1,122 @@
+import os
+import threading
+import time
+
+
+class ContextReloader(object):
+    """
+    Holds current DataExtractor and atomically replaces it with a new one whenever context file changes.
+    New extractor shares already loaded spacy model, only contexts are validated and built again.
+    Callers should take data_extractor once per request, so running requests finish on the old contexts
+    while new requests use the new ones.
+    """
+
+    def __init__(self, data_extractor, context_file=None):
+        self.data_extractor = data_extractor
+        self.context_file = context_file if context_file is not None else data_extractor.context_file
+        self.version = 1
+        self.model_version = 1
+        self.last_error = None
+        self.mtime = self.context_file_mtime()
+        self.lock = threading.Lock()
+        self.watcher = None
+        self.stopped = threading.Event()
+
+    def context_file_mtime(self):
+        """
+        Returns:
+            mtime: (float) last modification time of context file or None if it doesn't exist
+        """
+        try:
+            return os.path.getmtime(self.context_file)
+        except OSError:
+            return None
+
+    def reload(self):
+        """
+        Builds new DataExtractor from context file with shared spacy model and swaps it in if contexts are valid.
+        Invalid or unreadable contexts are reported in last_error and current extractor stays in use.
+
+        Returns:
+            result: (bool) new contexts were swapped in or not
+        """
+        with self.lock:
+            self.mtime = self.context_file_mtime()
+            current = self.data_extractor
+            try:
+                data_extractor = current.share_model(self.context_file)
+            except Exception as error:
+                # invalid or unreadable contexts (e.g. file replaced by editor right now) mustn't stop the service
+                self.last_error = f'{type(error).__name__}: {error}'
+                return False
+
+            self.data_extractor = data_extractor
+            self.version += 1
+            self.last_error = None
+            return True
+
+    def replace_model(self, data_extractor):
+        """
+        Swaps in extractor of the current contexts built on spacy model of given extractor (see ModelRecycler).
+        Running requests finish on the old model. If contexts can't be built, current extractor stays in use.
+
+        Args:
+            data_extractor: (DataExtractor) extractor holding new spacy model
+
+        Returns:
+            result: (bool) new model was swapped in or not
+        """
+        with self.lock:
+            try:
+                new_extractor = data_extractor.share_model(self.context_file)
+            except Exception as error:
+                self.last_error = f'{type(error).__name__}: {error}'
+                return False
+
+            self.data_extractor = new_extractor
+            self.model_version += 1
+            return True
+
+    def status(self):
+        """
+        Returns:
+            status: (dict) with keys [version, model_version, context_file, contexts_fingerprint, last_error]
+        """
+        return {'version': self.version,
+                'model_version': self.model_version,
+                'context_file': self.context_file,
+                'contexts_fingerprint': self.data_extractor.contexts_fingerprint(),
+                'last_error': self.last_error}
+
+    def watch(self, interval=2.0):
+        """
+        Starts background thread which polls context file and reloads contexts when it's modified.
+
+        Args:
+            interval: (float) polling interval in seconds
+
+        """
+        if self.watcher is not None:
+            return
+
+        def poll():
+            while not self.stopped.wait(interval):
+                try:
+                    mtime = self.context_file_mtime()
+                    if mtime is not None and mtime != self.mtime:
+                        # give editor some time to finish writing the file
+                        time.sleep(min(interval, 0.5))
+                        self.reload()
+                except Exception as error:
+                    # watcher keeps running, the file is checked again at the next poll
+                    self.last_error = f'{type(error).__name__}: {error}'
+
+        self.watcher = threading.Thread(target=poll, name='context-reloader', daemon=True)
+        self.watcher.start()
+
+    def stop(self):
+        """Stops watching context file"""
+        self.stopped.set()
+        if self.watcher is not None:
+            self.watcher.join()
+            self.watcher = None
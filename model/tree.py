@@ -1,8 +1,40 @@
 import copy
+from contextlib import nullcontext
 
 from nltk.tree import ParentedTree
 
-from model.helpers import found
+from model.helpers import found, fingerprint
+
+
+def iter_nodes(root, mode='preorder'):
+    """
+    Iterative tree traversal with two modes: 'preorder' and 'postorder'. Nodes are yielded lazily, so traversal can
+    stop at the first needed node, and explicit stack doesn't hit recursion limit on deep trees.
+
+    Args:
+        root: (ParentedTreeWrapper or ContextTree) root of traversed tree, node having list of children
+        mode: (str) traversal mode
+
+    Returns:
+        nodes: (generator) traversed nodes of full tree
+    """
+    assert mode in ('preorder', 'postorder'), f'unknown traversal mode {mode}!'
+    if mode == 'preorder':
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(node.children))
+    else:
+        stack = [(root, iter(root.children))]
+        while stack:
+            node, children = stack[-1]
+            child = next(children, None)
+            if child is None:
+                stack.pop()
+                yield node
+            else:
+                stack.append((child, iter(child.children)))
 
 
 class ParentedTreeWrapper(ParentedTree):
@@ -15,6 +47,7 @@ class ParentedTreeWrapper(ParentedTree):
         self.tag = token.tag_
         self.children = children
         self.token = token
+        self.lowered_subtree_tokens = None
 
     @staticmethod
     def from_spacy_tree(root_token):
@@ -27,12 +60,18 @@ class ParentedTreeWrapper(ParentedTree):
         Returns:
             result: (ParentedTreeWrapper) built tree object
         """
-        if root_token.n_lefts + root_token.n_rights > 0:
-            return ParentedTreeWrapper(root_token,
-                                       [ParentedTreeWrapper.from_spacy_tree(child_token) for child_token in
-                                        root_token.children])
-        else:
-            return ParentedTreeWrapper(root_token, [])
+        # nodes are built bottom up with explicit stack of (token, its remaining children, its built children)
+        built = []
+        stack = [(root_token, iter(root_token.children), [])]
+        while stack:
+            token, children, nodes = stack[-1]
+            child_token = next(children, None)
+            if child_token is not None:
+                stack.append((child_token, iter(child_token.children), []))
+                continue
+            stack.pop()
+            (stack[-1][2] if stack else built).append(ParentedTreeWrapper(token, nodes))
+        return built[0]
 
     def subtree_tokens(self):
         """
@@ -41,10 +80,19 @@ class ParentedTreeWrapper(ParentedTree):
         Returns:
             result:(list) node texts from subtree nodes
         """
-        children_texts = []
-        for child in self.children:
-            children_texts.extend(child.subtree_tokens())
-        return [self.text] + children_texts
+        return [node.text for node in self.iter_traverse()]
+
+    def lower_subtree_tokens(self):
+        """
+        Returns the list of all lowercased subtree texts. It's computed once, because tree doesn't change after it's
+        built and the list is checked by every validator with subtree tokens.
+
+        Returns:
+            result:(list) lowercased node texts from subtree nodes
+        """
+        if self.lowered_subtree_tokens is None:
+            self.lowered_subtree_tokens = [x.lower() for x in self.subtree_tokens()]
+        return self.lowered_subtree_tokens
 
     def is_ancestor(self, node):
         """
@@ -75,13 +123,7 @@ class ParentedTreeWrapper(ParentedTree):
         Returns:
             leaves: (list) containing texts of leaf nodes
         """
-        leaves = []
-        for child in self.children:
-            if len(child.children) > 0:
-                leaves.extend(child.leaves())
-            else:
-                leaves.append(child.text)
-        return leaves
+        return [node.text for node in self.iter_traverse() if node is not self and len(node.children) == 0]
 
     def less(self, tree):
         """
@@ -148,17 +190,19 @@ class ParentedTreeWrapper(ParentedTree):
             result: (list) traversed nodes of full tree
 
         """
-        result = []
-        if mode == 'preorder':
-            result.append(self)
+        return list(self.iter_traverse(mode))
 
-        for child in self.children:
-            result.extend(child.traverse())
+    def iter_traverse(self, mode='preorder'):
+        """
+        Lazy tree traversal, see iter_nodes
 
-        if mode == 'postorder':
-            result.append(self)
+        Args:
+            mode: (str) traversal mode
 
-        return result
+        Returns:
+            result: (generator) traversed nodes of full tree
+        """
+        return iter_nodes(self, mode)
 
     def valid(self, **kwargs):
         """
@@ -185,7 +229,7 @@ class ParentedTreeWrapper(ParentedTree):
             is_valid = False
 
         if is_valid:
-            subtree_tokens = [x.lower() for x in self.subtree_tokens()]
+            subtree_tokens = self.lower_subtree_tokens()
             good_tokens = kwargs.get("good_subtree_tokens", None)
             bad_tokens = kwargs.get("bad_subtree_tokens", None)
 
@@ -206,22 +250,41 @@ class ParentedTreeWrapper(ParentedTree):
         Returns:
             result: (list) containing ParentedTreeWrapper "valid" nodes
         """
-        result = []
-        for subtree in self.traverse():
-            if subtree.valid(**kwargs):
-                result.append(subtree)
+        return list(self.iter_with_properties(**kwargs))
 
-        return result
+    def iter_with_properties(self, **kwargs):
+        """
+        Lazy version of find_with_properties, stops validating nodes once the caller stops iterating
 
-    def deepcopy(self):
+        Args:
+            **kwargs: (dict) parameters with names [pos, dep, lemma, text,....,] to match dependency tree nodes
+
+        Returns:
+            result: (generator) of ParentedTreeWrapper "valid" nodes
+        """
+        return (subtree for subtree in self.iter_traverse() if subtree.valid(**kwargs))
+
+    def deepcopy(self, memo=None):
         """
-        Create deepcopy Create deepcopy of current object
+        Create deepcopy of current object. Nodes are copied bottom up with explicit stack, so deep trees don't hit
+        recursion limit. Only the subtree is copied (copy has no parent), spacy tokens are shared with the original.
+
+        Args:
+            memo: (dict) ids of already copied nodes as keys and their copies as values, filled with copied nodes, so
+            nodes shared by several copied subtrees are copied once
 
         Returns:
             new_object: (ParentedTreeWrapper)
         """
-        new_object = copy.deepcopy(self)
-        return new_object
+        memo = {} if memo is None else memo
+        for node in iter_nodes(self, 'postorder'):
+            if id(node) in memo:
+                continue
+            new_node = ParentedTreeWrapper(node.token, [memo[id(child)] for child in node.children])
+            if node.lowered_subtree_tokens is not None:
+                new_node.lowered_subtree_tokens = list(node.lowered_subtree_tokens)
+            memo[id(node)] = new_node
+        return memo[id(self)]
 
     def _get_node(self):
         pass
@@ -230,13 +293,90 @@ class ParentedTreeWrapper(ParentedTree):
         pass
 
 
+class ValidatorCache(object):
+    """
+    Cache of validator evaluations on one sentence tree. Nodes with identical validators of all context cases and
+    targets share validator key (see DataExtractor.share_validators), so every distinct validator is evaluated once
+    per tree node and its candidates found under the same tree node are reused by all cases.
+    """
+
+    def __init__(self):
+        self.validity = {}
+        self.candidates = {}
+
+    def find_with_properties(self, tree, key, validator):
+        """
+        Same as tree.find_with_properties(**validator), but evaluations are cached by validator key.
+
+        Args:
+            tree: (ParentedTreeWrapper) node of sentence tree to search in
+            key: (str) validator key
+            validator: (dict) parameters with names [pos, dep, lemma, text,....,] to match dependency tree nodes
+
+        Returns:
+            result: (list) containing ParentedTreeWrapper "valid" nodes
+        """
+        candidates = self.candidates.get((key, id(tree)))
+        if candidates is None:
+            candidates = []
+            for subtree in tree.iter_traverse():
+                valid = self.validity.get((key, id(subtree)))
+                if valid is None:
+                    valid = subtree.valid(**validator)
+                    self.validity[(key, id(subtree))] = valid
+                if valid:
+                    candidates.append(subtree)
+            self.candidates[(key, id(tree))] = candidates
+        return candidates
+
+
+class SentenceTrees(object):
+    """
+    Dependency trees of sentences of one parsed document, each with its ValidatorCache. Trees are built lazily when
+    matching first reaches their sentence and kept, so all targets matched on the document share trees and validator
+    evaluations.
+    """
+
+    def __init__(self, doc, stage=None):
+        """
+        Args:
+            doc: (Doc) parsed document
+            stage: (callable) takes stage name and returns context manager accounting memory of building trees
+            (see DataExtractor.memory_stage)
+        """
+        self.doc = doc
+        self.sentences = None
+        self.trees = []
+        self.stage = stage
+
+    def __iter__(self):
+        """
+        Returns:
+            trees: (generator) of (ParentedTreeWrapper, ValidatorCache) tuples in order of sentences
+        """
+        if self.sentences is None:
+            self.sentences = iter(self.doc.sents)
+        index = 0
+        while True:
+            if index == len(self.trees):
+                span = next(self.sentences, None)
+                if span is None:
+                    return
+                with self.stage('sentence_trees') if self.stage is not None else nullcontext():
+                    self.trees.append((ParentedTreeWrapper.from_spacy_tree(span.root), ValidatorCache()))
+            yield self.trees[index]
+            index += 1
+
+
 class ContextTree:
     def __init__(self):
+        self.case = None
         self.label = None
         self.parent = None
         self.children = []
         self.validated = False
         self.validator = None
+        self.validator_key = None
         self.good_subtree_tokens = []
         self.bad_subtree_tokens = []
         self.extract = False
@@ -271,17 +411,19 @@ class ContextTree:
             result: (list) traversed nodes of full tree
 
         """
-        result = []
-        if mode == 'preorder':
-            result.append(self)
+        return list(self.iter_traverse(mode))
 
-        for child in self.children:
-            result.extend(child.traverse())
+    def iter_traverse(self, mode='preorder'):
+        """
+        Lazy tree traversal, see iter_nodes
 
-        if mode == 'postorder':
-            result.append(self)
+        Args:
+            mode: (str) traversal mode
 
-        return result
+        Returns:
+            result: (generator) traversed nodes of full tree
+        """
+        return iter_nodes(self, mode)
 
     def traverse_and_get(self, param_name):
         """
@@ -294,11 +436,7 @@ class ContextTree:
             result: (list) traversed nodes parameters if exist
 
         """
-        result = []
-        for subtree in self.traverse():
-            if hasattr(subtree, param_name):
-                result.append(getattr(subtree, param_name))
-        return result
+        return [getattr(subtree, param_name) for subtree in self.iter_traverse() if hasattr(subtree, param_name)]
 
     def traverse_and_extract(self):
         """
@@ -309,11 +447,16 @@ class ContextTree:
             result: (list) required found_values contained in context tree nodes
 
         """
-        result = []
-        for subtree in self.traverse():
-            if subtree.extract:
-                result.append(subtree.found_value)
-        return result
+        return [subtree.found_value for subtree in self.iter_traverse() if subtree.extract]
+
+    def matched(self):
+        """
+        Checks if all context tree nodes are validated, stops at the first node which isn't
+
+        Returns:
+            result: (bool) whole context is matched
+        """
+        return all(subtree.validated for subtree in self.iter_traverse())
 
     def is_ancestor(self, node):
         """
@@ -367,7 +510,8 @@ class ContextTree:
 
     def __str__(self):
         """
-        String representation for easy printing
+        String representation for easy printing, candidates are represented by their texts, so printing doesn't
+        recurse into their sentence trees
         Returns:
             result: (str) string of dictionary ContextTree parameters
         """
@@ -380,7 +524,7 @@ class ContextTree:
                   'bad_subtree_tokens': self.bad_subtree_tokens,
                   'self.extract': self.extract,
                   'found_value': self.found_value,
-                  'candidates': self.candidates,
+                  'candidates': [candidate.text for candidate in self.candidates],
                   }
         return str(result)
 
@@ -408,11 +552,47 @@ class ContextTree:
 
         return context_tree
 
+    def fingerprint(self):
+        """
+        Fingerprint of context tree definition: labels, validators, structure and extraction flags of all nodes.
+        Matching state (validated, found_value, candidates) doesn't affect it.
+
+        Returns:
+            result: (str) hex digest of context tree definition
+        """
+        nodes = []
+        for node in self.iter_traverse():
+            nodes.append({'label': node.label,
+                          'parent': None if node.parent is None else node.parent.label,
+                          'children': [child.label for child in node.children],
+                          'validator': node.validator,
+                          'good_subtree_tokens': node.good_subtree_tokens,
+                          'bad_subtree_tokens': node.bad_subtree_tokens,
+                          'extract': node.extract})
+        return fingerprint(nodes)
+
     def deepcopy(self):
         """
-        Create deepcopy of current object
+        Create deepcopy of current object. Nodes are copied without recursion, so deep trees don't hit recursion
+        limit. Copy of this node keeps parent of the original, candidates are copied as subtrees of sentence tree (see
+        ParentedTreeWrapper.deepcopy).
         Returns:
             new_object: (ContextTree)
         """
-        new_object = copy.deepcopy(self)
-        return new_object
+        copies = {}
+        candidates = {}
+        nodes = list(iter_nodes(self))
+        for node in nodes:
+            new_node = copy.copy(node)
+            new_node.validator = copy.deepcopy(node.validator)
+            new_node.good_subtree_tokens = copy.deepcopy(node.good_subtree_tokens)
+            new_node.bad_subtree_tokens = copy.deepcopy(node.bad_subtree_tokens)
+            new_node.candidates = [candidate.deepcopy(candidates) for candidate in node.candidates]
+            copies[id(node)] = new_node
+        # links are copied as they are, parent isn't always the node listing it as child
+        # (see DataExtractor.build_context_trees)
+        for node in nodes:
+            new_node = copies[id(node)]
+            new_node.children = [copies[id(child)] for child in node.children]
+            new_node.parent = copies.get(id(node.parent), node.parent)
+        return copies[id(self)]
@@ -0,0 +1,213 @@
+import json
+import sqlite3
+import time
+import uuid
+
+from model.helpers import fingerprint
+
+
+class WorkQueue(object):
+    """
+    Shared SQLite work queue for distributed batch processing. Coordinator splits corpus into chunks of documents,
+    any number of workers lease chunks, analyse them and commit results. Lease which isn't committed or renewed in time
+    expires and chunk is leased again by another worker, up to max_attempts times.
+
+    Commits are idempotent: results are keyed by document key and the first commit of a chunk wins, so a late commit
+    of a worker whose lease expired is ignored. Enqueueing the same chunks again is ignored too.
+    Database file has to be on a filesystem with working file locks when workers run on several machines.
+    """
+
+    def __init__(self, filename, lease_seconds=300.0, max_attempts=3):
+        self.filename = filename
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        # transactions are started explicitly, write ones with BEGIN IMMEDIATE so lease can't be taken twice
+        self.connection = sqlite3.connect(filename, timeout=60, isolation_level=None, check_same_thread=False)
+        self.create_tables()
+
+    def create_tables(self):
+        """Create queue tables if they don't exist"""
+        self.connection.execute('CREATE TABLE IF NOT EXISTS chunks ('
+                                'id INTEGER PRIMARY KEY AUTOINCREMENT, '
+                                'name TEXT UNIQUE NOT NULL, '
+                                'documents TEXT NOT NULL, '
+                                'size INTEGER NOT NULL, '
+                                'status TEXT NOT NULL, '
+                                'worker TEXT, '
+                                'token TEXT, '
+                                'lease_expires REAL, '
+                                'attempts INTEGER NOT NULL DEFAULT 0, '
+                                'error TEXT, '
+                                'updated REAL NOT NULL)')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS chunks_status ON chunks (status, lease_expires)')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS results ('
+                                'key TEXT PRIMARY KEY, '
+                                'chunk_id INTEGER NOT NULL, '
+                                'result TEXT NOT NULL, '
+                                'worker TEXT NOT NULL, '
+                                'updated REAL NOT NULL)')
+
+    def add_chunks(self, documents, chunk_size=100):
+        """
+        Splits documents into chunks and enqueues them, chunks which are already enqueued are skipped
+
+        Args:
+            documents: (iterable) of (key, text) tuples
+            chunk_size: (int) number of documents in chunk
+
+        Returns:
+            added: (int) number of added chunks
+        """
+        added = 0
+        chunk = []
+        for key, text in documents:
+            chunk.append([key, text])
+            if len(chunk) >= chunk_size:
+                added += self._add_chunk(chunk)
+                chunk = []
+        if len(chunk) > 0:
+            added += self._add_chunk(chunk)
+        return added
+
+    def _add_chunk(self, chunk):
+        cursor = self.connection.execute('INSERT OR IGNORE INTO chunks (name, documents, size, status, updated) '
+                                         'VALUES (?, ?, ?, ?, ?)',
+                                         (fingerprint(chunk), json.dumps(chunk, ensure_ascii=False), len(chunk),
+                                          'pending', time.time()))
+        return cursor.rowcount
+
+    def lease(self, worker):
+        """
+        Leases next pending chunk or chunk with expired lease
+
+        Args:
+            worker: (str) worker name
+
+        Returns:
+            lease: (dict) with keys [id, token, documents] or None if there is nothing to lease now
+        """
+        now = time.time()
+        self.connection.execute('BEGIN IMMEDIATE')
+        try:
+            # chunks whose lease expired too many times are given up
+            self.connection.execute("UPDATE chunks SET status = 'failed', error = 'lease expired', updated = ? "
+                                    "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                                    (now, now, self.max_attempts))
+            row = self.connection.execute("SELECT id, documents FROM chunks WHERE status = 'pending' OR "
+                                          "(status = 'leased' AND lease_expires < ?) ORDER BY id LIMIT 1",
+                                          (now,)).fetchone()
+            if row is None:
+                self.connection.execute('COMMIT')
+                return None
+
+            token = uuid.uuid4().hex
+            self.connection.execute("UPDATE chunks SET status = 'leased', worker = ?, token = ?, lease_expires = ?, "
+                                    "attempts = attempts + 1, updated = ? WHERE id = ?",
+                                    (worker, token, now + self.lease_seconds, now, row[0]))
+            self.connection.execute('COMMIT')
+        except sqlite3.Error:
+            self.connection.execute('ROLLBACK')
+            raise
+        return {'id': row[0], 'token': token, 'documents': json.loads(row[1])}
+
+    def renew(self, lease):
+        """
+        Extends lease of the chunk while it's being processed
+
+        Args:
+            lease: (dict) lease returned by lease
+
+        Returns:
+            result: (bool) lease is still held by the caller
+        """
+        now = time.time()
+        cursor = self.connection.execute("UPDATE chunks SET lease_expires = ?, updated = ? WHERE id = ? AND "
+                                         "token = ? AND status = 'leased'",
+                                         (now + self.lease_seconds, now, lease['id'], lease['token']))
+        return cursor.rowcount == 1
+
+    def commit(self, lease, results, worker):
+        """
+        Stores results of the chunk and marks it done. Chunk which is already done isn't changed.
+
+        Args:
+            lease: (dict) lease returned by lease
+            results: (dict) document keys as keys and analysis results as values
+            worker: (str) worker name
+
+        Returns:
+            result: (bool) results were stored, False if chunk was already committed
+        """
+        now = time.time()
+        self.connection.execute('BEGIN IMMEDIATE')
+        try:
+            status = self.connection.execute('SELECT status FROM chunks WHERE id = ?', (lease['id'],)).fetchone()
+            if status is None or status[0] == 'done':
+                self.connection.execute('COMMIT')
+                return False
+
+            self.connection.executemany('INSERT OR REPLACE INTO results (key, chunk_id, result, worker, updated) '
+                                        'VALUES (?, ?, ?, ?, ?)',
+                                        [(key, lease['id'], json.dumps(result, ensure_ascii=False), worker, now)
+                                         for key, result in results.items()])
+            self.connection.execute("UPDATE chunks SET status = 'done', worker = ?, lease_expires = NULL, "
+                                    "error = NULL, updated = ? WHERE id = ?", (worker, now, lease['id']))
+            self.connection.execute('COMMIT')
+        except sqlite3.Error:
+            self.connection.execute('ROLLBACK')
+            raise
+        return True
+
+    def release(self, lease, error):
+        """
+        Gives chunk back after processing failed, it's retried unless it failed max_attempts times
+
+        Args:
+            lease: (dict) lease returned by lease
+            error: (str) error description
+
+        """
+        self.connection.execute("UPDATE chunks SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' "
+                                "END, error = ?, lease_expires = NULL, updated = ? WHERE id = ? AND token = ? AND "
+                                "status = 'leased'", (self.max_attempts, error, time.time(), lease['id'],
+                                                      lease['token']))
+
+    def progress(self):
+        """
+        Returns:
+            progress: (dict) with keys [chunks, documents, done_documents, pending, leased, done, failed, workers],
+            workers contains number of committed documents of every worker
+        """
+        progress = {'chunks': 0, 'documents': 0, 'done_documents': 0, 'pending': 0, 'leased': 0, 'done': 0,
+                    'failed': 0}
+        for status, chunks, documents in self.connection.execute('SELECT status, COUNT(*), SUM(size) FROM chunks '
+                                                                 'GROUP BY status'):
+            progress[status] = chunks
+            progress['chunks'] += chunks
+            progress['documents'] += documents
+            if status == 'done':
+                progress['done_documents'] = documents
+        progress['workers'] = dict(self.connection.execute('SELECT worker, COUNT(*) FROM results GROUP BY worker'))
+        return progress
+
+    def finished(self):
+        """
+        Returns:
+            result: (bool) every chunk is done or failed
+        """
+        return self.connection.execute("SELECT COUNT(*) FROM chunks WHERE status IN ('pending', 'leased')"
+                                       ).fetchone()[0] == 0
+
+    def results(self):
+        """
+        Iterates over committed results
+
+        Returns:
+            results: (generator) of (key, result) tuples
+        """
+        for key, result in self.connection.execute('SELECT key, result FROM results ORDER BY key'):
+            yield key, json.loads(result)
+
+    def close(self):
+        """Close database connection"""
+        self.connection.close()
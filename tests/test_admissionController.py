@@ -0,0 +1,45 @@
+import threading
+from unittest import TestCase
+
+from utils.admission import AdmissionController
+
+
+class TestAdmissionController(TestCase):
+    def test_acquire(self):
+        admission = AdmissionController(max_in_flight=2, max_queue=0, queue_timeout=0.1)
+
+        self.assertTrue(admission.acquire())
+        self.assertTrue(admission.acquire())
+        self.assertFalse(admission.acquire(), "request over limit was admitted")
+
+        admission.release()
+        self.assertTrue(admission.acquire(), "request wasn't admitted after release")
+        self.assertEqual(1, admission.stats()['shed_queue_full'])
+
+    def test_queue_timeout(self):
+        admission = AdmissionController(max_in_flight=1, max_queue=1, queue_timeout=0.05)
+
+        self.assertTrue(admission.acquire())
+        self.assertFalse(admission.acquire(), "queued request was admitted without free slot")
+
+        stats = admission.stats()
+        self.assertEqual(1, stats['shed_timeout'])
+        self.assertEqual(0, stats['waiting'])
+        self.assertGreater(stats['queue_wait_max'], 0.0)
+
+    def test_queue(self):
+        admission = AdmissionController(max_in_flight=1, max_queue=1, queue_timeout=5.0)
+        admission.acquire()
+
+        results = []
+        waiter = threading.Thread(target=lambda: results.append(admission.acquire()))
+        waiter.start()
+        while admission.stats()['waiting'] == 0:
+            pass
+
+        self.assertFalse(admission.acquire(), "request was admitted into full queue")
+        admission.release()
+        waiter.join()
+
+        self.assertEqual([True], results, "queued request wasn't admitted after release")
+        self.assertEqual(1, admission.stats()['in_flight'])
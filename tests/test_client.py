@@ -0,0 +1,124 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import TestCase
+
+import requests
+
+from utils.client import AsyncClient, Client
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        texts = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        self.server.batches.append(texts)
+        with self.server.lock:
+            self.server.in_flight += 1
+            self.server.max_in_flight = max(self.server.max_in_flight, self.server.in_flight)
+        time.sleep(self.server.delay)
+        with self.server.lock:
+            self.server.in_flight -= 1
+        if self.server.reject > 0:
+            self.server.reject -= 1
+            self.send_response(503)
+            self.send_header('Retry-After', '0')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        results = [{'news': text, 'Bank_Rate': str(len(text)), 'QE': ''} for text in texts]
+        body = json.dumps(results[:len(results) - self.server.drop]).encode()
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class Extractor(object):
+    """Stands in for DataExtractor, results don't need spacy"""
+
+    def analyse(self, texts):
+        return [{'news': text, 'Bank_Rate': 'local', 'QE': ''} for text in texts]
+
+
+class TestClient(TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.batches = []
+        self.server.reject = 0
+        self.server.drop = 0
+        self.server.delay = 0
+        self.server.lock = threading.Lock()
+        self.server.in_flight = 0
+        self.server.max_in_flight = 0
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.url = f'http://127.0.0.1:{self.server.server_port}/'
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_batching(self):
+        with Client(self.url, max_batch_size=4, max_delay=0.2) as client:
+            futures = [client.submit('a' * i) for i in range(6)]
+            results = [future.result() for future in futures]
+
+        self.assertEqual([str(i) for i in range(6)], [result['Bank_Rate'] for result in results])
+        self.assertEqual([4, 2], [len(batch) for batch in self.server.batches], "texts weren't batched")
+
+    def test_concurrent_batches(self):
+        self.server.delay = 0.3
+        with Client(self.url, max_batch_size=2, max_delay=0.05, pool_size=4) as client:
+            futures = [client.submit('a' * i) for i in range(8)]
+            results = [future.result() for future in futures]
+
+        self.assertEqual([str(i) for i in range(8)], [result['Bank_Rate'] for result in results])
+        self.assertGreater(self.server.max_in_flight, 1, "batches weren't sent concurrently")
+
+    def test_missing_results(self):
+        self.server.drop = 1
+        with Client(self.url, max_batch_size=4, max_delay=0.2) as client:
+            futures = [client.submit('a' * i) for i in range(3)]
+            for future in futures:
+                with self.assertRaises(ValueError):
+                    future.result(timeout=5)
+
+    def test_analyse_batch(self):
+        with Client(self.url, max_batch_size=2) as client:
+            results = client.analyse_batch(['a', 'bb', 'ccc'])
+        self.assertEqual(['1', '2', '3'], [result['Bank_Rate'] for result in results])
+        self.assertEqual(2, len(self.server.batches))
+
+    def test_retry(self):
+        self.server.reject = 2
+        with Client(self.url, retries=2, backoff=0) as client:
+            self.assertEqual('2', client.analyse('bb')['Bank_Rate'])
+            self.assertEqual(2, client.counters['retries'])
+
+        self.server.reject = 2
+        with Client(self.url, retries=1, backoff=0) as client:
+            with self.assertRaises(requests.HTTPError):
+                client.analyse_batch(['a'])
+
+    def test_fallback(self):
+        self.server.reject = 2
+        with Client(self.url, retries=1, backoff=0, fallback=Extractor()) as client:
+            self.assertEqual('local', client.analyse('a')['Bank_Rate'])
+            self.assertEqual(1, client.counters['fallbacks'])
+
+    def test_async(self):
+        async def analyse():
+            async with AsyncClient(url=self.url, max_batch_size=8, max_delay=0.2) as client:
+                return await asyncio.gather(*[client.analyse('a' * i) for i in range(5)])
+
+        results = asyncio.run(analyse())
+        self.assertEqual([str(i) for i in range(5)], [result['Bank_Rate'] for result in results])
+        self.assertEqual(1, len(self.server.batches), "concurrent coroutines weren't batched")
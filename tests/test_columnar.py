@@ -0,0 +1,71 @@
+from contextlib import nullcontext
+from unittest import TestCase, skipIf
+
+import pandas as pd
+
+from model.columnar import COLUMNS, analyse_frame
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
+class Pipeline(object):
+    def pipe(self, texts):
+        return iter(texts)
+
+
+class Extractor(object):
+    """Stands in for DataExtractor: 'doc' is text itself, values are numbers of the text"""
+
+    def __init__(self):
+        self.spacy = Pipeline()
+        self.relation_parser = None
+
+    def targets(self):
+        return [('Bank_Rate', ['case_rate']), ('QE', ['case_qe'])]
+
+    def filter(self, text):
+        return ' '.join(text.split())
+
+    def memory_stage(self, name):
+        return nullcontext()
+
+    def search(self, doc, context_trees, trace=None, sentences=None):
+        rate = context_trees == ['case_rate']
+        values = [word for word in doc.split() if word[0].isdigit() and ('%' in word) == rate]
+        trace['case'] = context_trees[0] if len(values) > 0 else None
+        return values
+
+
+class TestColumnar(TestCase):
+    def setUp(self):
+        self.texts = pd.Series(['rate 0.5% and 435 billion', None, '  ', 'rate 0.25%'], index=[10, 11, 12, 13])
+
+    def test_analyse_frame(self):
+        frame = analyse_frame(Extractor(), self.texts, chunk_size=3)
+        self.assertEqual(COLUMNS, list(frame.columns))
+        self.assertEqual([10, 11, 12, 13], list(frame.index))
+        self.assertEqual(['0.5%', '', '', '0.25%'], frame.Bank_Rate.tolist())
+        self.assertEqual(['435', '', '', ''], frame.QE.tolist())
+        self.assertEqual('case_rate', frame.Bank_Rate_case[10])
+        self.assertEqual([False, True, True, False], frame.Bank_Rate_case.isna().tolist())
+        self.assertEqual(['complete', 'empty', 'empty', 'complete'], frame.status.tolist())
+
+    def test_analyse_frame_parallel(self):
+        expected = analyse_frame(Extractor(), self.texts.tolist(), chunk_size=1)
+        frame = analyse_frame(Extractor(), self.texts.tolist(), chunk_size=1, processes=2)
+        self.assertTrue(expected.equals(frame), "parallel results differ")
+
+    @skipIf(pyarrow is None, "pyarrow isn't installed")
+    def test_analyse_frame_arrow(self):
+        texts = ['rate 0.5% and 435 billion', None, '  ', 'rate 0.25%']
+        expected = analyse_frame(Extractor(), texts, chunk_size=3)
+        # chunks of analysis cross chunks of the array
+        texts = pyarrow.chunked_array([texts[:1], texts[1:]])
+
+        table = analyse_frame(Extractor(), texts, chunk_size=3, arrow=True)
+        self.assertIsInstance(table, pyarrow.Table)
+        self.assertEqual(COLUMNS, table.column_names)
+        self.assertTrue(expected.equals(table.to_pandas()), "results of arrow texts differ")
@@ -0,0 +1,107 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+from unittest import TestCase
+
+from model.data_extraction import DataExtractor
+from model.reloader import ContextReloader
+
+CONTEXT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'model', 'contexts.json')
+
+
+class TestContextReloader(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.context_file = os.path.join(self.directory.name, 'contexts.json')
+        shutil.copy(CONTEXT_FILE, self.context_file)
+        self.reloader = ContextReloader(DataExtractor(context_file=self.context_file))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_reload(self):
+        old_extractor = self.reloader.data_extractor
+
+        with open(self.context_file, 'r') as file:
+            data = json.load(file)
+        data['QE'].pop('case_8')
+        with open(self.context_file, 'w') as file:
+            json.dump(data, file)
+
+        self.assertTrue(self.reloader.reload(), "valid contexts weren't reloaded")
+        self.assertEqual(2, self.reloader.version)
+        self.assertIsNot(old_extractor, self.reloader.data_extractor)
+        self.assertIs(old_extractor.spacy, self.reloader.data_extractor.spacy, "spacy model isn't shared")
+        self.assertEqual(len(old_extractor.qe_context_trees) - 1, len(self.reloader.data_extractor.qe_context_trees))
+
+    def test_reload_invalid(self):
+        old_extractor = self.reloader.data_extractor
+
+        with open(self.context_file, 'w') as file:
+            file.write('{"QE": {"case_1": [{"label": "head", "parent": "missing"}]}}')
+
+        self.assertFalse(self.reloader.reload(), "invalid contexts were reloaded")
+        self.assertIs(old_extractor, self.reloader.data_extractor)
+        self.assertIsNotNone(self.reloader.last_error)
+
+    def test_reload_malformed(self):
+        old_extractor = self.reloader.data_extractor
+
+        for contexts in ['[{"QE": {}}]', '{"QE": {"case_1": [{"label": "head", "parent": "", "validator": []}]}}',
+                         '{"QE": {"case_1": {"label": "head"}}}']:
+            with open(self.context_file, 'w') as file:
+                file.write(contexts)
+
+            self.assertFalse(self.reloader.reload(), f"malformed contexts {contexts} were reloaded")
+            self.assertIs(old_extractor, self.reloader.data_extractor)
+            self.assertTrue(self.reloader.last_error.startswith('AssertionError'), self.reloader.last_error)
+
+        os.remove(self.context_file)
+        self.assertFalse(self.reloader.reload(), "missing contexts were reloaded")
+        self.assertIsNotNone(self.reloader.last_error)
+
+    def test_watch_survives_errors(self):
+        calls = []
+
+        def failing_reload():
+            calls.append(time.monotonic())
+            self.reloader.mtime = None
+            raise OSError('context file is being replaced')
+
+        self.reloader.reload = failing_reload
+        self.reloader.mtime = None
+        self.reloader.watch(0.01)
+        try:
+            deadline = time.monotonic() + 5
+            while len(calls) < 2 and time.monotonic() < deadline:
+                time.sleep(0.01)
+        finally:
+            self.reloader.stop()
+
+        self.assertGreaterEqual(len(calls), 2, "watcher stopped after reload error")
+        self.assertIn('OSError', self.reloader.last_error)
+
+    def test_replace_model(self):
+        old_extractor = self.reloader.data_extractor
+        old_extractor.analyse('Bank Rate was maintained at 0.5% by the zyxwvut committee.')
+        self.assertIn('zyxwvut', old_extractor.spacy.vocab.strings)
+
+        self.assertTrue(self.reloader.replace_model(old_extractor.reload_model()), "new model wasn't swapped in")
+        self.assertEqual((1, 2), (self.reloader.version, self.reloader.model_version))
+        self.assertIsNot(old_extractor.spacy, self.reloader.data_extractor.spacy)
+        self.assertNotIn('zyxwvut', self.reloader.data_extractor.spacy.vocab.strings)
+        self.assertEqual(old_extractor.contexts_fingerprint(), self.reloader.data_extractor.contexts_fingerprint())
+
+    def test_reload_relation_model(self):
+        self.reloader = ContextReloader(DataExtractor(context_file=self.context_file, relation_model='en'))
+
+        self.assertTrue(self.reloader.reload(), "valid contexts weren't reloaded")
+        self.assertEqual('en', self.reloader.data_extractor.relation_model, "relation model was lost on reload")
+
+        recycled = self.reloader.data_extractor.reload_model()
+        self.assertEqual('en', recycled.relation_model)
+        self.assertIsNotNone(recycled.relation_parser, "recycled extractor has no relation parser")
+        self.assertTrue(self.reloader.replace_model(recycled))
+        self.assertEqual('en', self.reloader.data_extractor.relation_model)
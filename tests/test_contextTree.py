@@ -1,18 +1,51 @@
+from collections import namedtuple
 from unittest import TestCase
 
+from model.tree import ContextTree, ParentedTreeWrapper
+
+Token = namedtuple('Token', ['orth_', 'lemma_', 'pos_', 'dep_', 'tag_', 'children'])
+
+
+def chain(length):
+    root = ContextTree.from_dict({'label': '0', 'validator': {'pos': ['num']}})
+    node = root
+    for index in range(1, length):
+        child = ContextTree.from_dict({'label': str(index), 'validator': {'pos': ['num']}})
+        node.set_children(child)
+        node = child
+    return root
+
 
 class TestContextTree(TestCase):
+    def setUp(self):
+        self.nodes = {}
+        for label, extract in [('root', False), ('verb', False), ('number', True), ('unit', False)]:
+            self.nodes[label] = ContextTree.from_dict({'label': label, 'extract': extract})
+        self.nodes['root'].set_children([self.nodes['verb'], self.nodes['unit']])
+        self.nodes['verb'].set_children(self.nodes['number'])
+        self.tree = self.nodes['root']
+
     def test_set_children(self):
         self.fail()
 
     def test_traverse(self):
-        self.fail()
+        self.assertEqual([node.label for node in self.tree.traverse()], ['root', 'verb', 'number', 'unit'])
+        self.assertEqual([node.label for node in self.tree.traverse('postorder')], ['number', 'verb', 'unit', 'root'])
+        self.assertEqual([node.label for node in self.nodes['verb'].iter_traverse()], ['verb', 'number'])
 
     def test_traverse_and_get(self):
-        self.fail()
+        self.assertEqual(self.tree.traverse_and_get('label'), ['root', 'verb', 'number', 'unit'])
+        self.assertEqual(self.tree.traverse_and_get('missing'), [])
 
     def test_traverse_and_extract(self):
-        self.fail()
+        self.nodes['number'].found_value = '0.5'
+        self.assertEqual(self.tree.traverse_and_extract(), ['0.5'])
+
+    def test_matched(self):
+        self.assertFalse(self.tree.matched())
+        for node in self.nodes.values():
+            node.validated = True
+        self.assertTrue(self.tree.matched())
 
     def test_is_ancestor(self):
         self.fail()
@@ -24,4 +57,26 @@ class TestContextTree(TestCase):
         self.fail()
 
     def test_deepcopy(self):
-        self.fail()
+        self.nodes['number'].validator = {'pos': ['num']}
+        copied = self.tree.deepcopy()
+        self.assertEqual(self.tree.fingerprint(), copied.fingerprint())
+        self.assertEqual([node.label for node in copied.traverse()], ['root', 'verb', 'number', 'unit'])
+
+        number = copied.children[0].children[0]
+        self.assertIs(number.parent, copied.children[0])
+        self.assertIsNot(number, self.nodes['number'])
+        number.validator['pos'].append('propn')
+        number.validated = True
+        self.assertEqual(['num'], self.nodes['number'].validator['pos'], "validator wasn't copied")
+        self.assertFalse(self.nodes['number'].validated)
+
+        # deep trees and candidates from deep sentence trees don't hit recursion limit
+        deep = chain(5000)
+        token = Token('0', '0', 'NUM', 'ROOT', '', [])
+        for index in range(1, 5000):
+            token = Token(str(index), str(index), 'NUM', 'conj', '', [token])
+        deep.candidates = [ParentedTreeWrapper.from_spacy_tree(token)]
+        copied = deep.deepcopy()
+        self.assertEqual(5000, len(copied.traverse()))
+        self.assertEqual(5000, len(copied.candidates[0].subtree_tokens()))
+        self.assertIn("'candidates': ['4999']", str(deep))
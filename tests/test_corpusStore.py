@@ -0,0 +1,33 @@
+import tempfile
+from unittest import TestCase
+
+from model.corpus_store import CorpusStore, filter_content
+
+
+class TestCorpusStore(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.rows = [{'url': 'http://a', 'header': 'Bank Rate', 'content': 'Bank Rate maintained at 0.5%'},
+                     {'url': 'http://b', 'header': '', 'content': 'stock of purchases at £375 billion'},
+                     {'url': 'http://c', 'header': 'QE', 'content': ''}]
+        self.store = CorpusStore.write(self.directory.name, self.rows)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_get(self):
+        self.assertEqual(3, len(self.store))
+        for index, row in enumerate(self.rows):
+            for column in CorpusStore.columns:
+                self.assertEqual(row[column], self.store.get(index, column))
+
+    def test_find(self):
+        self.assertEqual(1, self.store.find('http://b'))
+        self.assertIsNone(self.store.find('http://d'))
+
+    def test_documents(self):
+        documents = list(CorpusStore(self.directory.name).documents(chunk_size=2))
+        self.assertEqual([(row['url'], row['content']) for row in self.rows], documents)
+
+    def test_filter_content(self):
+        self.assertEqual('Bank Rate at 0.5%', filter_content(['\r\n  ', 'Bank  Rate', '\n at 0.5%  ']))
@@ -1,10 +1,15 @@
 from unittest import TestCase
+from unittest.mock import patch
 
+import pandas as pd
 import spacy
 import os
 
+from model.columnar import analyse_frame
 from model.data_extraction import DataExtractor
-from model.tree import ContextTree
+from model.helpers import Deadline
+from model.memory import MemoryBudget
+from model.tree import ContextTree, SentenceTrees
 
 os.chdir(os.path.abspath(os.path.join(os.getcwd(), os.pardir)))
 
@@ -151,6 +156,68 @@ class TestDataExtractor(TestCase):
     def test_analyse(self):
         pass
 
+    def test_analyse_deadline(self):
+        data_extractor = DataExtractor()
+        text = 'The Governor invited the Committee to vote on the proposition that: Bank Rate should be maintained ' \
+               'at 0.5%.'
+
+        results = data_extractor.analyse([text, text], Deadline(0))
+        self.assertEqual(['timeout', 'timeout'], [result['status'] for result in results],
+                         "expired deadline didn't stop analysis")
+
+        results = data_extractor.analyse(text, Deadline(60))
+        self.assertEqual('complete', results[0]['status'], "analysis within deadline isn't complete")
+        self.assertNotIn('status', data_extractor.analyse(text)[0], "status is set without deadline")
+
+    def test_analyse_memory_budget(self):
+        data_extractor = DataExtractor()
+        text = 'The Governor invited the Committee to vote on the proposition that: Bank Rate should be maintained ' \
+               'at 0.5%.'
+
+        results = data_extractor.analyse([text, text], memory_budget=MemoryBudget(0))
+        self.assertEqual(['memory', 'memory'], [result['status'] for result in results],
+                         "exceeded memory budget didn't stop analysis")
+        results = data_extractor.analyse(text, memory_budget=MemoryBudget(2 ** 60))
+        self.assertEqual('0.5%', results[0]['Bank_Rate'])
+        self.assertNotIn('status', results[0], "status is set within memory budget")
+
+    def test_analyse_sets(self):
+        data_extractor = DataExtractor()
+        candidate = data_extractor.share_model(data_extractor.context_file)
+        self.assertIs(data_extractor.spacy, candidate.spacy, "spacy model isn't shared")
+        candidate.qe_context_trees = []
+
+        text = 'The Governor invited the Committee to vote on the proposition that: Bank Rate should be maintained ' \
+               'at 0.5%.'
+        results = data_extractor.analyse_sets(text, {'default': data_extractor, 'candidate': candidate})
+        expected = data_extractor.analyse(text)[0]
+
+        self.assertEqual(1, len(results))
+        self.assertEqual(expected['news'], results[0]['news'])
+        self.assertEqual(['default', 'candidate'], list(results[0]['sets']))
+        for name in ['default', 'candidate']:
+            self.assertEqual(expected['Bank_Rate'], results[0]['sets'][name]['Bank_Rate'],
+                             f"set {name} result differs from analyse")
+        self.assertEqual('', results[0]['sets']['candidate']['QE'], "set without qe contexts found qe")
+
+        with patch('model.data_extraction.SentenceTrees', wraps=SentenceTrees) as sentence_trees:
+            data_extractor.analyse_sets([text, text], {'default': data_extractor, 'candidate': candidate})
+        self.assertEqual(2, sentence_trees.call_count, "sentence trees weren't built once per text")
+
+        results = data_extractor.analyse_sets([text], {'default': data_extractor}, Deadline(0))
+        self.assertEqual('timeout', results[0]['sets']['default']['status'], "expired deadline didn't stop analysis")
+
+    def test_analyse_frame(self):
+        data_extractor = DataExtractor()
+        texts = pd.Series(['The Governor invited the Committee to vote on the proposition that: Bank Rate should be '
+                           'maintained at 0.5%.', None])
+        frame = analyse_frame(data_extractor, texts)
+        expected = data_extractor.analyse(texts[0])[0]
+
+        self.assertEqual([expected['Bank_Rate'], ''], frame.Bank_Rate.tolist())
+        self.assertEqual([expected['QE'], ''], frame.QE.tolist())
+        self.assertEqual(['complete', 'empty'], frame.status.tolist())
+
     def test_search(self):
         pass
 
@@ -259,6 +326,34 @@ class TestDataExtractor(TestCase):
     def test_from_json(self):
         pass
 
+    def test_is_affected(self):
+        cases = [['case_1', 'a'], ['case_2', 'b'], ['case_3', 'c']]
+        trace = {'case': 'case_2', 'sentence': 0, 'tried': [['case_1', 'a'], ['case_2', 'b']]}
+
+        self.assertFalse(DataExtractor.is_affected(trace, cases), "unchanged cases affect result")
+        self.assertFalse(DataExtractor.is_affected(trace, cases[:2]), "untried case removal affects result")
+        self.assertFalse(DataExtractor.is_affected(trace, cases + [['case_4', 'd']]),
+                         "case added after matched one affects result")
+        self.assertTrue(DataExtractor.is_affected(trace, [['case_0', 'e']] + cases),
+                        "case added before matched one doesn't affect result")
+        self.assertTrue(DataExtractor.is_affected(trace, [['case_1', 'e'], ['case_2', 'b']]),
+                        "modified tried case doesn't affect result")
+        self.assertTrue(DataExtractor.is_affected(dict(trace, sentence=1), cases + [['case_4', 'd']]),
+                        "added case doesn't affect result found in later sentence")
+        self.assertTrue(DataExtractor.is_affected(None, cases), "missing trace doesn't affect result")
+
+    def test_is_affected_reordered(self):
+        cases = [['case_1', 'a'], ['case_2', 'b'], ['case_3', 'c']]
+        trace = {'case': 'case_2', 'sentence': 1, 'tried': cases}
+
+        self.assertFalse(DataExtractor.is_affected(trace, cases), "unchanged cases affect result")
+        self.assertFalse(DataExtractor.is_affected(trace, [cases[1], cases[0], cases[2]]),
+                         "case moved after matched one affects result")
+        self.assertTrue(DataExtractor.is_affected(trace, [cases[0], cases[2], cases[1]]),
+                        "case moved before matched one doesn't affect result in its sentence")
+        self.assertTrue(DataExtractor.is_affected(dict(trace, sentence=0, tried=cases[:2]), [cases[2]] + cases[:2]),
+                        "untried case moved before matched one doesn't affect result")
+
 
 if __name__ == '__main__':
     tester = TestDataExtractor()
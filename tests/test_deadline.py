@@ -0,0 +1,24 @@
+import time
+from unittest import TestCase
+
+from model.helpers import Deadline
+
+
+class TestDeadline(TestCase):
+    def test_expired(self):
+        deadline = Deadline(10)
+        self.assertFalse(deadline.expired())
+        self.assertFalse(deadline.exceeded)
+        self.assertGreater(deadline.remaining(), 0)
+
+        deadline = Deadline(0.01)
+        time.sleep(0.02)
+        self.assertTrue(deadline.expired())
+        self.assertTrue(deadline.exceeded)
+        self.assertLess(deadline.remaining(), 0)
+
+    def test_until(self):
+        deadline = Deadline.until(time.monotonic() + 10)
+        self.assertFalse(deadline.expired())
+        self.assertGreater(deadline.remaining(), 9)
+        self.assertTrue(Deadline.until(time.monotonic() - 1).expired())
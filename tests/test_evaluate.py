@@ -0,0 +1,41 @@
+from unittest import TestCase
+
+from utils.evaluate import configurations, fastest_accurate, normalize_value, read_dataset, score
+
+
+class TestEvaluate(TestCase):
+    def test_normalize_value(self):
+        self.assertEqual(normalize_value('£435'), normalize_value(435))
+        self.assertEqual(normalize_value('0.5'), normalize_value(0.5))
+        self.assertEqual(normalize_value('0.5%'), normalize_value('0.50'))
+        self.assertEqual('', normalize_value(float('nan')))
+        self.assertEqual('', normalize_value(''))
+        self.assertNotEqual(normalize_value('0.5'), normalize_value('0.25'))
+
+    def test_read_dataset(self):
+        texts, labels = read_dataset('qe_sentences')
+        self.assertEqual(['QE'], list(labels))
+        self.assertEqual(len(texts), len(labels['QE']))
+        self.assertEqual(normalize_value('375'), labels['QE'][0])
+
+    def test_score(self):
+        results = [{'Bank_Rate': '0.5', 'QE': '435'}, {'Bank_Rate': '', 'QE': '375'}]
+        labels = {'Bank_Rate': [normalize_value(0.5), normalize_value(0.25)],
+                  'QE': [normalize_value(435), normalize_value('£375')]}
+        self.assertEqual({'Bank_Rate': 0.5, 'QE': 1.0}, score(results, labels))
+
+    def test_configurations(self):
+        matrix = configurations(['en', 'en_core_web_md'], [[], ['ner']], [None])
+        self.assertEqual(4, len(matrix))
+        self.assertEqual('en/no_ner/default', matrix[1]['name'])
+        self.assertEqual(['ner'], matrix[1]['disable'])
+
+        matrix = configurations(['en'], [[]], [None], ['models/relations'])
+        self.assertEqual([None, 'models/relations'], [configuration['relation_model'] for configuration in matrix])
+
+    def test_fastest_accurate(self):
+        reports = [{'name': 'full', 'docs_per_second': 10, 'accuracy': {'data': {'QE': 1.0}}},
+                   {'name': 'fast', 'docs_per_second': 30, 'accuracy': {'data': {'QE': 0.9}}},
+                   {'name': 'faster', 'docs_per_second': 20, 'accuracy': {'data': {'QE': 1.0}}}]
+        self.assertEqual('faster', fastest_accurate(reports)['name'])
+        self.assertEqual('fast', fastest_accurate(reports, tolerance=0.1)['name'])
@@ -1,5 +1,5 @@
 from unittest import TestCase
-from model.helpers import found
+from model.helpers import KeywordMatcher, found, keyword_matcher
 
 
 class TestFound(TestCase):
@@ -14,3 +14,19 @@ class TestFound(TestCase):
         self.assertEqual(False, found(texts, keys, 'all', False))
         self.assertEqual(True, found(texts, keys, 'any', False))
         self.assertEqual(False, found(texts, keys, 'none', False))
+
+    def test_keyword_matcher(self):
+        keys = ['he', 'she', 'his', 'hers', 'Bank Rate', 'QE', 'gilts', 'purchases', 'stock']
+        matcher = KeywordMatcher(keys, substring=True)
+        self.assertIsNotNone(matcher.goto, "automaton isn't built for many keys")
+
+        self.assertEqual({'he', 'she', 'hers'}, matcher.matches(['ushers']))
+        self.assertEqual({'bank rate', 'stock'}, matcher.matches(['BANK RATE', 'stocks']))
+        self.assertEqual({'his'}, matcher.matches(['his', 'she'], stop=1), "search didn't stop")
+        self.assertTrue(matcher.found(['ushers'], 'any'))
+        self.assertFalse(matcher.found(['ushers'], 'all'))
+        self.assertTrue(matcher.found(['nothing'], 'none'))
+
+        matcher = KeywordMatcher(['Bank', 'rate'])
+        self.assertEqual({'bank'}, matcher.matches(['BANK', 'rates']))
+        self.assertIs(keyword_matcher(('a', 'b'), True), keyword_matcher(('a', 'b'), True), "matcher isn't cached")
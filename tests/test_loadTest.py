@@ -0,0 +1,80 @@
+import json
+import os
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest import TestCase
+
+from utils.load_test import LoadTester, build_requests, replay_requests, size_bucket, summarize
+
+
+class Handler(BaseHTTPRequestHandler):
+    def respond(self):
+        self.send_response(200)
+        self.end_headers()
+        self.wfile.write(b'[]')
+
+    def do_GET(self):
+        self.respond()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers['Content-Length']))
+        self.respond()
+
+    def log_message(self, *args):
+        pass
+
+
+class TestLoadTest(TestCase):
+    def test_build_requests(self):
+        requests = build_requests(['a', 'b', 'c'], 5, batch_size=2)
+        self.assertEqual(5, len(requests))
+        self.assertEqual({'POST'}, {method for method, _ in requests})
+        self.assertEqual({2}, {len(texts) for _, texts in requests})
+        self.assertEqual('GET', build_requests(['a'], 1)[0][0])
+        self.assertEqual(requests, build_requests(['a', 'b', 'c'], 5, batch_size=2), "requests aren't reproducible")
+
+    def test_replay_requests(self):
+        with tempfile.TemporaryDirectory() as directory:
+            log_file = os.path.join(directory, 'logs.txt')
+            with open(log_file, 'w') as file:
+                file.write(json.dumps([{'news': 'a', 'Bank_Rate': '', 'QE': ''}]) + '\n')
+                file.write(json.dumps({}) + '\n')
+                file.write(json.dumps([{'id': 0, 'Bank_Rate': '', 'QE': ''}]) + '\n')
+                file.write(json.dumps([{'news': 'b'}, {'news': 'c'}]) + '\n')
+            self.assertEqual([('GET', ['a']), ('POST', ['b', 'c'])], replay_requests(log_file))
+
+    def test_size_bucket(self):
+        self.assertEqual('<1k', size_bucket(['a' * 10]))
+        self.assertEqual('1k-10k', size_bucket(['a' * 600, 'a' * 600]))
+        self.assertEqual('>=100k', size_bucket(['a' * 100000]))
+
+    def test_summarize(self):
+        samples = [{'bucket': '<1k', 'texts': 1, 'status': 200, 'latency': latency / 1000}
+                   for latency in range(1, 101)]
+        samples.append({'bucket': '<1k', 'texts': 1, 'status': 503, 'latency': 0.001})
+
+        report = summarize(samples, 10.0)
+        self.assertEqual(101, report['requests'])
+        self.assertEqual(1, report['errors'])
+        self.assertEqual({'200': 100, '503': 1}, report['statuses'])
+        self.assertAlmostEqual(10.0, report['requests_per_second'])
+        self.assertAlmostEqual(50.5, report['latency']['p50'])
+        self.assertEqual(['<1k'], list(report['buckets']))
+
+    def test_run(self):
+        server = HTTPServer(('127.0.0.1', 0), Handler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            tester = LoadTester(f'http://127.0.0.1:{server.server_port}/', timeout=5)
+            requests = build_requests(['a', 'b'], 6) + build_requests(['a', 'b'], 4, batch_size=3)
+
+            samples, seconds = tester.run_closed(requests, concurrency=2)
+            self.assertEqual([200] * 10, [sample['status'] for sample in samples])
+
+            samples, seconds = tester.run_open(requests, rate=200)
+            self.assertEqual([200] * 10, [sample['status'] for sample in samples])
+        finally:
+            server.shutdown()
+            server.server_close()
@@ -0,0 +1,53 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from model.helpers import content_hash
+from model.manifest import Manifest
+
+
+class TestManifest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.manifest = Manifest(os.path.join(self.directory.name, 'manifest.sqlite'))
+
+    def tearDown(self):
+        self.manifest.close()
+        self.directory.cleanup()
+
+    def test_document_key(self):
+        self.assertEqual('http://url', Manifest.document_key('text', 'http://url'))
+        self.assertEqual('sha256:' + content_hash('text'), Manifest.document_key('text'))
+
+    def test_put_and_get(self):
+        self.assertIsNone(self.manifest.get('doc'))
+        result = {'news': 'text', 'Bank_Rate': '0.5%', 'QE': '£200'}
+        self.manifest.put([{'key': 'doc', 'content_hash': 'hash', 'contexts_fingerprint': 'contexts',
+                            'model_fingerprint': 'model', 'result': result}])
+
+        record = self.manifest.get('doc')
+        self.assertEqual(result, record['result'])
+        self.assertEqual('hash', record['content_hash'])
+        self.assertEqual(1, len(self.manifest))
+
+    def test_is_stale(self):
+        self.assertTrue(self.manifest.is_stale('doc', 'hash', 'contexts', 'model'))
+        self.manifest.put([{'key': 'doc', 'content_hash': 'hash', 'contexts_fingerprint': 'contexts',
+                            'model_fingerprint': 'model', 'result': {}}])
+
+        self.assertFalse(self.manifest.is_stale('doc', 'hash', 'contexts', 'model'))
+        self.assertTrue(self.manifest.is_stale('doc', 'new hash', 'contexts', 'model'))
+        self.assertTrue(self.manifest.is_stale('doc', 'hash', 'new contexts', 'model'))
+        self.assertTrue(self.manifest.is_stale('doc', 'hash', 'contexts', 'new model'))
+
+    def test_trace(self):
+        trace = {'QE': {'case': 'case_4', 'sentence': 0, 'tried': [['case_3', 'a'], ['case_4', 'b']]}}
+        self.manifest.put([{'key': 'doc', 'content_hash': 'hash', 'contexts_fingerprint': 'contexts',
+                            'model_fingerprint': 'model', 'result': {}, 'trace': trace}])
+        self.assertEqual(trace, self.manifest.get('doc')['trace'])
+
+    def test_parse_store(self):
+        self.assertIsNone(self.manifest.get_parse('hash', 'model'))
+        self.manifest.put_parse('hash', 'model', b'doc', '["strings"]')
+        self.assertEqual((b'doc', '["strings"]'), self.manifest.get_parse('hash', 'model'))
+        self.assertIsNone(self.manifest.get_parse('hash', 'new model'))
@@ -0,0 +1,81 @@
+import threading
+import time
+import tracemalloc
+from unittest import TestCase
+
+from model.memory import MemoryAccounting, MemoryBudget
+
+
+class TestMemoryAccounting(TestCase):
+    def test_stage(self):
+        memory = MemoryAccounting()
+        memory.start()
+        try:
+            with memory.stage('results'):
+                results = [bytearray(100000)]
+            with memory.stage('results'):
+                pass
+            report = memory.report()
+        finally:
+            memory.stop()
+
+        self.assertFalse(tracemalloc.is_tracing(), "tracing wasn't stopped")
+        self.assertEqual(2, report['stages']['results']['calls'])
+        self.assertGreaterEqual(report['stages']['results']['max_allocated'], 100000)
+        self.assertGreaterEqual(report['peak'], report['current'])
+        self.assertEqual(1, len(results))
+
+    def test_concurrent_stages(self):
+        memory = MemoryAccounting()
+        memory.start()
+        started = threading.Event()
+
+        def allocate():
+            with memory.stage('other'):
+                started.set()
+                time.sleep(0.2)
+                allocate.results = [bytearray(1000000)]
+
+        thread = threading.Thread(target=allocate)
+        try:
+            thread.start()
+            started.wait()
+            # without serialization this stage would span allocation of the other thread
+            with memory.stage('results'):
+                time.sleep(0.4)
+                results = [bytearray(1000)]
+            thread.join()
+            report = memory.report()
+        finally:
+            memory.stop()
+
+        self.assertLess(report['stages']['results']['max_allocated'], 500000, "other thread's memory was accounted")
+        self.assertGreaterEqual(report['stages']['other']['max_allocated'], 1000000)
+        self.assertEqual(1, len(results))
+
+
+class TestMemoryBudget(TestCase):
+    def test_exceeded(self):
+        self.assertGreater(MemoryBudget(0).usage(), 0)
+        self.assertTrue(MemoryBudget(0).exceeded())
+        self.assertFalse(MemoryBudget(2 ** 60).exceeded())
+
+    def test_flushed(self):
+        usage = MemoryBudget(0).usage()
+        budget = MemoryBudget(usage // 2)
+        self.assertTrue(budget.exceeded())
+        # memory isn't given back after flush, so budget is raised instead of flushing every next document
+        budget.flushed()
+        self.assertFalse(budget.exceeded())
+        self.assertGreater(budget.threshold, budget.usage())
+
+        budget.limit = 2 ** 60
+        self.assertFalse(budget.exceeded())
+        self.assertEqual(2 ** 60, budget.threshold, "budget wasn't lowered back to the limit")
+
+    def test_growth(self):
+        self.assertFalse(MemoryBudget.growth(2 ** 30).exceeded())
+        budget = MemoryBudget.growth(0)
+        memory = bytearray(b'x' * 2 ** 24)
+        self.assertTrue(budget.exceeded())
+        self.assertEqual(2 ** 24, len(memory))
@@ -0,0 +1,89 @@
+from types import SimpleNamespace
+from unittest import TestCase
+
+from model.memory import MemoryBudget
+from model.recycler import ModelRecycler
+from model.reloader import ContextReloader
+
+
+class Extractor(object):
+    """Stands in for DataExtractor: spacy model has only vocab with strings"""
+
+    def __init__(self, spacy_model, context_file='contexts.json'):
+        self.spacy = spacy_model
+        self.context_file = context_file
+
+    def share_model(self, context_file):
+        return Extractor(self.spacy, context_file)
+
+
+def model(strings=()):
+    return SimpleNamespace(vocab=SimpleNamespace(strings=list(strings)))
+
+
+class TestModelRecycler(TestCase):
+    def setUp(self):
+        self.old_model = model(['bank', 'rate', 'unseen', 'tokens'])
+        self.reloaders = [ContextReloader(Extractor(self.old_model)),
+                          ContextReloader(Extractor(self.old_model), 'candidate.json')]
+
+    def recycler(self, **kwargs):
+        return ModelRecycler(self.reloaders, min_interval=0, drain_timeout=5, loader=lambda _: Extractor(model()),
+                             **kwargs)
+
+    def test_recycle_after_requests(self):
+        recycler = self.recycler(max_requests=3)
+        for _ in range(3):
+            recycler.release(recycler.acquire())
+        self.assertTrue(recycler.wait(5))
+
+        stats = recycler.stats()
+        self.assertEqual((1, 1, 0), (stats['recycled'], stats['generation'], stats['requests']))
+        self.assertEqual('requests', stats['last']['reason'])
+        self.assertEqual((4, 0), (stats['last']['strings_before'], stats['last']['strings_after']))
+        for reloader in self.reloaders:
+            self.assertEqual(2, reloader.model_version)
+            self.assertIsNot(self.old_model, reloader.data_extractor.spacy)
+        self.assertIs(self.reloaders[0].data_extractor.spacy, self.reloaders[1].data_extractor.spacy)
+        self.assertEqual('candidate.json', self.reloaders[1].data_extractor.context_file)
+
+    def test_drain(self):
+        recycler = self.recycler()
+        generation = recycler.acquire()
+        data_extractor = self.reloaders[0].data_extractor
+        self.assertTrue(recycler.start('manual'))
+        self.assertFalse(recycler.start('manual'), 'recycling started twice')
+
+        # new requests get new model while the running one keeps the old model until it's finished
+        self.assertFalse(recycler.wait(0.2))
+        self.assertIsNot(data_extractor.spacy, self.reloaders[0].data_extractor.spacy)
+        self.assertIs(self.old_model, data_extractor.spacy)
+
+        recycler.release(generation)
+        self.assertTrue(recycler.wait(5))
+        self.assertTrue(recycler.stats()['last']['drained'])
+        self.assertEqual(0, recycler.stats()['in_flight'])
+
+    def test_due(self):
+        self.assertEqual('strings', self.recycler(max_strings=3).due())
+        self.assertIsNone(self.recycler(max_strings=4).due())
+        self.assertIsNone(self.recycler(max_requests=1).due())
+        self.assertIsNone(ModelRecycler(self.reloaders, max_strings=3).due(), 'recycled within min_interval')
+
+    def test_memory_backoff(self):
+        recycler = self.recycler(max_memory=MemoryBudget(0).usage() // 2)
+        self.assertEqual('memory', recycler.due())
+        recycler.recycle('memory')
+        # memory isn't given back to the system, recycling again right away wouldn't help
+        self.assertIsNone(recycler.due())
+        self.assertEqual(1, recycler.stats()['recycled'])
+
+    def test_failed_loader(self):
+        def loader(_):
+            raise OSError('model not found')
+
+        recycler = ModelRecycler(self.reloaders, min_interval=0, loader=loader)
+        recycler.recycle()
+        self.assertEqual(1, recycler.stats()['failed'])
+        self.assertIn('OSError', recycler.stats()['last']['error'])
+        self.assertIs(self.old_model, self.reloaders[0].data_extractor.spacy)
@@ -0,0 +1,32 @@
+from unittest import TestCase
+
+from model.dedup import NearDuplicateIndex
+
+STATEMENT = 'The Governor invited the Committee to vote on the proposition that: Bank Rate should be maintained at ' \
+            '0.5%; The Bank of England should maintain the stock of asset purchases financed by the issuance of ' \
+            'central bank reserves at £200 billion. Seven members of the Committee voted in favour of the proposition.'
+
+
+class TestNearDuplicateIndex(TestCase):
+    def test_add(self):
+        index = NearDuplicateIndex(threshold=0.8)
+
+        self.assertEqual('first', index.add('first', STATEMENT))
+        self.assertEqual('first', index.add('reprint', STATEMENT + ' Minutes of the meeting'),
+                         "near-duplicate wasn't assigned to cluster")
+        self.assertEqual('other', index.add('other', 'Quick brown fox jumps over the lazy dog'),
+                         "different document was assigned to cluster")
+        self.assertEqual('other month', index.add('other month', STATEMENT.replace('£200', '£375')),
+                         "document with different numbers was assigned to cluster")
+
+        self.assertEqual({'first': ['first', 'reprint'], 'other': ['other'], 'other month': ['other month']},
+                         index.clusters())
+
+    def test_stats(self):
+        index = NearDuplicateIndex()
+        for key in range(4):
+            index.add(key, STATEMENT)
+        index.add(4, 'Quick brown fox jumps over the lazy dog')
+
+        self.assertEqual({'documents': 5, 'clusters': 2, 'duplicates': 3, 'duplication_rate': 0.6,
+                          'largest_cluster': 4}, index.stats())
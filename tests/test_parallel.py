@@ -0,0 +1,82 @@
+import os
+import signal
+import time
+from unittest import TestCase
+
+from model.data_extraction import DataExtractor
+from model.helpers import Deadline
+from model.parallel import ParallelExtractor, split_sentences
+
+
+class TestSplitSentences(TestCase):
+    def test_split_sentences(self):
+        text = 'Bank rate maintained at 0.5%. The committee voted unanimously; Purchases continued! Minutes of meeting'
+
+        self.assertEqual([text], split_sentences(text, len(text)))
+        self.assertEqual(['Bank rate maintained at 0.5%.', 'The committee voted unanimously;',
+                          'Purchases continued!', 'Minutes of meeting'], split_sentences(text, 10))
+
+        for chunk_size in range(1, len(text)):
+            chunks = split_sentences(text, chunk_size)
+            self.assertEqual(text, ' '.join(chunks), "chunks don't cover the whole text")
+
+    def test_long_sentence(self):
+        text = 'One very long sentence without any end'
+        self.assertEqual([text], split_sentences(text, 5), "sentence was split")
+
+
+class TestParallelExtractor(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.data_extractor = DataExtractor()
+        cls.parallel = ParallelExtractor(cls.data_extractor, processes=2, chunk_size=200, min_length=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.parallel.close()
+
+    def test_analyse(self):
+        # values are found only in later chunks
+        filler = 'The Committee discussed the outlook for inflation and growth. ' * 20
+        bank_rate = 'The Governor invited the Committee to vote on the proposition that: Bank Rate should be ' \
+                    'maintained at 0.5%. '
+        qe = 'The Bank of England should maintain the stock of purchased assets financed by the issuance of central ' \
+             'bank reserves at £375 billion.'
+        text = filler + bank_rate + filler + qe
+        self.assertGreater(len(split_sentences(text, 200)), 3)
+
+        expected = self.data_extractor.analyse(text)
+        self.assertEqual(expected, self.parallel.analyse(self.data_extractor, text))
+        self.assertNotEqual('', expected[0]['Bank_Rate'])
+
+    def test_analyse_deadline(self):
+        text = 'The Committee discussed the outlook for inflation and growth. ' * 50
+        deadline = Deadline.until(time.monotonic() - 1)
+        result = self.parallel.analyse_news(self.data_extractor, text, deadline)
+        self.assertEqual('partial', result['status'], "expired deadline of queued chunks wasn't enforced")
+
+    def test_replace_model(self):
+        text = 'The Committee discussed the outlook for inflation and growth. ' * 10 + \
+               'The Governor invited the Committee to vote on the proposition that: Bank Rate should be maintained ' \
+               'at 0.5%.'
+        pool = self.parallel.pool
+        self.assertTrue(self.parallel.replace_model(self.data_extractor))
+        self.assertIsNot(pool, self.parallel.pool, "workers weren't restarted")
+        self.assertEqual(self.data_extractor.analyse(text), self.parallel.analyse(self.data_extractor, text))
+
+    def test_lost_chunks(self):
+        parallel = ParallelExtractor(self.data_extractor, processes=1, chunk_size=200, min_length=0, max_wait=0.5)
+        workers = [process.pid for process in parallel.pool._pool]
+        try:
+            # stopped worker never returns results, like a killed one
+            for pid in workers:
+                os.kill(pid, signal.SIGSTOP)
+            start = time.monotonic()
+            result = parallel.analyse_news(self.data_extractor, 'Bank Rate was maintained at 0.5%. ' * 10)
+            self.assertLess(time.monotonic() - start, 5, "waited for lost chunks too long")
+            self.assertEqual('partial', result['status'])
+            self.assertEqual(64, parallel.free_slots.qsize(), "slot wasn't released")
+        finally:
+            for pid in workers:
+                os.kill(pid, signal.SIGCONT)
+            parallel.close()
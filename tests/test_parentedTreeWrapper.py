@@ -1,18 +1,44 @@
+from collections import namedtuple
 from unittest import TestCase
 
+from model.tree import ParentedTreeWrapper
+
+Token = namedtuple('Token', ['orth_', 'lemma_', 'pos_', 'dep_', 'tag_', 'children'])
+
+
+def token(text, pos, dep, children=()):
+    return Token(text, text.lower(), pos, dep, '', list(children))
+
 
 class TestParentedTreeWrapper(TestCase):
+    def setUp(self):
+        # "Bank Rate was maintained at 0.5%"
+        self.root_token = token('maintained', 'VERB', 'ROOT', [
+            token('Rate', 'PROPN', 'nsubjpass', [token('Bank', 'PROPN', 'compound')]),
+            token('was', 'VERB', 'auxpass'),
+            token('at', 'ADP', 'prep', [token('%', 'NOUN', 'pobj', [token('0.5', 'NUM', 'nummod')])])])
+        self.tree = ParentedTreeWrapper.from_spacy_tree(self.root_token)
+
     def test_from_spacy_tree(self):
-        self.fail()
+        self.assertEqual(self.tree.text, 'maintained')
+        self.assertEqual([child.text for child in self.tree.children], ['Rate', 'was', 'at'])
+        self.assertIs(self.tree[2][0].parent(), self.tree[2])
+
+        # deep trees of run-on sentences don't hit recursion limit
+        deep = token('0', 'NUM', 'ROOT')
+        for index in range(1, 5000):
+            deep = token(str(index), 'NUM', 'conj', [deep])
+        self.assertEqual(len(ParentedTreeWrapper.from_spacy_tree(deep).subtree_tokens()), 5000)
 
     def test_subtree_tokens(self):
-        self.fail()
+        self.assertEqual(self.tree.subtree_tokens(), ['maintained', 'Rate', 'Bank', 'was', 'at', '%', '0.5'])
+        self.assertEqual(self.tree[2].subtree_tokens(), ['at', '%', '0.5'])
 
     def test_is_ancestor(self):
         self.fail()
 
     def test_leaves(self):
-        self.fail()
+        self.assertEqual(self.tree.leaves(), ['Bank', 'was', '0.5'])
 
     def test_less(self):
         self.fail()
@@ -21,16 +47,44 @@ class TestParentedTreeWrapper(TestCase):
         self.fail()
 
     def test_traverse(self):
-        self.fail()
+        self.assertEqual([node.text for node in self.tree.traverse()], self.tree.subtree_tokens())
+        self.assertEqual([node.text for node in self.tree.traverse('postorder')],
+                         ['Bank', 'Rate', 'was', '0.5', '%', 'at', 'maintained'])
+        self.assertEqual(next(self.tree.iter_traverse()), self.tree)
 
     def test_valid(self):
         self.fail()
 
     def test_find_with_properties(self):
-        self.fail()
+        self.assertEqual([node.text for node in self.tree.find_with_properties(pos=['propn'])], ['Rate', 'Bank'])
+        self.assertEqual(self.tree.find_with_properties(pos=['num'], dep=['root']), [])
+
+        validated = []
+        original = ParentedTreeWrapper.valid
+        try:
+            ParentedTreeWrapper.valid = lambda node, **kwargs: validated.append(node) or original(node, **kwargs)
+            self.assertEqual(next(self.tree.iter_with_properties(pos=['propn'])).text, 'Rate')
+        finally:
+            ParentedTreeWrapper.valid = original
+        self.assertEqual(len(validated), 2)
 
     def test_deepcopy(self):
-        self.fail()
+        copied = self.tree.deepcopy()
+        self.assertEqual(self.tree.subtree_tokens(), copied.subtree_tokens())
+        self.assertIsNot(self.tree[2][0], copied[2][0])
+        self.assertIs(copied[2][0].parent(), copied[2])
+        self.assertIsNone(copied.parent())
+
+        # subtree is copied without its parent, shared memo copies nodes once
+        memo = {}
+        subtree = self.tree[2].deepcopy(memo)
+        self.assertIsNone(subtree.parent())
+        self.assertIs(subtree[0], self.tree[2][0].deepcopy(memo))
+
+        deep = token('0', 'NUM', 'ROOT')
+        for index in range(1, 5000):
+            deep = token(str(index), 'NUM', 'conj', [deep])
+        self.assertEqual(5000, len(ParentedTreeWrapper.from_spacy_tree(deep).deepcopy().subtree_tokens()))
 
     def test__get_node(self):
         self.fail()
@@ -0,0 +1,68 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from model.history import RateHistory, meeting_date, parse_value
+from model.manifest import Manifest
+
+
+class TestRateHistory(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.history = RateHistory(os.path.join(self.directory.name, 'history.sqlite'))
+        statements = [('a', '2016-03-17', '0.5', '£375'),
+                      ('b', '2016-08-04', '0.25', '£435'),
+                      ('c', '2016-09-15', '0.25', '£435'),
+                      ('d', '2017-11-02', '0.5', '')]
+        for key, date, rate, qe in statements:
+            self.history.put(key, {'news': '', 'Bank_Rate': rate, 'QE': qe}, date=date)
+
+    def tearDown(self):
+        self.history.close()
+        self.directory.cleanup()
+
+    def test_meeting_date(self):
+        self.assertEqual(('2018-08-01', 'day'),
+                         meeting_date('At its meeting ending on 1 August 2018, the MPC voted unanimously'))
+        self.assertEqual(('2013-10-01', 'month'),
+                         meeting_date('The Governor invited', 'https://www.bankofengland.co.uk/minutes/2013/'
+                                                             'monetary-policy-committee-october-2013'))
+        self.assertEqual(('2017-11-01', 'month'), meeting_date('Monetary policy summary, november 2017 the bank'))
+        url = 'https://www.bankofengland.co.uk/monetary-policy-summary-and-minutes/2016/august-2016'
+        self.assertEqual(('2016-08-04', 'day'),
+                         meeting_date('Monetary Policy Summary, 4 August 2016. The Bank of England sets', url))
+        self.assertEqual(('2016-08-01', 'month'),
+                         meeting_date('Monetary Policy Summary, August 2016. ' + 'x ' * 200 + 'On 3 March 2009 the'))
+        self.assertEqual((None, None), meeting_date('Bank Rate was maintained at 0.5%.'))
+
+    def test_parse_value(self):
+        self.assertEqual(0.5, parse_value('0.5%'))
+        self.assertEqual(435.0, parse_value('£435'))
+        self.assertIsNone(parse_value(''))
+
+    def test_put(self):
+        self.assertEqual(4, len(self.history))
+        self.assertFalse(self.history.put('e', {'news': 'no date', 'Bank_Rate': '0.5', 'QE': ''}))
+        self.assertFalse(self.history.put('f', {'news': '', 'Bank_Rate': '', 'QE': ''}, date='2018-01-01'))
+
+    def test_as_of(self):
+        self.assertEqual(0.25, self.history.as_of('2016-08-04')['value'])
+        self.assertEqual(0.5, self.history.as_of('2016-08-03')['value'])
+        self.assertEqual('c', self.history.as_of('2017-12-01', 'QE')['key'], "empty value was used")
+        self.assertIsNone(self.history.as_of('2000-01-01'))
+
+    def test_range(self):
+        self.assertEqual(['b', 'c'], [record['key'] for record in self.history.range('2016-04-01', '2016-12-31')])
+        self.assertEqual(['b'], [record['key'] for record in self.history.range('2016-04-01', '2017-12-31', 'QE',
+                                                                                changes=True)])
+        self.assertEqual(['a', 'b', 'd'], [record['key'] for record in self.history.range('2009-01-01', '2017-12-31',
+                                                                                          changes=True)])
+
+    def test_import_manifest(self):
+        manifest = Manifest(os.path.join(self.directory.name, 'manifest.sqlite'))
+        manifest.put([{'key': 'https://www.bankofengland.co.uk/minutes/2009/monetary-policy-committee-march-2009',
+                       'content_hash': 'hash', 'contexts_fingerprint': 'contexts', 'model_fingerprint': 'model',
+                       'result': {'news': 'The Governor invited', 'Bank_Rate': '0.5', 'QE': '£75'}}])
+        self.assertEqual(1, self.history.import_manifest(manifest))
+        self.assertEqual(75.0, self.history.as_of('2009-03-31', 'QE')['value'])
+        manifest.close()
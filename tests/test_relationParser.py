@@ -0,0 +1,36 @@
+from unittest import TestCase
+
+from model.relation_parser import NO_RELATION, annotate, find_phrases, find_relation
+
+
+class TestRelationParser(TestCase):
+    def setUp(self):
+        self.words = ('the bank rate should be maintained at 0.5 % ; the bank should maintain the stock of purchased '
+                      'assets at £ 375 billion').split()
+
+    def test_find_phrases(self):
+        self.assertEqual(find_phrases(self.words, [('bank', 'rate')]), [2])
+        self.assertEqual(find_phrases(self.words, [('stock',), ('purchased', 'assets')]), [15, 18])
+
+    def test_find_relation(self):
+        self.assertEqual(find_relation(self.words, 'Bank_Rate', '0.5%'), (2, 7))
+        self.assertEqual(find_relation(self.words, 'QE', '£375'), (18, 21))
+        self.assertIsNone(find_relation(self.words, 'QE', '£435'))
+        self.assertIsNone(find_relation(self.words, 'Bank_Rate', ''))
+
+    def test_annotate(self):
+        annotation = annotate(self.words, {'Bank_Rate': '0.5%', 'QE': '£375'})
+        self.assertEqual(annotation['deps'][2], 'ROOT')
+        self.assertEqual((annotation['heads'][7], annotation['deps'][7]), (2, 'BANK_RATE'))
+        self.assertEqual((annotation['heads'][21], annotation['deps'][21]), (18, 'QE'))
+        self.assertEqual(annotation['heads'][19], 18)
+        self.assertEqual(annotation['heads'][22], 2)
+        self.assertEqual(sum(dep != NO_RELATION for dep in annotation['deps']), 3)
+
+        # arcs don't cross, so the parser can learn the tree
+        arcs = [(min(head, index), max(head, index)) for index, head in enumerate(annotation['heads'])]
+        for start, end in arcs:
+            for other_start, other_end in arcs:
+                self.assertFalse(start < other_start < end < other_end)
+
+        self.assertIsNone(annotate(self.words, {'Bank_Rate': '', 'QE': '£435'}))
@@ -0,0 +1,62 @@
+import threading
+import time
+from unittest import TestCase
+
+from utils.profiler import SamplingProfiler
+
+
+def context_search(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def handler(stop):
+    context_search(stop)
+
+
+def idle(stop):
+    stop.wait()
+
+
+class TestSamplingProfiler(TestCase):
+    def setUp(self):
+        self.stop = threading.Event()
+        self.threads = [threading.Thread(target=handler, args=(self.stop,)),
+                        threading.Thread(target=idle, args=(self.stop,))]
+        for thread in self.threads:
+            thread.start()
+
+    def tearDown(self):
+        self.stop.set()
+        for thread in self.threads:
+            thread.join()
+
+    def test_profile(self):
+        profiler = SamplingProfiler(interval=0.001, roots=[handler])
+        self.assertTrue(profiler.profile(0.2))
+        self.assertFalse(profiler.active)
+        self.assertGreater(profiler.samples, 0)
+
+        lines = profiler.collapsed().split('\n')
+        self.assertGreater(len(lines), 0)
+        for line in lines:
+            stack, count = line.rsplit(' ', 1)
+            self.assertTrue(stack.startswith('stage:'))
+            self.assertIn('test_samplingProfiler.py:handler', stack, "stack outside of roots was recorded")
+            self.assertGreater(int(count), 0)
+
+    def test_profile_requests(self):
+        profiler = SamplingProfiler(interval=0.001)
+        finisher = threading.Timer(0.05, lambda: [profiler.request_finished() for _ in range(2)])
+        finisher.start()
+
+        start = time.monotonic()
+        self.assertTrue(profiler.profile(10, requests=2))
+        self.assertLess(time.monotonic() - start, 5, "profiling didn't stop after requests")
+        finisher.join()
+
+    def test_stage_totals(self):
+        profiler = SamplingProfiler()
+        profiler.stacks.update({'stage:parse;a;b': 3, 'stage:context_match;a;c': 1})
+        self.assertEqual({'parse': 0.75, 'context_match': 0.25}, profiler.stage_totals())
+        self.assertEqual({}, SamplingProfiler().stage_totals())
@@ -0,0 +1,61 @@
+import gzip
+from unittest import TestCase
+
+from utils import serialization
+
+
+class TestSerialization(TestCase):
+    def setUp(self):
+        self.results = [{'news': 'Bank Rate was maintained at 0.5%.', 'Bank_Rate': '0.5', 'QE': ''},
+                        {'news': 'Purchases of £375 billion.', 'Bank_Rate': '', 'QE': '375'}]
+
+    def test_dumps_loads(self):
+        for content_type in serialization.content_types():
+            data = serialization.dumps(self.results, content_type)
+            self.assertEqual(self.results, serialization.loads(data, content_type), f"{content_type} isn't symmetric")
+
+        self.assertLess(len(serialization.dumps(self.results, serialization.MSGPACK)),
+                        len(serialization.dumps(self.results)), "msgpack isn't more compact than json")
+
+    def test_compress_decompress(self):
+        data = serialization.dumps(self.results * 100)
+        for encoding in serialization.content_encodings():
+            compressed, applied = serialization.compress(data, encoding)
+            self.assertEqual(encoding, applied)
+            self.assertLess(len(compressed), len(data))
+            self.assertEqual(data, serialization.decompress(compressed, encoding))
+
+        self.assertEqual((b'[]', None), serialization.compress(b'[]', 'gzip'), "small body was compressed")
+        self.assertEqual(data, serialization.decompress(data, 'identity'))
+        with self.assertRaises(ValueError):
+            serialization.decompress(data, 'br')
+
+    def test_decompress_limit(self):
+        data = b' ' * 10 ** 7
+        for encoding in serialization.content_encodings():
+            compressed, _ = serialization.compress(data, encoding)
+            self.assertLess(len(compressed), 10 ** 5)
+            with self.assertRaises(serialization.BodyTooLarge):
+                serialization.decompress(compressed, encoding, max_size=10 ** 6)
+            self.assertEqual(data, serialization.decompress(compressed, encoding, max_size=10 ** 7))
+
+        with self.assertRaises(serialization.BodyTooLarge):
+            serialization.decompress(data, 'identity', max_size=10)
+        # concatenated gzip members are one body
+        self.assertEqual(b'ab', serialization.decompress(gzip.compress(b'a') + gzip.compress(b'b'), 'gzip', 10))
+        with self.assertRaises(ValueError):
+            serialization.decompress(gzip.compress(data)[:1000], 'gzip')
+        with self.assertRaises(ValueError):
+            serialization.decompress(b'not gzip', 'gzip')
+
+    def test_compact(self):
+        self.assertIs(self.results, serialization.compact(self.results, 'full'))
+
+        compacted = serialization.compact(self.results, 'none')
+        self.assertEqual([0, 1], [result['id'] for result in compacted])
+        self.assertNotIn('news', compacted[0])
+        self.assertEqual('375', compacted[1]['QE'])
+        self.assertIn('news', self.results[0], "original results were modified")
+
+        compacted = serialization.compact(self.results, '4')
+        self.assertEqual(['Bank', 'Purc'], [result['news'] for result in compacted])
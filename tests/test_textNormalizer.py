@@ -0,0 +1,48 @@
+import os
+from unittest import TestCase
+
+import pandas as pd
+
+from model.normalizer import TextNormalizer
+from utils.benchmark_normalizer import baseline
+
+NEWS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'data', 'bank_of_england_news.csv')
+
+
+class TestTextNormalizer(TestCase):
+    def setUp(self):
+        self.normalizer = TextNormalizer({' stg ': ' £ ', ' bn ': ' billion '})
+
+    def test_normalize(self):
+        self.assertEqual('Quick brown fox jumps over the lazy dog',
+                         self.normalizer.normalize('QUICK BROWN FOX   JUMPS  OVER THE  LAZY DOG'))
+        self.assertEqual('Purchases at £ 375 billion of gilts',
+                         self.normalizer.normalize('\n Purchases at STG\n375  bn of gilts \t'))
+        self.assertEqual('Stg 10 at stg', self.normalizer.normalize('stg 10 at stg'),
+                         "keys were replaced at the edges of the text")
+
+    def test_key_pattern(self):
+        self.assertEqual(r'(?<=\S)\s+stg\s+(?=\S)', TextNormalizer.key_pattern(' stg '))
+        self.assertEqual(r'per\s+cent', TextNormalizer.key_pattern('per cent'))
+
+    def test_normalize_stream(self):
+        text = ' The Committee voted  to maintain the stock at stg 375 bn. Bank Rate maintained at 0.5%.\n'
+        for size in range(1, 10):
+            chunks = [text[i:i + size] for i in range(0, len(text), size)]
+            self.assertEqual(self.normalizer.normalize(text), ''.join(self.normalizer.normalize_stream(chunks)),
+                             f"streaming with chunk size {size} isn't correct")
+
+    def test_source_offset(self):
+        text = '  Bank   RATE stg 5'
+        normalized, spans = self.normalizer.normalize(text, offsets=True)
+
+        self.assertEqual('Bank rate £ 5', normalized)
+        self.assertEqual(text.index('RATE'), TextNormalizer.source_offset(spans, normalized.index('rate')))
+        self.assertEqual(text.index('5'), TextNormalizer.source_offset(spans, normalized.index('5')))
+
+    def test_normalize_corpus(self):
+        # speed is compared with baseline by utils.benchmark_normalizer
+        text = ' '.join(pd.read_csv(NEWS_FILE)['content'].dropna())
+        for rules in [{' stg ': ' £ '}, {f' rule{index} ': f' value{index} ' for index in range(30)}]:
+            self.assertEqual(baseline(text, rules), TextNormalizer(rules).normalize(text),
+                             f"normalize differs from split, join and replace with {len(rules)} rules")
@@ -0,0 +1,74 @@
+from collections import namedtuple
+from types import SimpleNamespace
+from unittest import TestCase
+
+from model.tree import ParentedTreeWrapper, SentenceTrees, ValidatorCache
+
+Token = namedtuple('Token', ['orth_', 'lemma_', 'pos_', 'dep_', 'tag_'])
+
+
+def node(text, pos, dep, children=None):
+    return ParentedTreeWrapper(Token(text, text.lower(), pos, dep, ''), children or [])
+
+
+class TestValidatorCache(TestCase):
+    def setUp(self):
+        # "Bank Rate was maintained at 0.5%"
+        self.tree = node('maintained', 'VERB', 'ROOT', [
+            node('Rate', 'PROPN', 'nsubjpass', [node('Bank', 'PROPN', 'compound')]),
+            node('was', 'VERB', 'auxpass'),
+            node('at', 'ADP', 'prep', [node('%', 'NOUN', 'pobj', [node('0.5', 'NUM', 'nummod')])])])
+
+    def test_find_with_properties(self):
+        cache = ValidatorCache()
+        for validator in [{'pos': ['propn']}, {'dep': ['pobj'], 'good_subtree_tokens': ['0.5']},
+                          {'bad_subtree_tokens': ['bank']}]:
+            expected = self.tree.find_with_properties(**validator)
+            self.assertEqual(cache.find_with_properties(self.tree, 'key', validator), expected)
+            cache = ValidatorCache()
+
+    def test_find_with_properties_reuse(self):
+        cache = ValidatorCache()
+        calls = []
+        validator = {'pos': ['num']}
+
+        original = ParentedTreeWrapper.valid
+
+        def valid(tree, **kwargs):
+            calls.append(tree)
+            return original(tree, **kwargs)
+
+        ParentedTreeWrapper.valid = valid
+        try:
+            first = cache.find_with_properties(self.tree, 'num', validator)
+            second = cache.find_with_properties(self.tree, 'num', validator)
+            subtree = cache.find_with_properties(self.tree[2], 'num', validator)
+        finally:
+            ParentedTreeWrapper.valid = original
+
+        self.assertEqual([x.text for x in first], ['0.5'])
+        self.assertIs(first, second)
+        self.assertEqual([x.text for x in subtree], ['0.5'])
+        # every node is evaluated once for the key, subtree reuses evaluations of the whole tree
+        self.assertEqual(len(calls), len(self.tree.traverse()))
+
+
+
+class TestSentenceTrees(TestCase):
+    def test_iter(self):
+        SpacyToken = namedtuple('SpacyToken', ['orth_', 'lemma_', 'pos_', 'dep_', 'tag_', 'children'])
+        roots = [SpacyToken(text, text, 'VERB', 'ROOT', '', []) for text in ['maintained', 'voted', 'purchased']]
+        doc = SimpleNamespace(sents=(SimpleNamespace(root=root) for root in roots))
+        sentences = SentenceTrees(doc)
+
+        tree, cache = next(iter(sentences))
+        self.assertEqual('maintained', tree.text)
+        self.assertEqual(1, len(sentences.trees), "trees aren't built lazily")
+
+        # every target iterates over the same trees and caches
+        first = list(sentences)
+        second = list(sentences)
+        self.assertEqual(['maintained', 'voted', 'purchased'], [tree.text for tree, _ in first])
+        self.assertIs(tree, first[0][0])
+        self.assertIs(cache, first[0][1])
+        self.assertEqual([id(tree) for tree, _ in first], [id(tree) for tree, _ in second])
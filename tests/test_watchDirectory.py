@@ -0,0 +1,140 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+from unittest import TestCase
+
+from utils import watch_directory
+from utils.watch_directory import DirectoryWatcher, IngestionDaemon, read_statements, write_atomically
+
+
+class Extractor(object):
+    """Stands in for DataExtractor, results don't need spacy"""
+
+    def analyse(self, texts):
+        if 'fail' in texts:
+            raise ValueError('broken statement')
+        if 'crash' in texts:
+            os._exit(1)
+        return [{'news': text, 'Bank_Rate': '0.5', 'QE': ''} for text in texts]
+
+
+class TestWatchDirectory(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.inbox = os.path.join(self.directory.name, 'inbox')
+        os.makedirs(self.inbox)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def drop(self, name, content, age=10):
+        path = os.path.join(self.inbox, name)
+        with open(path, 'w') as file:
+            file.write(content)
+        os.utime(path, (time.time() - age, time.time() - age))
+        return path
+
+    def test_read_statements(self):
+        self.assertEqual(['text'], read_statements(self.drop('a.txt', 'text')))
+        self.assertEqual(['a', 'b'], read_statements(self.drop('b.json', json.dumps(['a', 'b', 1]))))
+        self.assertRaises(ValueError, read_statements, self.drop('c.json', json.dumps({'a': 'b'})))
+
+    def test_write_atomically(self):
+        path = os.path.join(self.directory.name, 'result.json')
+        write_atomically(path, {'a': 1})
+        with open(path) as file:
+            self.assertEqual({'a': 1}, json.load(file))
+        self.assertEqual(['inbox', 'result.json'], sorted(os.listdir(self.directory.name)))
+
+    def test_watcher_settle(self):
+        watcher = DirectoryWatcher(self.inbox, settle=0.2)
+        self.drop('old.txt', 'text')
+        self.drop('new.txt', 'text', age=0)
+        self.drop('ignored.csv', 'text')
+
+        start = time.time()
+        ready = watcher.poll()
+        self.assertEqual(['old.txt'], [os.path.basename(path) for path, _ in ready])
+        self.assertGreaterEqual(ready[0][1], start, "arrival of moved in file is its old modification time")
+        time.sleep(0.3)
+        self.assertEqual(['old.txt', 'new.txt'], [os.path.basename(path) for path, _ in watcher.poll()])
+
+    def test_daemon(self):
+        output = os.path.join(self.directory.name, 'results')
+        processed = os.path.join(self.directory.name, 'processed')
+        failed = os.path.join(self.directory.name, 'failed')
+        daemon = IngestionDaemon(self.inbox, output, processed, failed, settle=0, data_extractor=Extractor())
+        self.drop('good.txt', 'Bank Rate was maintained at 0.5%.')
+        self.drop('bad.json', json.dumps(['fail']))
+
+        finished = []
+        deadline = time.time() + 5
+        while len(finished) < 2 and time.time() < deadline:
+            finished.extend(daemon.poll_once())
+            time.sleep(0.01)
+        daemon.stop()
+
+        self.assertEqual({'good.txt': 'processed', 'bad.json': 'failed'},
+                         {report['file']: report['status'] for report in finished})
+        self.assertEqual([], os.listdir(self.inbox))
+        self.assertEqual(['good.txt'], os.listdir(processed))
+        self.assertEqual(['bad.json'], os.listdir(failed))
+        with open(os.path.join(output, 'good.txt.result.json')) as file:
+            self.assertEqual('0.5', json.load(file)['results'][0]['Bank_Rate'])
+
+        stats = daemon.stats()
+        self.assertEqual(1, stats['processed'])
+        self.assertEqual(1, stats['failed'])
+        # files are 10 seconds old, latency counts from when they were seen
+        self.assertLess(stats['p50'], 5)
+
+    def finish(self, daemon, count):
+        finished = []
+        deadline = time.time() + 10
+        while len(finished) < count and time.time() < deadline:
+            finished.extend(daemon.poll_once())
+            time.sleep(0.01)
+        return finished
+
+    def test_daemon_broken_pool(self):
+        def init_worker(context_file):
+            watch_directory._worker['data_extractor'] = Extractor()
+
+        original = watch_directory._init_worker
+        watch_directory._init_worker = init_worker
+        try:
+            daemon = IngestionDaemon(self.inbox, *[os.path.join(self.directory.name, name)
+                                                   for name in ('results', 'processed', 'failed')],
+                                     processes=1, settle=0)
+            self.drop('crash.json', json.dumps(['crash']), age=20)
+            self.drop('good.txt', 'Bank Rate was maintained at 0.5%.')
+            finished = self.finish(daemon, 2)
+            self.drop('later.txt', 'Bank Rate was maintained at 0.5%.')
+            finished.extend(self.finish(daemon, 1))
+            daemon.stop()
+        finally:
+            watch_directory._init_worker = original
+
+        self.assertEqual({'crash.json': 'failed', 'good.txt': 'processed', 'later.txt': 'processed'},
+                         {report['file']: report['status'] for report in finished},
+                         "files after a dead worker weren't processed")
+        self.assertGreaterEqual(daemon.stats()['restarts'], 1)
+
+    def test_daemon_finish_error(self):
+        processed = os.path.join(self.directory.name, 'processed')
+        daemon = IngestionDaemon(self.inbox, os.path.join(self.directory.name, 'results'), processed,
+                                 os.path.join(self.directory.name, 'failed'), settle=0, data_extractor=Extractor())
+        # processed files can't be moved
+        shutil.rmtree(processed)
+        with open(processed, 'w') as file:
+            file.write('')
+        self.drop('good.txt', 'Bank Rate was maintained at 0.5%.')
+
+        finished = self.finish(daemon, 1)
+        self.assertEqual('error', finished[0]['status'])
+        self.assertEqual([], daemon.poll_once(), "file with error was analysed again")
+        daemon.stop()
+        self.assertEqual(['good.txt'], os.listdir(self.inbox))
+        self.assertEqual(1, daemon.stats()['errors'])
@@ -0,0 +1,104 @@
+import os
+import tempfile
+import time
+from unittest import TestCase
+
+from model.work_queue import WorkQueue
+from utils.distributed import run_worker
+
+
+class Extractor(object):
+    """Stands in for DataExtractor, results don't need spacy"""
+
+    def __init__(self):
+        self.analysed = 0
+
+    def analyse(self, text):
+        self.analysed += 1
+        if text == 'fail':
+            raise ValueError('broken document')
+        return [{'news': text, 'Bank_Rate': str(len(text)), 'QE': ''}]
+
+
+class TestWorkQueue(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.directory.name, 'queue.sqlite')
+        self.queue = WorkQueue(self.filename, lease_seconds=60)
+        self.documents = [(f'doc{i}', 'text' * i) for i in range(5)]
+
+    def tearDown(self):
+        self.queue.close()
+        self.directory.cleanup()
+
+    def test_add_chunks(self):
+        self.assertEqual(3, self.queue.add_chunks(self.documents, chunk_size=2))
+        self.assertEqual(0, self.queue.add_chunks(self.documents, chunk_size=2), "chunks were enqueued twice")
+        progress = self.queue.progress()
+        self.assertEqual(3, progress['pending'])
+        self.assertEqual(5, progress['documents'])
+
+    def test_lease_and_commit(self):
+        self.queue.add_chunks(self.documents, chunk_size=5)
+        other = WorkQueue(self.filename, lease_seconds=60)
+        lease = self.queue.lease('a')
+        self.assertEqual(5, len(lease['documents']))
+        self.assertIsNone(other.lease('b'), "leased chunk was leased again")
+
+        self.assertTrue(self.queue.renew(lease))
+        self.assertTrue(self.queue.commit(lease, {'doc0': {'QE': ''}}, 'a'))
+        self.assertFalse(other.commit(lease, {'doc0': {'QE': 'other'}}, 'b'), "commit isn't idempotent")
+        self.assertEqual([('doc0', {'QE': ''})], list(other.results()))
+        self.assertTrue(other.finished())
+        other.close()
+
+    def test_expired_lease(self):
+        self.queue.add_chunks(self.documents, chunk_size=5)
+        self.queue.lease_seconds = 0.01
+        first = self.queue.lease('a')
+        time.sleep(0.05)
+
+        second = self.queue.lease('b')
+        self.assertIsNotNone(second, "expired lease wasn't retried")
+        self.assertEqual(first['id'], second['id'])
+        self.assertFalse(self.queue.renew(first), "expired lease was renewed")
+
+        self.queue.max_attempts = 2
+        time.sleep(0.05)
+        self.assertIsNone(self.queue.lease('c'))
+        self.assertEqual(1, self.queue.progress()['failed'])
+
+    def test_run_worker(self):
+        self.queue.add_chunks(self.documents + [('bad', 'fail')], chunk_size=2)
+        stats = run_worker(self.queue, Extractor(), 'worker', poll_interval=0)
+
+        self.assertEqual(2, stats['chunks'])
+        self.assertEqual(4, stats['documents'])
+        self.assertEqual(3, stats['failed'])
+        progress = self.queue.progress()
+        self.assertEqual(2, progress['done'])
+        self.assertEqual(1, progress['failed'])
+        self.assertEqual({'worker': 4}, progress['workers'])
+        self.assertEqual('8', dict(self.queue.results())['doc2']['Bank_Rate'])
+
+    def test_run_worker_lost_lease(self):
+        self.queue.add_chunks(self.documents, chunk_size=5)
+        self.queue.lease_seconds = 0.01
+        other = WorkQueue(self.filename, lease_seconds=60)
+
+        # lease expires while the first document is analysed and another worker takes and finishes the chunk
+        def take_over(text):
+            time.sleep(0.05)
+            lease = other.lease('other')
+            other.commit(lease, {key: {'QE': 'other'} for key, _ in lease['documents']}, 'other')
+            return original(text)
+
+        extractor = Extractor()
+        original = extractor.analyse
+        extractor.analyse = take_over
+        stats = run_worker(self.queue, extractor, 'worker', poll_interval=0)
+        other.close()
+
+        self.assertEqual(1, extractor.analysed, "chunk wasn't abandoned after failed renewal")
+        self.assertEqual((0, 1), (stats['chunks'], stats['lost']))
+        self.assertEqual('other', dict(self.queue.results())['doc1']['QE'])
@@ -0,0 +1,95 @@
+import threading
+import time
+
+
+class AdmissionController(object):
+    """
+    Limits number of concurrently running analyses and number of requests waiting for them.
+    Requests over the limits are rejected immediately (queue is full) or after waiting too long in the queue,
+    so latency of admitted requests stays predictable under bursts.
+    """
+
+    def __init__(self, max_in_flight=4, max_queue=16, queue_timeout=10.0):
+        assert max_in_flight > 0, f'max_in_flight should be positive, got {max_in_flight}!'
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.condition = threading.Condition()
+        self.in_flight = 0
+        self.waiting = 0
+        self.counters = {'admitted': 0, 'completed': 0, 'shed_queue_full': 0, 'shed_timeout': 0, 'queued': 0}
+        self.queue_wait = {'total': 0.0, 'max': 0.0}
+
+    def acquire(self):
+        """
+        Waits for a free analysis slot
+
+        Returns:
+            result: (bool) request is admitted; if True, release has to be called after analysis
+        """
+        with self.condition:
+            if self.in_flight < self.max_in_flight and self.waiting == 0:
+                self.in_flight += 1
+                self.counters['admitted'] += 1
+                return True
+
+            if self.waiting >= self.max_queue:
+                self.counters['shed_queue_full'] += 1
+                return False
+
+            self.waiting += 1
+            self.counters['queued'] += 1
+            start = time.monotonic()
+            deadline = start + self.queue_timeout
+            try:
+                while self.in_flight >= self.max_in_flight:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.counters['shed_timeout'] += 1
+                        return False
+                    self.condition.wait(remaining)
+            finally:
+                self.waiting -= 1
+                waited = time.monotonic() - start
+                self.queue_wait['total'] += waited
+                self.queue_wait['max'] = max(self.queue_wait['max'], waited)
+
+            self.in_flight += 1
+            self.counters['admitted'] += 1
+            return True
+
+    def release(self):
+        """Frees analysis slot taken by acquire"""
+        with self.condition:
+            self.in_flight -= 1
+            self.counters['completed'] += 1
+            self.condition.notify()
+
+    def retry_after(self):
+        """
+        Rough estimate for 'Retry-After' header of rejected requests
+
+        Returns:
+            seconds: (int) seconds after which client may retry
+        """
+        with self.condition:
+            average_wait = self.queue_wait['total'] / self.counters['queued'] if self.counters['queued'] else 0.0
+        return max(1, int(round(average_wait)))
+
+    def stats(self):
+        """
+        Returns:
+            stats: (dict) current load, limits, counters of admitted and shed requests and queue waiting times
+        """
+        with self.condition:
+            stats = {'in_flight': self.in_flight,
+                     'waiting': self.waiting,
+                     'max_in_flight': self.max_in_flight,
+                     'max_queue': self.max_queue,
+                     'queue_timeout': self.queue_timeout}
+            stats.update(self.counters)
+            stats['queue_wait_total'] = self.queue_wait['total']
+            stats['queue_wait_max'] = self.queue_wait['max']
+            stats['queue_wait_average'] = self.queue_wait['total'] / self.counters['queued'] \
+                if self.counters['queued'] else 0.0
+        return stats
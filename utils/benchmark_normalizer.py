@@ -0,0 +1,82 @@
+"""Compares speed of TextNormalizer with plain split, join and replace filtering"""
+import argparse
+import json
+import sys
+import time
+
+import pandas as pd
+
+from model.normalizer import TextNormalizer
+
+
+def baseline(text, rules):
+    """
+    Filters text the way DataExtractor did before TextNormalizer: whitespace is collapsed, text capitalized and rules
+    replaced one by one
+
+    Args:
+        text: (str) bank news
+        rules: (dict) replaced strings as keys and their replacements as values
+
+    Returns:
+        filtered_text: (str) filtered news
+    """
+    filtered_text = ' '.join(text.split()).capitalize()
+    for key, replacement in rules.items():
+        filtered_text = filtered_text.replace(key, replacement)
+    return filtered_text
+
+
+def best_time(function, repeat=5):
+    """
+    Args:
+        function: (callable) timed function without arguments
+        repeat: (int) number of runs
+
+    Returns:
+        seconds: (float) time of the fastest run
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def benchmark(text, rules, repeat=5):
+    """
+    Args:
+        text: (str) bank news
+        rules: (dict) normalization rules
+        repeat: (int) number of timed runs of each filtering
+
+    Returns:
+        report: (dict) with keys [rules, normalize_seconds, baseline_seconds, ratio]
+    """
+    normalizer = TextNormalizer(rules)
+    assert normalizer.normalize(text) == baseline(text, rules), 'normalize differs from baseline filtering!'
+
+    normalize_seconds = best_time(lambda: normalizer.normalize(text), repeat)
+    baseline_seconds = best_time(lambda: baseline(text, rules), repeat)
+    return {'rules': len(rules),
+            'normalize_seconds': normalize_seconds,
+            'baseline_seconds': baseline_seconds,
+            'ratio': normalize_seconds / baseline_seconds}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--news_file', default='data/bank_of_england_news.csv', help="csv file with news")
+    parser.add_argument('--text_column', default='content', help="name of csv column containing news text")
+    parser.add_argument('--repeat', default=5, type=int, help="number of timed runs")
+    parser.add_argument('--max_ratio', default=1.5, type=float,
+                        help="exit with error if normalize is this many times slower than baseline")
+    args = parser.parse_args()
+
+    corpus = ' '.join(pd.read_csv(args.news_file)[args.text_column].dropna())
+    reports = [benchmark(corpus, rules, args.repeat)
+               for rules in [{' stg ': ' £ '}, {f' rule{index} ': f' value{index} ' for index in range(30)}]]
+    print(json.dumps(reports, indent=2))
+    if any(report['ratio'] > args.max_ratio for report in reports):
+        sys.exit(1)
@@ -0,0 +1,238 @@
+"""Python client of the API service"""
+import asyncio
+import queue
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+RETRY_STATUSES = (429, 503)
+
+
+class Client(object):
+    """
+    Client of the API service keeping pooled keep-alive connections. Single texts given to analyse (possibly from many
+    threads) are grouped into POST batches of up to max_batch_size texts, batch is sent when it's full or max_delay
+    seconds after its first text. Up to pool_size batches are sent at the same time, so a slow or retried batch
+    doesn't hold back the next ones. Requests rejected with 429 or 503 and failed connections are retried with
+    exponential backoff (or after 'Retry-After' seconds). If service stays unavailable, texts are analysed in-process
+    by fallback DataExtractor when it's given.
+    """
+
+    def __init__(self, url='http://localhost:5000/', max_batch_size=32, max_delay=0.01, retries=3, backoff=0.5,
+                 timeout=60.0, pool_size=10, fallback=None):
+        """
+        Args:
+            url: (str) API service url
+            max_batch_size: (int) maximum number of texts in one request
+            max_delay: (float) maximum seconds single text waits for other texts of its batch
+            retries: (int) number of retries of rejected or failed request
+            backoff: (float) delay before the first retry in seconds, doubled for every next one
+            timeout: (float) request timeout in seconds
+            pool_size: (int) number of pooled connections and of batches sent at the same time
+            fallback: (DataExtractor or bool) extractor analysing texts in-process when service is unavailable,
+            True creates one with default parameters when it's needed first time
+        """
+        self.url = url
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.fallback = fallback
+        self.fallback_lock = threading.Lock()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self.pending = queue.Queue()
+        self.closed = threading.Event()
+        self.batcher = None
+        self.senders = ThreadPoolExecutor(pool_size, thread_name_prefix='client-sender')
+        self.lock = threading.Lock()
+        self.counters = {'requests': 0, 'retries': 0, 'fallbacks': 0}
+
+    def analyse(self, text):
+        """
+        Analyses single text, it's sent together with other texts analysed at the same time
+
+        Args:
+            text: (str) bank news
+
+        Returns:
+            result: (dict) analysis result (see DataExtractor.analyse)
+        """
+        return self.submit(text).result()
+
+    def submit(self, text):
+        """
+        Queues single text for the next batch
+
+        Args:
+            text: (str) bank news
+
+        Returns:
+            future: (Future) of analysis result
+        """
+        assert not self.closed.is_set(), 'client is closed!'
+        with self.lock:
+            if self.batcher is None:
+                self.batcher = threading.Thread(target=self._batch, name='client-batcher', daemon=True)
+                self.batcher.start()
+        future = Future()
+        self.pending.put((text, future))
+        return future
+
+    def analyse_batch(self, texts):
+        """
+        Analyses texts in requests of up to max_batch_size texts
+
+        Args:
+            texts: (list) bank news
+
+        Returns:
+            results: (list) analysis results in order of texts
+        """
+        results = []
+        for start in range(0, len(texts), self.max_batch_size):
+            results.extend(self.post(texts[start:start + self.max_batch_size]))
+        return results
+
+    def post(self, texts):
+        """
+        Sends one batch with retries, analyses it with fallback extractor if service stays unavailable
+
+        Args:
+            texts: (list) bank news
+
+        Returns:
+            results: (list) analysis results in order of texts
+        """
+        error = None
+        for attempt in range(self.retries + 1):
+            if attempt > 0:
+                self._count('retries')
+            delay = self.backoff * 2 ** attempt * (0.5 + random.random() / 2)
+            try:
+                self._count('requests')
+                response = self.session.post(self.url, json=texts, timeout=self.timeout)
+                if response.status_code not in RETRY_STATUSES:
+                    response.raise_for_status()
+                    return response.json()
+                error = requests.HTTPError(f'{response.status_code} {response.reason}', response=response)
+                retry_after = response.headers.get('Retry-After', '')
+                delay = float(retry_after) if retry_after.isdigit() else delay
+            except (requests.ConnectionError, requests.Timeout) as exception:
+                error = exception
+            if attempt < self.retries:
+                time.sleep(delay)
+
+        if self.fallback is None or self.fallback is False:
+            raise error
+        return self._analyse_locally(texts)
+
+    def _analyse_locally(self, texts):
+        with self.fallback_lock:
+            if self.fallback is True:
+                from model.data_extraction import DataExtractor
+                self.fallback = DataExtractor()
+            self._count('fallbacks')
+            return self.fallback.analyse(list(texts))
+
+    def _count(self, name):
+        with self.lock:
+            self.counters[name] += 1
+
+    def _batch(self):
+        while not self.closed.is_set() or not self.pending.empty():
+            try:
+                batch = [self.pending.get(timeout=0.1)]
+            except queue.Empty:
+                continue
+
+            end = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch_size:
+                remaining = end - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.pending.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            self.senders.submit(self._send, batch)
+
+    def _send(self, batch):
+        try:
+            results = self.post([text for text, _ in batch])
+            if not isinstance(results, list) or len(results) != len(batch):
+                raise ValueError(f'service returned {len(results) if isinstance(results, list) else "no"} results '
+                                 f'for {len(batch)} texts')
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+        except Exception as error:
+            for _, future in batch:
+                future.set_exception(error)
+
+    def close(self):
+        """Sends queued texts, stops batching and closes connections"""
+        self.closed.set()
+        if self.batcher is not None:
+            self.batcher.join()
+        self.senders.shutdown(wait=True)
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class AsyncClient(object):
+    """
+    Asyncio interface of Client: concurrent coroutines analysing single texts are batched together without a thread
+    per call, batches are sent by client threads.
+    """
+
+    def __init__(self, **kwargs):
+        """
+        Args:
+            **kwargs: (dict) Client parameters
+        """
+        self.client = Client(**kwargs)
+
+    async def analyse(self, text):
+        """
+        Args:
+            text: (str) bank news
+
+        Returns:
+            result: (dict) analysis result (see DataExtractor.analyse)
+        """
+        return await asyncio.wrap_future(self.client.submit(text))
+
+    async def analyse_batch(self, texts):
+        """
+        Args:
+            texts: (list) bank news
+
+        Returns:
+            results: (list) analysis results in order of texts
+        """
+        return await asyncio.get_event_loop().run_in_executor(None, self.client.analyse_batch, texts)
+
+    async def close(self):
+        """Sends queued texts and closes client"""
+        await asyncio.get_event_loop().run_in_executor(None, self.client.close)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
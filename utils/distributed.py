@@ -0,0 +1,142 @@
+"""Distributed batch processing of bank news corpus through shared work queue"""
+import argparse
+import os
+import socket
+import time
+import warnings
+
+import pandas as pd
+
+from model.manifest import Manifest
+from model.work_queue import WorkQueue
+
+warnings.filterwarnings('ignore')
+
+
+def enqueue(queue, documents, chunk_size=100):
+    """
+    Splits corpus into chunks of the work queue
+
+    Args:
+        queue: (WorkQueue) shared work queue
+        documents: (iterable) of (url, text) tuples
+        chunk_size: (int) number of documents in chunk
+
+    Returns:
+        added: (int) number of added chunks
+    """
+    return queue.add_chunks(((Manifest.document_key(text, url), text) for url, text in documents), chunk_size)
+
+
+def run_worker(queue, data_extractor, worker=None, idle_exit=True, poll_interval=5.0):
+    """
+    Leases chunks, analyses their documents and commits results until the queue is finished. Lease is renewed
+    between documents when half of it is spent, chunk is abandoned if the lease can't be renewed anymore, failed
+    chunks are given back for retry.
+
+    Args:
+        queue: (WorkQueue) shared work queue
+        data_extractor: (DataExtractor) extractor for analysing documents
+        worker: (str) worker name, host name and process id by default
+        idle_exit: (bool) stop when there is nothing to lease and no chunk is being processed by others, wait for
+        more chunks otherwise
+        poll_interval: (float) seconds between attempts to lease when nothing is available
+
+    Returns:
+        stats: (dict) with keys [chunks, documents, lost, failed, seconds], lost counts chunks whose lease expired
+        before they were finished or which were committed by another worker after lease of this one expired
+    """
+    worker = worker or f'{socket.gethostname()}:{os.getpid()}'
+    stats = {'chunks': 0, 'documents': 0, 'lost': 0, 'failed': 0}
+    start = time.time()
+    while True:
+        lease = queue.lease(worker)
+        if lease is None:
+            if idle_exit and queue.finished():
+                break
+            time.sleep(poll_interval)
+            continue
+
+        renewed = time.time()
+        results = {}
+        held = True
+        try:
+            for key, text in lease['documents']:
+                results[key] = data_extractor.analyse(text)[0]
+                if time.time() - renewed > queue.lease_seconds / 2:
+                    # lease expired and chunk may be processed by another worker already, its results are dropped
+                    held = queue.renew(lease)
+                    if not held:
+                        break
+                    renewed = time.time()
+        except Exception as error:
+            queue.release(lease, f'{type(error).__name__}: {error}')
+            stats['failed'] += 1
+            continue
+
+        if not held:
+            stats['lost'] += 1
+            continue
+
+        if queue.commit(lease, results, worker):
+            stats['chunks'] += 1
+            stats['documents'] += len(results)
+        else:
+            stats['lost'] += 1
+
+    stats['seconds'] = time.time() - start
+    return stats
+
+
+def export_results(queue, filename):
+    """
+    Writes all committed results into csv file
+
+    Args:
+        queue: (WorkQueue) shared work queue
+        filename: (str) output csv file name
+
+    """
+    rows = [{'key': key, 'Bank_Rate': result.get('Bank_Rate', ''), 'QE': result.get('QE', '')}
+            for key, result in queue.results()]
+    pd.DataFrame(rows, columns=['key', 'Bank_Rate', 'QE']).to_csv(filename, index=False)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('command', choices=['enqueue', 'work', 'progress', 'export'],
+                        help="enqueue - split corpus into chunks, work - run worker, progress - show progress, "
+                             "export - write results into csv")
+    parser.add_argument('corpus', nargs='?', default=None,
+                        help="corpus csv or json file or corpus store directory (enqueue) or output csv (export)")
+    parser.add_argument('--queue', default='queue.sqlite', help="shared work queue database file name")
+    parser.add_argument('--chunk_size', default=100, type=int, help="number of documents in chunk")
+    parser.add_argument('--text_column', default='content', help="csv column containing news text")
+    parser.add_argument('--url_column', default='url', help="csv column containing news url")
+    parser.add_argument('--context_file', default=None, help="context json file name")
+    parser.add_argument('--worker', default=None, help="worker name, host name and process id by default")
+    parser.add_argument('--lease_seconds', default=300.0, type=float, help="seconds after which lease expires")
+    parser.add_argument('--max_attempts', default=3, type=int, help="maximum number of leases of one chunk")
+    parser.add_argument('--wait', action="store_true", help="worker waits for new chunks instead of exiting")
+    args = parser.parse_args()
+
+    queue = WorkQueue(args.queue, args.lease_seconds, args.max_attempts)
+    if args.command == 'enqueue':
+        from utils.process_corpus import read_corpus
+        added = enqueue(queue, read_corpus(args.corpus, args.text_column, args.url_column), args.chunk_size)
+        print(f'added {added} chunks')
+    elif args.command == 'work':
+        from model.data_extraction import DataExtractor
+        stats = run_worker(queue, DataExtractor(context_file=args.context_file), args.worker, not args.wait)
+        print(f'committed {stats["chunks"]} chunks ({stats["documents"]} documents), lost {stats["lost"]}, '
+              f'failed {stats["failed"]} in {stats["seconds"]:.2f} seconds')
+    elif args.command == 'progress':
+        progress = queue.progress()
+        print(f'{progress["done_documents"]} of {progress["documents"]} documents done, chunks: '
+              f'{progress["pending"]} pending, {progress["leased"]} leased, {progress["done"]} done, '
+              f'{progress["failed"]} failed')
+        for worker, documents in sorted(progress['workers'].items()):
+            print(f'{worker}: {documents} documents')
+    else:
+        export_results(queue, args.corpus or 'results.csv')
+    queue.close()
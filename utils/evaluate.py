@@ -0,0 +1,232 @@
+"""Speed versus accuracy evaluation of DataExtractor configurations"""
+import argparse
+import itertools
+import json
+import math
+import resource
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import pandas as pd
+
+warnings.filterwarnings('ignore')
+
+# dataset name: (file name, text column, target names as keys and label columns as values)
+DATASETS = {'boe_statements': ('test_data/boe_statements_test.csv', 'statement', {'Bank_Rate': 'rate', 'QE': 'qe'}),
+            'qe_sentences': ('data/qe_sent_samples.csv', 'text', {'QE': 'label'})}
+
+
+def normalize_value(value):
+    """
+    Normalizes extracted or labeled value for exact match comparison: '£435', '435' and 435.0 are equal,
+    missing values are empty strings.
+
+    Args:
+        value: (str or float) value
+
+    Returns:
+        value: (str) normalized value
+    """
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ''
+    value = str(value).strip().replace('£', '').replace('%', '').replace(',', '').strip()
+    try:
+        return repr(float(value))
+    except ValueError:
+        return value.lower()
+
+
+def read_dataset(name):
+    """
+    Args:
+        name: (str) dataset name (see DATASETS)
+
+    Returns:
+        texts: (list) texts of the dataset
+        labels: (dict) target names as keys and lists of normalized labels as values
+    """
+    filename, text_column, label_columns = DATASETS[name]
+    data = pd.read_csv(filename, index_col=0)
+    texts = [text if isinstance(text, str) else '' for text in data[text_column]]
+    labels = {target: [normalize_value(value) for value in data[column]] for target, column in label_columns.items()}
+    return texts, labels
+
+
+def score(results, labels):
+    """
+    Exact match accuracy of extracted values
+
+    Args:
+        results: (list) analysis results (see DataExtractor.analyse)
+        labels: (dict) target names as keys and lists of normalized labels as values
+
+    Returns:
+        accuracy: (dict) target names as keys and fractions of exactly matched values as values
+    """
+    accuracy = {}
+    for target, target_labels in labels.items():
+        matched = sum(normalize_value(result.get(target, '')) == label for result, label in zip(results, target_labels))
+        accuracy[target] = matched / len(target_labels) if len(target_labels) > 0 else 0.0
+    return accuracy
+
+
+def configurations(models, disables, context_files, relation_models=()):
+    """
+    Builds evaluation matrix: every combination of spacy model, disabled pipeline components and context file,
+    followed by trained relation parsers (see model/relation_parser.py)
+
+    Args:
+        models: (list) spacy model names
+        disables: (list) lists of pipeline component names to disable
+        context_files: (list) context json file names, None for default contexts
+        relation_models: (list) directories of trained relation parsers
+
+    Returns:
+        configurations: (list) of dictionaries with keys [name, model, disable, context_file, relation_model]
+    """
+    matrix = []
+    for model, disable, context_file in itertools.product(models, disables, context_files):
+        name = '/'.join([model, '-'.join(['no_' + component for component in disable]) or 'full',
+                         context_file or 'default'])
+        matrix.append({'name': name, 'model': model, 'disable': list(disable), 'context_file': context_file,
+                       'relation_model': None})
+    for relation_model in relation_models:
+        matrix.append({'name': f'relations:{relation_model}', 'model': relation_model, 'disable': [],
+                       'context_file': None, 'relation_model': relation_model})
+    return matrix
+
+
+def evaluate(configuration, datasets=tuple(DATASETS), repeat=1):
+    """
+    Evaluates one configuration. It should run in a fresh process (see evaluate_matrix), so peak memory belongs to
+    this configuration only.
+
+    Args:
+        configuration: (dict) with keys [name, model, disable, context_file, relation_model]
+        datasets: (tuple) dataset names
+        repeat: (int) number of timed runs over every dataset, the fastest one is reported
+
+    Returns:
+        report: (dict) with keys [name, model, disable, context_file, load_seconds, documents, docs_per_second,
+        peak_memory_mb, accuracy] where accuracy contains accuracy of every target of every dataset
+    """
+    import spacy
+    from model.data_extraction import DataExtractor
+
+    start = time.perf_counter()
+    data_extractor = DataExtractor(spacy_model=spacy.load(configuration['model'], disable=configuration['disable']),
+                                   context_file=configuration['context_file'],
+                                   relation_model=configuration.get('relation_model'))
+    load_seconds = time.perf_counter() - start
+
+    accuracy = {}
+    documents = 0
+    seconds = 0.0
+    for name in datasets:
+        texts, labels = read_dataset(name)
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            results = data_extractor.analyse(texts)
+            timings.append(time.perf_counter() - start)
+        documents += len(texts)
+        seconds += min(timings)
+        accuracy[name] = score(results, labels)
+
+    return dict(configuration,
+                load_seconds=load_seconds,
+                documents=documents,
+                docs_per_second=documents / seconds if seconds > 0 else 0.0,
+                peak_memory_mb=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+                accuracy=accuracy)
+
+
+def evaluate_matrix(matrix, datasets=tuple(DATASETS), repeat=1):
+    """
+    Evaluates every configuration in a fresh process
+
+    Args:
+        matrix: (list) configurations (see configurations)
+        datasets: (tuple) dataset names
+        repeat: (int) number of timed runs over every dataset
+
+    Returns:
+        reports: (list) evaluation reports (see evaluate)
+    """
+    reports = []
+    for configuration in matrix:
+        with ProcessPoolExecutor(1, mp_context=get_context('spawn')) as executor:
+            reports.append(executor.submit(evaluate, configuration, datasets, repeat).result())
+    return reports
+
+
+def fastest_accurate(reports, tolerance=0.0):
+    """
+    Chooses the fastest configuration whose accuracy of every target is not worse than accuracy of the first
+    (baseline) configuration by more than tolerance.
+
+    Args:
+        reports: (list) evaluation reports (see evaluate)
+        tolerance: (float) allowed accuracy loss
+
+    Returns:
+        report: (dict) chosen report
+    """
+    baseline = reports[0]['accuracy']
+
+    def holds(report):
+        return all(report['accuracy'][dataset][target] >= accuracy - tolerance
+                   for dataset, targets in baseline.items() for target, accuracy in targets.items())
+
+    return max([report for report in reports if holds(report)], key=lambda report: report['docs_per_second'])
+
+
+def table(reports):
+    """
+    Returns:
+        table: (DataFrame) one row per configuration with speed, memory and accuracy columns
+    """
+    rows = []
+    for report in reports:
+        row = {'configuration': report['name'],
+               'docs_per_second': round(report['docs_per_second'], 2),
+               'peak_memory_mb': round(report['peak_memory_mb'], 1),
+               'load_seconds': round(report['load_seconds'], 2)}
+        for dataset, targets in report['accuracy'].items():
+            for target, accuracy in targets.items():
+                row[f'{dataset}:{target}'] = round(accuracy, 3)
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--models', default='en', help="comma separated spacy model names")
+    parser.add_argument('--disable', default=[], action='append',
+                        help="comma separated pipeline components to disable, may be repeated for several profiles "
+                             "(full pipeline is always evaluated)")
+    parser.add_argument('--context_files', default='', help="comma separated context json files, default contexts "
+                                                            "if not given")
+    parser.add_argument('--relation_models', default='',
+                        help="comma separated directories of trained relation parsers evaluated against spacy models")
+    parser.add_argument('--datasets', default=','.join(DATASETS), help="comma separated dataset names")
+    parser.add_argument('--repeat', default=3, type=int, help="timed runs over every dataset")
+    parser.add_argument('--tolerance', default=0.0, type=float,
+                        help="accuracy loss allowed when choosing the fastest configuration")
+    parser.add_argument('--output', default=None, help="json file for reports")
+    args = parser.parse_args()
+
+    matrix = configurations(args.models.split(','),
+                            [[]] + [[component for component in profile.split(',') if component]
+                                    for profile in args.disable],
+                            [context_file or None for context_file in args.context_files.split(',')],
+                            [relation_model for relation_model in args.relation_models.split(',') if relation_model])
+    reports = evaluate_matrix(matrix, tuple(args.datasets.split(',')), args.repeat)
+
+    print(table(reports).to_string(index=False))
+    print(f'fastest configuration holding accuracy: {fastest_accurate(reports, args.tolerance)["name"]}')
+    if args.output is not None:
+        with open(args.output, 'w') as file:
+            json.dump(reports, file, indent=2)
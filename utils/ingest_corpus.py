@@ -0,0 +1,33 @@
+"""Converts scraped pages into memory mapped columnar CorpusStore"""
+import argparse
+
+import pandas as pd
+
+from model.corpus_store import CorpusStore, filter_content, scraped_pages
+
+
+def csv_pages(filename):
+    """
+    Reads scraped pages from csv file (e.g. data/bank_of_england_news.csv)
+
+    Args:
+        filename: (str) csv file name
+
+    Returns:
+        pages: (generator) of dictionaries with keys [url, header, content]
+    """
+    for chunk in pd.read_csv(filename, chunksize=1000):
+        for _, row in chunk.iterrows():
+            yield {column: filter_content(row[column]) if isinstance(row.get(column), str) else ''
+                   for column in CorpusStore.columns}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('source', help="scraped pages pickle (e.g. data/nnmb.pkl) or csv file")
+    parser.add_argument('store', help="output corpus store directory")
+    args = parser.parse_args()
+
+    pages = csv_pages(args.source) if args.source.endswith('.csv') else scraped_pages(args.source)
+    store = CorpusStore.write(args.store, pages)
+    print(f'{len(store)} pages written to {args.store}')
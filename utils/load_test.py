@@ -0,0 +1,260 @@
+"""Load test and request replay for the API service"""
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import requests
+
+SIZE_BUCKETS = [(1000, '<1k'), (10000, '1k-10k'), (100000, '10k-100k'), (float('inf'), '>=100k')]
+
+
+def read_texts(filename, text_column='content'):
+    """
+    Reads texts for generated traffic from csv file (e.g. data/bank_of_england_news.csv) or json file containing list
+    of statements (e.g. data/boe-statements.json)
+
+    Args:
+        filename: (str) corpus file name
+        text_column: (str) name of csv column containing news text
+
+    Returns:
+        texts: (list) of news texts
+    """
+    assert os.path.exists(filename), f'{filename} not exists!'
+
+    if filename.endswith('.json'):
+        with open(filename, 'r') as file:
+            return [text for text in json.load(file) if isinstance(text, str)]
+    data = pd.read_csv(filename)
+    return [text for text in data[text_column] if isinstance(text, str)]
+
+
+def build_requests(texts, count, batch_size=1, seed=1):
+    """
+    Builds random traffic from texts: single texts are sent with GET, batches with POST
+
+    Args:
+        texts: (list) of news texts
+        count: (int) number of requests
+        batch_size: (int) number of texts in request
+        seed: (int) random seed
+
+    Returns:
+        requests: (list) of (method, texts) tuples
+    """
+    assert len(texts) > 0, 'no texts for requests!'
+    generator = random.Random(seed)
+    method = 'GET' if batch_size == 1 else 'POST'
+    return [(method, [generator.choice(texts) for _ in range(batch_size)]) for _ in range(count)]
+
+
+def replay_requests(log_file):
+    """
+    Rebuilds requests from API log file (see --log_file of api.py), every logged response is one request.
+    Responses without echoed news (see 'news' query parameter) can't be replayed and are skipped.
+
+    Args:
+        log_file: (str) API log file name
+
+    Returns:
+        requests: (list) of (method, texts) tuples
+    """
+    assert os.path.exists(log_file), f'{log_file} not exists!'
+
+    replayed = []
+    with open(log_file, 'r') as file:
+        for line in file:
+            try:
+                results = json.loads(line)
+            except ValueError:
+                continue
+            if not isinstance(results, list) or len(results) == 0:
+                continue
+            texts = [result.get('news') for result in results if isinstance(result, dict)]
+            if len(texts) == 0 or any(not isinstance(text, str) for text in texts):
+                continue
+            replayed.append(('GET' if len(texts) == 1 else 'POST', texts))
+    return replayed
+
+
+def size_bucket(texts):
+    """
+    Returns:
+        bucket: (str) name of request size bucket by total number of characters
+    """
+    size = sum(len(text) for text in texts)
+    for limit, name in SIZE_BUCKETS:
+        if size < limit:
+            return name
+
+
+class LoadTester(object):
+    """
+    Sends requests to running API service and measures latency of every request. Closed loop runs a fixed number of
+    concurrent clients sending next request as soon as previous one is answered. Open loop sends requests at given
+    arrival rate regardless of answers, latency is measured from scheduled send time, so queueing delay of an
+    overloaded service isn't hidden.
+    """
+
+    def __init__(self, url, query_key='text', timeout=60.0):
+        self.url = url
+        self.query_key = query_key
+        self.timeout = timeout
+        self.local = threading.local()
+
+    def send(self, method, texts):
+        """
+        Sends one request
+
+        Args:
+            method: (str) GET for single text or POST for batch
+            texts: (list) of news texts
+
+        Returns:
+            status: (int) response status code, 0 if request failed
+        """
+        session = getattr(self.local, 'session', None)
+        if session is None:
+            session = self.local.session = requests.Session()
+        try:
+            if method == 'GET':
+                response = session.get(self.url, params={self.query_key: texts[0]}, timeout=self.timeout)
+            else:
+                response = session.post(self.url, data=json.dumps(texts).encode('utf-8'), timeout=self.timeout,
+                                        headers={'Content-Type': 'application/json'})
+            return response.status_code
+        except requests.RequestException:
+            return 0
+
+    def _measure(self, request, scheduled=None):
+        start = scheduled if scheduled is not None else time.perf_counter()
+        status = self.send(*request)
+        return {'bucket': size_bucket(request[1]), 'texts': len(request[1]), 'status': status,
+                'latency': time.perf_counter() - start}
+
+    def run_closed(self, requests_list, concurrency=1):
+        """
+        Sends requests from concurrency clients
+
+        Args:
+            requests_list: (list) of (method, texts) tuples
+            concurrency: (int) number of concurrent clients
+
+        Returns:
+            samples: (list) of dictionaries with keys [bucket, texts, status, latency]
+            seconds: (float) total time
+        """
+        start = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as executor:
+            samples = list(executor.map(self._measure, requests_list))
+        return samples, time.perf_counter() - start
+
+    def run_open(self, requests_list, rate, max_workers=64, poisson=True, seed=1):
+        """
+        Sends requests at given arrival rate
+
+        Args:
+            requests_list: (list) of (method, texts) tuples
+            rate: (float) requests per second
+            max_workers: (int) maximum number of outstanding requests
+            poisson: (bool) exponentially distributed inter-arrival times, fixed intervals otherwise
+            seed: (int) random seed of arrivals
+
+        Returns:
+            samples: (list) of dictionaries with keys [bucket, texts, status, latency]
+            seconds: (float) total time
+        """
+        generator = random.Random(seed)
+        start = time.perf_counter()
+        scheduled = start
+        futures = []
+        with ThreadPoolExecutor(max_workers) as executor:
+            for request in requests_list:
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                futures.append(executor.submit(self._measure, request, scheduled))
+                scheduled += generator.expovariate(rate) if poisson else 1.0 / rate
+            samples = [future.result() for future in futures]
+        return samples, time.perf_counter() - start
+
+
+def summarize(samples, seconds):
+    """
+    Summarizes measured requests: throughput and latency percentiles overall and per request size bucket.
+
+    Args:
+        samples: (list) of dictionaries with keys [bucket, texts, status, latency]
+        seconds: (float) total time
+
+    Returns:
+        report: (dict) with keys [requests, errors, statuses, seconds, requests_per_second, texts_per_second,
+        latency, buckets], latencies are in milliseconds
+    """
+    def latency(group):
+        values = np.array([sample['latency'] for sample in group]) * 1000
+        if len(values) == 0:
+            return {}
+        return {'count': len(values),
+                'mean': float(values.mean()),
+                'p50': float(np.percentile(values, 50)),
+                'p95': float(np.percentile(values, 95)),
+                'p99': float(np.percentile(values, 99)),
+                'max': float(values.max())}
+
+    statuses = {}
+    for sample in samples:
+        statuses[str(sample['status'])] = statuses.get(str(sample['status']), 0) + 1
+
+    ok = [sample for sample in samples if sample['status'] == 200]
+    buckets = {name: latency([sample for sample in ok if sample['bucket'] == name])
+               for _, name in SIZE_BUCKETS}
+    return {'requests': len(samples),
+            'errors': len(samples) - len(ok),
+            'statuses': statuses,
+            'seconds': seconds,
+            'requests_per_second': len(ok) / seconds if seconds > 0 else 0.0,
+            'texts_per_second': sum(sample['texts'] for sample in ok) / seconds if seconds > 0 else 0.0,
+            'latency': latency(ok),
+            'buckets': {name: value for name, value in buckets.items() if len(value) > 0}}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('source', help="csv or json corpus file for generated traffic, or API log file with --replay")
+    parser.add_argument('--url', default='http://localhost:5000/', help="API service url")
+    parser.add_argument('--replay', action="store_true", help="replay requests logged by API (see --log_file)")
+    parser.add_argument('--text_column', default='content', help="name of csv column containing news text")
+    parser.add_argument('--query_key', default='text', help="query key name for GET requests")
+    parser.add_argument('--requests', default=200, type=int, help="number of generated requests")
+    parser.add_argument('--batch_size', default=1, type=int, help="texts per request, 1 - GET, more - POST")
+    parser.add_argument('--concurrency', default=4, type=int, help="number of concurrent clients (closed loop)")
+    parser.add_argument('--rate', default=0, type=float,
+                        help="arrival rate in requests per second (open loop, 0 - closed loop)")
+    parser.add_argument('--fixed_intervals', action="store_true", help="open loop arrivals at fixed intervals")
+    parser.add_argument('--timeout', default=60.0, type=float, help="request timeout in seconds")
+    parser.add_argument('--seed', default=1, type=int, help="random seed")
+    parser.add_argument('--output', default=None, help="json file for report")
+    args = parser.parse_args()
+
+    if args.replay:
+        traffic = replay_requests(args.source)
+    else:
+        traffic = build_requests(read_texts(args.source, args.text_column), args.requests, args.batch_size, args.seed)
+
+    tester = LoadTester(args.url, args.query_key, args.timeout)
+    if args.rate > 0:
+        report = summarize(*tester.run_open(traffic, args.rate, poisson=not args.fixed_intervals, seed=args.seed))
+    else:
+        report = summarize(*tester.run_closed(traffic, args.concurrency))
+
+    print(json.dumps(report, indent=2))
+    if args.output is not None:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
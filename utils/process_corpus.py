@@ -0,0 +1,242 @@
+"""Incremental bulk processing of bank news corpus"""
+import argparse
+import json
+import os
+import time
+import warnings
+
+import pandas as pd
+
+from model.corpus_store import CorpusStore
+from model.data_extraction import DataExtractor
+from model.dedup import NearDuplicateIndex
+from model.helpers import content_hash
+from model.manifest import Manifest
+from model.memory import MemoryAccounting, MemoryBudget
+
+warnings.filterwarnings('ignore')
+
+
+def read_corpus(filename, text_column='content', url_column='url'):
+    """
+    Reads corpus of bank news from csv file (e.g. data/bank_of_england_news.csv), json file containing list of
+    statements (e.g. data/boe-statements.json) or CorpusStore directory (see utils.ingest_corpus), which is read
+    lazily in chunks.
+
+    Args:
+        filename: (str) corpus file name
+        text_column: (str) name of csv column containing news text
+        url_column: (str) name of csv column containing news url
+
+    Returns:
+        documents: (generator) of (url, text) tuples, url is None if unknown
+    """
+    assert os.path.exists(filename), f'{filename} not exists!'
+
+    if os.path.isdir(filename):
+        yield from CorpusStore(filename).documents(text_column)
+    elif filename.endswith('.json'):
+        with open(filename, 'r') as file:
+            data = json.load(file)
+        for text in data:
+            yield None, text
+    else:
+        data = pd.read_csv(filename)
+        urls = data[url_column] if url_column in data.columns else [None] * len(data)
+        for url, text in zip(urls, data[text_column]):
+            if isinstance(text, str):
+                yield url if isinstance(url, str) else None, text
+
+
+def process_corpus(data_extractor, documents, manifest, batch_size=50, force=False, parse_store=False,
+                   dedup_threshold=None, memory_budget=None):
+    """
+    Analyses only new, changed or stale documents of the corpus and stores results in manifest.
+    If only contexts changed since document was processed, only targets affected by added, removed or modified
+    context cases are re-evaluated (see DataExtractor.is_affected).
+
+    Args:
+        data_extractor: (DataExtractor) extractor for analysing documents
+        documents: (iterable) of (url, text) tuples
+        manifest: (Manifest) manifest of already processed documents
+        batch_size: (int) number of documents analysed and committed to manifest at once
+        force: (bool) reprocess all documents regardless of manifest
+        parse_store: (bool) keep parsed documents in manifest and reuse them instead of parsing again
+        dedup_threshold: (float) if given, new documents which are near-duplicates (see NearDuplicateIndex) of already
+        analysed ones get results of their cluster representative without analysis
+        memory_budget: (MemoryBudget) if given and process memory is over it, batch is processed before it's full and
+        results analysed so far are written to manifest before batch is finished (see MemoryBudget.flushed)
+
+    Returns:
+        stats: (dict) with keys [total, processed, reevaluated, skipped, duplicates, flushes, seconds] and clusters
+        (see NearDuplicateIndex.stats) if deduplication is enabled, flushes counts early writes forced by memory budget
+    """
+    start = time.time()
+    fingerprints = {'contexts': data_extractor.contexts_fingerprint(),
+                    'model': data_extractor.model_fingerprint(),
+                    'cases': data_extractor.case_fingerprints()}
+    stats = {'total': 0, 'processed': 0, 'reevaluated': 0, 'skipped': 0, 'duplicates': 0, 'flushes': 0}
+    dedup = None
+    if dedup_threshold is not None:
+        dedup = {'index': NearDuplicateIndex(threshold=dedup_threshold), 'results': {}}
+
+    batch = []
+    for url, text in documents:
+        stats['total'] += 1
+        key = manifest.document_key(text, url)
+        text_hash = content_hash(text)
+
+        record = None if force else manifest.get(key)
+        targets = None
+        if record is not None and record['content_hash'] == text_hash and \
+                record['model_fingerprint'] == fingerprints['model']:
+            if record['contexts_fingerprint'] == fingerprints['contexts']:
+                stats['skipped'] += 1
+                continue
+            traces = record['trace'] or {}
+            targets = [target for target, cases in fingerprints['cases'].items()
+                       if data_extractor.is_affected(traces.get(target), cases)]
+        else:
+            record = None
+
+        batch.append({'key': key, 'content_hash': text_hash, 'text': text, 'record': record, 'targets': targets})
+        over_budget = memory_budget is not None and memory_budget.exceeded()
+        if len(batch) >= batch_size or over_budget:
+            stats['flushes'] += int(over_budget and len(batch) < batch_size)
+            _process_batch(data_extractor, batch, manifest, fingerprints, parse_store, stats, dedup, memory_budget)
+            batch = []
+            if over_budget:
+                memory_budget.flushed()
+
+    if len(batch) > 0:
+        _process_batch(data_extractor, batch, manifest, fingerprints, parse_store, stats, dedup, memory_budget)
+
+    if dedup is not None:
+        stats['clusters'] = dedup['index'].stats()
+    stats['seconds'] = time.time() - start
+    return stats
+
+
+def _process_batch(data_extractor, batch, manifest, fingerprints, parse_store, stats, dedup=None, memory_budget=None):
+    to_analyse = [item for item in batch if item['targets'] is None or len(item['targets']) > 0]
+    for item in to_analyse:
+        item['news'] = data_extractor.filter(item['text'])
+        item['doc'] = None
+        item['representative'] = item['key']
+        if dedup is not None and item['record'] is None:
+            item['representative'] = dedup['index'].add(item['key'], item['news'])
+
+    to_analyse = [item for item in to_analyse if item['representative'] == item['key']]
+    for item in to_analyse:
+        if parse_store:
+            parse = manifest.get_parse(item['content_hash'], fingerprints['model'])
+            if parse is not None:
+                item['doc'] = data_extractor.doc_from_bytes(*parse)
+
+    # documents are parsed lazily in batch order and released right after analysis
+    to_parse = [item for item in to_analyse if item['doc'] is None]
+    docs = data_extractor.spacy.pipe([item['news'] for item in to_parse])
+    for item in to_parse:
+        item['parse'] = True
+
+    records = []
+    for item in batch:
+        if item['record'] is not None:
+            result = dict(item['record']['result'])
+            trace = dict(item['record']['trace'] or {})
+        else:
+            result, trace = {}, {}
+
+        if item.get('representative', item['key']) != item['key']:
+            result, trace = dedup['results'][item['representative']]
+            result = dict(result, news=item['news'])
+            stats['duplicates'] += 1
+        elif item['targets'] is None or len(item['targets']) > 0:
+            if item.get('parse', False):
+                item['doc'] = next(docs)
+                if parse_store:
+                    manifest.put_parse(item['content_hash'], fingerprints['model'],
+                                       *data_extractor.doc_to_bytes(item['doc']))
+            traces = {}
+            result.update(data_extractor.analyse_news(item['news'], item['doc'], traces, item['targets']))
+            item['doc'] = None
+            trace.update(traces)
+            stats['processed' if item['record'] is None else 'reevaluated'] += 1
+            if dedup is not None and item['record'] is None:
+                dedup['results'][item['key']] = (dict(result, news=''), trace)
+        else:
+            stats['skipped'] += 1
+
+        records.append({'key': item['key'],
+                        'content_hash': item['content_hash'],
+                        'contexts_fingerprint': fingerprints['contexts'],
+                        'model_fingerprint': fingerprints['model'],
+                        'result': result,
+                        'trace': trace})
+        if memory_budget is not None and len(records) > 0 and memory_budget.exceeded():
+            manifest.put(records)
+            records = []
+            stats['flushes'] += 1
+            memory_budget.flushed()
+    manifest.put(records)
+
+
+def export_results(manifest, filename):
+    """
+    Writes all results stored in manifest into csv file
+
+    Args:
+        manifest: (Manifest) manifest of processed documents
+        filename: (str) output csv file name
+
+    """
+    rows = []
+    for record in manifest.records():
+        result = record['result']
+        rows.append({'key': record['key'],
+                     'Bank_Rate': result.get('Bank_Rate', ''),
+                     'QE': result.get('QE', '')})
+    pd.DataFrame(rows, columns=['key', 'Bank_Rate', 'QE']).to_csv(filename, index=False)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('corpus', help="corpus csv or json file or corpus store directory")
+    parser.add_argument('--manifest', default='manifest.sqlite', help="manifest database file name")
+    parser.add_argument('--context_file', default=None, help="context json file name")
+    parser.add_argument('--text_column', default='content', help="csv column containing news text")
+    parser.add_argument('--url_column', default='url', help="csv column containing news url")
+    parser.add_argument('--batch_size', default=50, type=int, help="number of documents analysed at once")
+    parser.add_argument('--force', action="store_true", help="reprocess all documents")
+    parser.add_argument('--parse_store', action="store_true", help="store parsed documents for re-evaluation")
+    parser.add_argument('--dedup_threshold', default=None, type=float,
+                        help="analyse only one of near-duplicate documents with given similarity (e.g. 0.9)")
+    parser.add_argument('--memory_budget', default=0, type=float,
+                        help="process memory in MB over which batches are flushed early (0 - unlimited)")
+    parser.add_argument('--memory_accounting', action="store_true",
+                        help="trace memory allocated by extraction stages (slow, for diagnostics)")
+    parser.add_argument('--output', default=None, help="csv file to export all results")
+    args = parser.parse_args()
+
+    data_extractor = DataExtractor(context_file=args.context_file)
+    manifest = Manifest(args.manifest)
+    if args.memory_accounting:
+        data_extractor.memory = MemoryAccounting()
+        data_extractor.memory.start()
+    memory_budget = MemoryBudget(int(args.memory_budget * 2 ** 20)) if args.memory_budget > 0 else None
+
+    stats = process_corpus(data_extractor, read_corpus(args.corpus, args.text_column, args.url_column), manifest,
+                           args.batch_size, args.force, args.parse_store, args.dedup_threshold, memory_budget)
+    print(f'processed {stats["processed"]} of {stats["total"]} documents, re-evaluated {stats["reevaluated"]}, '
+          f'skipped {stats["skipped"]}, copied {stats["duplicates"]} duplicates in {stats["seconds"]:.2f} seconds')
+    if 'clusters' in stats:
+        print(f'clusters: {stats["clusters"]}')
+    if stats['flushes'] > 0:
+        print(f'flushed {stats["flushes"]} times over memory budget')
+    if data_extractor.memory is not None:
+        print(f'memory: {json.dumps(data_extractor.memory.report())}')
+        data_extractor.memory.stop()
+
+    if args.output is not None:
+        export_results(manifest, args.output)
+    manifest.close()
@@ -0,0 +1,167 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+# innermost matching frame decides stage of a sample: (file name, function name) -> stage
+STAGES = {('data_extraction.py', 'filter'): 'filter',
+          ('normalizer.py', 'normalize'): 'filter',
+          ('language.py', '__call__'): 'parse',
+          ('language.py', 'pipe'): 'parse',
+          ('tree.py', 'from_spacy_tree'): 'tree_build',
+          ('data_extraction.py', 'context_search'): 'context_match',
+          ('tree.py', 'deepcopy'): 'context_copy',
+          ('serialization.py', 'dumps'): 'serialize',
+          ('serialization.py', 'compress'): 'serialize'}
+
+
+class SamplingProfiler(object):
+    """
+    Statistical profiler of a running process: a background thread samples stacks of other threads every interval
+    seconds and counts them in collapsed stack format (root first, frames separated by ';'), which is accepted by
+    flame graph tools. Stacks are prefixed with the extraction stage they belong to (parse, tree_build,
+    context_match,...), so stage totals are visible at the root of the flame graph.
+
+    Nothing is sampled until start is called, so the profiler has no overhead while it's idle.
+    """
+
+    def __init__(self, interval=0.005, roots=None):
+        """
+        Args:
+            interval: (float) sampling interval in seconds
+            roots: (list) functions, only stacks going through one of them are recorded (e.g. request handlers),
+            all stacks if not given
+        """
+        self.interval = interval
+        self.roots = {root.__code__ for root in roots} if roots is not None else None
+        self.condition = threading.Condition()
+        self.active = False
+        self.requests_left = None
+        self.thread = None
+        self.stacks = Counter()
+        self.samples = 0
+
+    def start(self, requests=None):
+        """
+        Starts sampling
+
+        Args:
+            requests: (int) if given, sampling stops after that many calls of request_finished
+
+        Returns:
+            result: (bool) sampling was started, False if it's already running
+        """
+        with self.condition:
+            if self.active:
+                return False
+            self.active = True
+            self.requests_left = requests
+            self.stacks = Counter()
+            self.samples = 0
+
+        self.thread = threading.Thread(target=self._sample, name='sampling-profiler', daemon=True)
+        self.thread.start()
+        return True
+
+    def stop(self):
+        """Stops sampling"""
+        with self.condition:
+            self.active = False
+            self.condition.notify_all()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
+            self.thread = None
+
+    def request_finished(self):
+        """Counts finished request while profiling given number of requests"""
+        if not self.active:
+            return
+        with self.condition:
+            if self.requests_left is not None:
+                self.requests_left -= 1
+                if self.requests_left <= 0:
+                    self.active = False
+                    self.condition.notify_all()
+
+    def wait(self, timeout):
+        """
+        Waits until sampling is stopped by request_finished or timeout elapses, then stops sampling
+
+        Args:
+            timeout: (float) maximum seconds to wait
+
+        """
+        end = time.monotonic() + timeout
+        with self.condition:
+            while self.active:
+                remaining = end - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.condition.wait(remaining)
+        self.stop()
+
+    def profile(self, seconds, requests=None):
+        """
+        Profiles for given seconds or until given number of requests is finished, whichever comes first
+
+        Args:
+            seconds: (float) maximum profiling time
+            requests: (int) number of requests to profile, not limited if not given
+
+        Returns:
+            result: (bool) profiling was done, False if another profiling is running
+        """
+        if not self.start(requests):
+            return False
+        self.wait(seconds)
+        return True
+
+    def collapsed(self):
+        """
+        Returns:
+            result: (str) profile in collapsed stack format, one 'frame;frame;... count' line per stack
+        """
+        return '\n'.join(f'{stack} {count}' for stack, count in sorted(self.stacks.items()))
+
+    def stage_totals(self):
+        """
+        Returns:
+            result: (dict) stage names as keys and fractions of recorded samples as values
+        """
+        totals = Counter()
+        for stack, count in self.stacks.items():
+            totals[stack.split(';', 1)[0][len('stage:'):]] += count
+        recorded = sum(totals.values())
+        return {stage: count / recorded for stage, count in totals.most_common()} if recorded > 0 else {}
+
+    def _sample(self):
+        own = threading.get_ident()
+        while self.active:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = self._collapse(frame)
+                if stack is not None:
+                    self.stacks[stack] += 1
+            self.samples += 1
+            time.sleep(self.interval)
+
+    def _collapse(self, frame):
+        frames = []
+        stage = None
+        rooted = self.roots is None
+        while frame is not None:
+            code = frame.f_code
+            file_name = os.path.basename(code.co_filename)
+            if stage is None:
+                stage = STAGES.get((file_name, code.co_name))
+            if not rooted and code in self.roots:
+                rooted = True
+            frames.append(f'{file_name}:{code.co_name}')
+            frame = frame.f_back
+
+        if not rooted:
+            return None
+        frames.append(f'stage:{stage or "other"}')
+        return ';'.join(reversed(frames))
@@ -0,0 +1,30 @@
+"""Builds and queries history of extracted Bank Rate and QE values"""
+import argparse
+import json
+
+from model.history import RateHistory
+from model.manifest import Manifest
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('history', help="rate history database file name")
+    parser.add_argument('--manifest', default=None,
+                        help="import results of corpus processing manifest (see utils.process_corpus)")
+    parser.add_argument('--as_of', default=None, help="print value in force on ISO date")
+    parser.add_argument('--start', default=None, help="print values decided on meetings from ISO date")
+    parser.add_argument('--end', default='9999-12-31', help="print values decided on meetings until ISO date")
+    parser.add_argument('--changes', action="store_true", help="print only changes of the value")
+    parser.add_argument('--target', default='Bank_Rate', choices=['Bank_Rate', 'QE'], help="extracted target")
+    args = parser.parse_args()
+
+    history = RateHistory(args.history)
+    if args.manifest is not None:
+        manifest = Manifest(args.manifest)
+        print(f'stored {history.import_manifest(manifest)} results, {len(history)} in history')
+        manifest.close()
+    if args.as_of is not None:
+        print(json.dumps(history.as_of(args.as_of, args.target), ensure_ascii=False))
+    if args.start is not None:
+        for record in history.range(args.start, args.end, args.target, args.changes):
+            print(json.dumps(record, ensure_ascii=False))
+    history.close()
@@ -0,0 +1,180 @@
+import gzip
+import json
+import zlib
+
+import msgpack
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+JSON = 'application/json'
+MSGPACK = 'application/msgpack'
+MSGPACK_TYPES = (MSGPACK, 'application/x-msgpack')
+READ_SIZE = 2 ** 16
+
+
+class BodyTooLarge(ValueError):
+    """Decompressed request body is larger than allowed"""
+
+
+def content_types():
+    """
+    Returns:
+        types: (list) supported content types in order of preference for equally accepted types
+    """
+    return [JSON, MSGPACK, 'application/x-msgpack']
+
+
+def content_encodings():
+    """
+    Returns:
+        encodings: (list) supported body compressions, zstd only if zstandard package is installed
+    """
+    return (['zstd'] if zstandard is not None else []) + ['gzip']
+
+
+def loads(data, content_type=None):
+    """
+    Deserializes request body
+
+    Args:
+        data: (bytes) request body
+        content_type: (str) mimetype of the body, json if not given
+
+    Returns:
+        value: deserialized object
+    """
+    if content_type in MSGPACK_TYPES:
+        return msgpack.unpackb(data, raw=False)
+    return json.loads(data.decode())
+
+
+def dumps(value, content_type=JSON):
+    """
+    Serializes response body
+
+    Args:
+        value: object to serialize
+        content_type: (str) mimetype of the body
+
+    Returns:
+        data: (bytes) serialized object
+    """
+    if content_type in MSGPACK_TYPES:
+        return msgpack.packb(value, use_bin_type=True)
+    return json.dumps(value, ensure_ascii=False).encode('utf-8')
+
+
+def decompress(data, encoding=None, max_size=0):
+    """
+    Decompresses request body according to its Content-Encoding. Body is decompressed in a streaming way and stopped as
+    soon as it's over max_size, so small compressed bodies can't expand into huge ones in memory.
+
+    Args:
+        data: (bytes) request body
+        encoding: (str) content encoding: gzip, zstd or identity
+        max_size: (int) maximum size of decompressed body in bytes (0 - unlimited)
+
+    Returns:
+        data: (bytes) decompressed body
+    """
+    encoding = (encoding or 'identity').strip().lower()
+    if encoding == 'identity':
+        _check_size(len(data), max_size)
+        return data
+    if encoding in ('gzip', 'x-gzip'):
+        return _gunzip(data, max_size)
+    if encoding == 'zstd' and zstandard is not None:
+        try:
+            # frames written in streaming mode don't contain content size, so size is known only after reading
+            chunks = []
+            size = 0
+            reader = zstandard.ZstdDecompressor().stream_reader(data, read_across_frames=True)
+            for chunk in iter(lambda: reader.read(READ_SIZE), b''):
+                size += len(chunk)
+                _check_size(size, max_size)
+                chunks.append(chunk)
+            return b''.join(chunks)
+        except zstandard.ZstdError as error:
+            raise ValueError(f'invalid zstd body: {error}')
+    raise ValueError(f'unsupported content encoding {encoding}')
+
+
+def _check_size(size, max_size):
+    if 0 < max_size < size:
+        raise BodyTooLarge(f'decompressed body exceeds limit of {max_size} bytes')
+
+
+def _gunzip(data, max_size):
+    chunks = []
+    size = 0
+    # body may consist of several gzip members
+    while len(data) > 0:
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            while not decompressor.eof:
+                # output of one call is limited, so bomb is stopped after at most READ_SIZE extra bytes
+                chunk = decompressor.decompress(data, READ_SIZE)
+                size += len(chunk)
+                _check_size(size, max_size)
+                chunks.append(chunk)
+                if len(decompressor.unconsumed_tail) == 0 and not decompressor.eof and len(chunk) == 0:
+                    raise ValueError('truncated gzip body')
+                data = decompressor.unconsumed_tail if not decompressor.eof else decompressor.unused_data
+        except zlib.error as error:
+            raise ValueError(f'invalid gzip body: {error}')
+    return b''.join(chunks)
+
+
+def compress(data, encoding=None, min_size=1024):
+    """
+    Compresses response body, small bodies are left as they are.
+
+    Args:
+        data: (bytes) response body
+        encoding: (str) chosen content encoding: gzip, zstd or None
+        min_size: (int) bodies shorter than this aren't compressed
+
+    Returns:
+        data: (bytes) response body
+        encoding: (str) applied content encoding or None
+    """
+    if encoding is None or len(data) < min_size:
+        return data, None
+    if encoding == 'gzip':
+        return gzip.compress(data, compresslevel=5), encoding
+    if encoding == 'zstd' and zstandard is not None:
+        return zstandard.ZstdCompressor(level=3).compress(data), encoding
+    return data, None
+
+
+def compact(results, news='full'):
+    """
+    Reduces analysis results for bulk clients: every result gets 'id' - position of its text in the request, and
+    echoed news text is omitted or truncated.
+
+    Args:
+        results: (list) analysis results (see DataExtractor.analyse)
+        news: (str or int) 'full' keeps results as they are, 'none' omits news, number truncates news to that many
+        characters
+
+    Returns:
+        results: (list) reduced results
+    """
+    if news == 'full':
+        return results
+
+    limit = None if news == 'none' else int(news)
+    assert limit is None or limit >= 0, f'news length {limit} should not be negative!'
+
+    compacted = []
+    for position, result in enumerate(results):
+        result = dict(result, id=position)
+        if limit is None:
+            result.pop('news', None)
+        elif 'news' in result:
+            result['news'] = result['news'][:limit]
+        compacted.append(result)
+    return compacted
@@ -0,0 +1,84 @@
+"""Training and benchmark of compact relation parser (see model/relation_parser.py)"""
+import argparse
+import json
+import warnings
+
+import pandas as pd
+
+from utils.evaluate import DATASETS, configurations, evaluate_matrix, table
+
+warnings.filterwarnings('ignore')
+
+# dataset name: (file name, text column, target names as keys and label columns as values)
+TRAINING_DATA = {'samples': ('data/samples.csv', 'text', {'Bank_Rate': 'label'}),
+                 'qe_sentences': ('data/qe_sent_samples.csv', 'text', {'QE': 'label'}),
+                 'boe_statements': ('test_data/boe_statements_test.csv', 'statement',
+                                    {'Bank_Rate': 'rate', 'QE': 'qe'})}
+
+
+def read_training_data(name, data_extractor):
+    """
+    Args:
+        name: (str) dataset name (see TRAINING_DATA)
+        data_extractor: (DataExtractor) extractor whose filter is applied to texts
+
+    Returns:
+        texts: (list) filtered texts of the dataset
+        labels: (dict) target names as keys and lists of labeled values as values
+    """
+    filename, text_column, label_columns = TRAINING_DATA[name]
+    data = pd.read_csv(filename, index_col=0)
+    texts = [data_extractor.filter(text if isinstance(text, str) else '') for text in data[text_column]]
+    labels = {target: ['' if pd.isna(value) else str(value) for value in data[column]]
+              for target, column in label_columns.items()}
+    return texts, labels
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('output_dir', help="directory of trained relation model")
+    parser.add_argument('--datasets', default='samples,qe_sentences',
+                        help="comma separated labeled datasets for training (boe_statements is held out by default, "
+                             "because it's used for benchmark)")
+    parser.add_argument('--weak_corpus', default=None,
+                        help="csv or json corpus labeled by context rules, e.g. data/bank_of_england_news.csv")
+    parser.add_argument('--text_column', default='content', help="csv column of weak corpus containing news text")
+    parser.add_argument('--n_iter', default=20, type=int, help="number of training iterations")
+    parser.add_argument('--dropout', default=0.2, type=float, help="dropout rate")
+    parser.add_argument('--seed', default=0, type=int, help="random seed")
+    parser.add_argument('--benchmark', action="store_true",
+                        help="evaluate trained model against English model with context rules")
+    parser.add_argument('--output', default=None, help="json file for benchmark reports")
+    args = parser.parse_args()
+
+    from model.data_extraction import DataExtractor
+    from model.relation_parser import build_examples, train
+
+    # context rules label targets which datasets don't label
+    rules = DataExtractor()
+    examples = []
+    datasets = [name for name in args.datasets.split(',') if name]
+    for name in datasets:
+        texts, labels = read_training_data(name, rules)
+        examples.extend(build_examples(rules.spacy, texts, labels, rules))
+    if args.weak_corpus is not None:
+        from utils.process_corpus import read_corpus
+        texts = [rules.filter(text) for _, text in read_corpus(args.weak_corpus, args.text_column)]
+        examples.extend(build_examples(rules.spacy, texts, {}, rules))
+    print(f'training on {len(examples)} examples')
+
+    nlp, losses = train(examples, args.n_iter, args.dropout, args.seed)
+    for iteration, loss in enumerate(losses):
+        print(f'iteration {iteration}: loss {loss:.3f}')
+    nlp.to_disk(args.output_dir)
+    print(f'saved relation model to {args.output_dir}')
+
+    if args.benchmark:
+        # datasets used for training are left out of benchmark
+        held_out = tuple(name for name in DATASETS if name not in datasets) or tuple(DATASETS)
+        print(f'benchmark on {", ".join(held_out)}')
+        reports = evaluate_matrix(configurations(['en'], [[]], [None], [args.output_dir]), held_out)
+        print(table(reports).to_string(index=False))
+        if args.output is not None:
+            with open(args.output, 'w') as file:
+                json.dump(reports, file, indent=2)
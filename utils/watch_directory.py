@@ -0,0 +1,296 @@
+"""Continuous extraction of statements dropped into a directory"""
+import argparse
+import fnmatch
+import json
+import os
+import shutil
+import threading
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+
+import numpy as np
+
+warnings.filterwarnings('ignore')
+
+_worker = {}
+
+
+def read_statements(path):
+    """
+    Reads statements of dropped file: text file is one statement, json file is a statement or list of statements
+
+    Args:
+        path: (str) file name
+
+    Returns:
+        texts: (list) of statements
+    """
+    with open(path, 'r', encoding='utf-8') as file:
+        if path.endswith('.json'):
+            data = json.load(file)
+            if isinstance(data, str):
+                return [data]
+            if not isinstance(data, list):
+                raise ValueError(f'{path} must contain a statement or list of statements, not {type(data).__name__}')
+            return [text for text in data if isinstance(text, str)]
+        return [file.read()]
+
+
+def write_atomically(path, data):
+    """
+    Writes json file so that readers never see it partially written
+
+    Args:
+        path: (str) file name
+        data: json serializable object
+
+    """
+    temporary = f'{path}.{os.getpid()}.tmp'
+    with open(temporary, 'w', encoding='utf-8') as file:
+        json.dump(data, file, ensure_ascii=False)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary, path)
+
+
+def _init_worker(context_file):
+    from model.data_extraction import DataExtractor
+    _worker['data_extractor'] = DataExtractor(context_file=context_file)
+
+
+def _analyse_file(path):
+    return _worker['data_extractor'].analyse(read_statements(path))
+
+
+class DirectoryWatcher(object):
+    """
+    Polls directory for new files. File is reported once its size and modification time stopped changing for settle
+    seconds, so files which are still being written aren't picked up. Files moved in with old modification time are
+    reported right away.
+    """
+
+    def __init__(self, directory, patterns=('*.txt', '*.json'), settle=1.0):
+        self.directory = directory
+        self.patterns = patterns
+        self.settle = settle
+        self.candidates = {}
+
+    def poll(self):
+        """
+        Returns:
+            files: (list) of (path, arrival time) tuples of complete files found since last poll, arrival time is
+            when the file was seen first (modification time of moved in file may be much older)
+        """
+        now = time.time()
+        ready = []
+        current = {}
+        for entry in os.scandir(self.directory):
+            if not entry.is_file() or not any(fnmatch.fnmatch(entry.name, pattern) for pattern in self.patterns):
+                continue
+            stat = entry.stat()
+            state = (stat.st_size, stat.st_mtime)
+            previous = self.candidates.get(entry.path)
+            since = previous[1] if previous is not None and previous[0] == state else now
+            arrival = previous[2] if previous is not None else now
+            current[entry.path] = (state, since, arrival)
+            if now - since >= self.settle or now - stat.st_mtime >= self.settle:
+                ready.append((arrival, stat.st_mtime, entry.path))
+        self.candidates = current
+        # files seen at the same poll are taken in order of modification
+        return [(path, arrival) for arrival, _, path in sorted(ready)]
+
+
+class IngestionDaemon(object):
+    """
+    Long running ingestion: watches directory, analyses new files with warm extractors in a worker pool, writes
+    results atomically into output directory as '<file name>.result.json' and moves processed files aside
+    (failed ones separately). Latency from file arrival to written result is reported for every file.
+
+    If a worker process dies, the pool is replaced and files analysed by it are submitted once more one at a time, so
+    only the file which kills a worker again is failed. Files whose result or move couldn't be written are reported
+    with 'error' status and left in the watched directory, they aren't picked up again until the daemon is restarted.
+    """
+
+    def __init__(self, directory, output_dir, processed_dir, failed_dir, context_file=None, processes=0,
+                 interval=1.0, settle=1.0, data_extractor=None):
+        """
+        Args:
+            directory: (str) watched directory
+            output_dir: (str) directory for results
+            processed_dir: (str) directory for processed files
+            failed_dir: (str) directory for files which couldn't be analysed
+            context_file: (str) context json file name
+            processes: (int) number of worker processes, files are analysed in a single thread if 0
+            interval: (float) polling interval in seconds
+            settle: (float) seconds file has to stay unchanged before it's analysed
+            data_extractor: (DataExtractor) extractor used when processes is 0, created if not given
+        """
+        for path in (output_dir, processed_dir, failed_dir):
+            os.makedirs(path, exist_ok=True)
+        self.output_dir = output_dir
+        self.processed_dir = processed_dir
+        self.failed_dir = failed_dir
+        self.interval = interval
+        self.watcher = DirectoryWatcher(directory, settle=settle)
+        self.in_flight = {}
+        self.latencies = []
+        self.counters = {'processed': 0, 'failed': 0, 'errors': 0, 'restarts': 0}
+        self.skipped = set()
+        self.retries = []
+        self.stopped = threading.Event()
+        self.processes = processes
+        self.context_file = context_file
+
+        if processes == 0:
+            if data_extractor is None:
+                _init_worker(context_file)
+            else:
+                _worker['data_extractor'] = data_extractor
+        self.executor = self._start_executor()
+
+    def _start_executor(self):
+        if self.processes > 0:
+            # fork keeps model loading in workers only, each worker keeps its extractor warm
+            return ProcessPoolExecutor(self.processes, mp_context=get_context('fork'), initializer=_init_worker,
+                                       initargs=(self.context_file,))
+        return ThreadPoolExecutor(1)
+
+    def _submit(self, path, arrival, attempt=0):
+        try:
+            future = self.executor.submit(_analyse_file, path)
+        except BrokenProcessPool:
+            self._restart_executor()
+            future = self.executor.submit(_analyse_file, path)
+        self.in_flight[path] = (arrival, future, attempt, self.executor)
+
+    def _restart_executor(self):
+        broken = self.executor
+        self.executor = self._start_executor()
+        broken.shutdown(wait=False)
+        self.counters['restarts'] += 1
+
+    def poll_once(self):
+        """
+        Finishes analysed files and submits newly arrived ones
+
+        Returns:
+            finished: (list) of dictionaries with keys [file, status, latency] of files finished in this call, and
+            error if status is 'failed' or 'error'
+        """
+        finished = []
+        for path, (arrival, future, attempt, executor) in list(self.in_flight.items()):
+            if not future.done():
+                continue
+            del self.in_flight[path]
+            if isinstance(future.exception(), BrokenProcessPool) and attempt == 0:
+                # file may have been analysed next to the one which killed the worker
+                if executor is self.executor:
+                    self._restart_executor()
+                self.retries.append((path, arrival))
+                continue
+            try:
+                finished.append(self._finish(path, arrival, future))
+            except Exception as error:
+                self.skipped.add(path)
+                self.counters['errors'] += 1
+                finished.append({'file': os.path.basename(path), 'status': 'error',
+                                 'error': f'{type(error).__name__}: {error}', 'latency': time.time() - arrival})
+
+        if len(self.retries) > 0:
+            # files of a dead pool are retried one at a time, so only the file which kills worker again is failed,
+            # new files wait until they are done
+            if len(self.in_flight) == 0:
+                path, arrival = self.retries.pop(0)
+                self._submit(path, arrival, 1)
+        else:
+            for path, arrival in self.watcher.poll():
+                if path not in self.in_flight and path not in self.skipped:
+                    self._submit(path, arrival)
+        return finished
+
+    def _finish(self, path, arrival, future):
+        name = os.path.basename(path)
+        try:
+            results = future.result()
+        except Exception as error:
+            shutil.move(path, os.path.join(self.failed_dir, name))
+            self.counters['failed'] += 1
+            return {'file': name, 'status': 'failed', 'error': f'{type(error).__name__}: {error}',
+                    'latency': time.time() - arrival}
+
+        write_atomically(os.path.join(self.output_dir, f'{name}.result.json'),
+                         {'file': name, 'arrived': arrival, 'finished': time.time(), 'results': results})
+        shutil.move(path, os.path.join(self.processed_dir, name))
+        latency = time.time() - arrival
+        self.latencies.append(latency)
+        self.counters['processed'] += 1
+        return {'file': name, 'status': 'processed', 'latency': latency}
+
+    def run(self, callback=None):
+        """
+        Polls directory until stop is called
+
+        Args:
+            callback: (callable) called with every finished file report (see poll_once)
+
+        """
+        while not self.stopped.is_set():
+            for report in self.poll_once():
+                if callback is not None:
+                    callback(report)
+            idle = len(self.in_flight) == 0 and len(self.retries) == 0
+            self.stopped.wait(self.interval if idle else min(self.interval, 0.1))
+
+    def stop(self):
+        """Stops polling and worker pool"""
+        self.stopped.set()
+        self.executor.shutdown(wait=True)
+
+    def stats(self):
+        """
+        Returns:
+            stats: (dict) with keys [processed, failed, errors, restarts, in_flight] and latency percentiles in seconds
+            [p50, p95, max]
+        """
+        stats = dict(self.counters, in_flight=len(self.in_flight))
+        if len(self.latencies) > 0:
+            stats.update({'p50': float(np.percentile(self.latencies, 50)),
+                          'p95': float(np.percentile(self.latencies, 95)),
+                          'max': float(max(self.latencies))})
+        return stats
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('directory', help="directory where new statements (.txt or .json files) are dropped")
+    parser.add_argument('--output_dir', default=None, help="directory for results, <directory>/results by default")
+    parser.add_argument('--processed_dir', default=None,
+                        help="directory for processed files, <directory>/processed by default")
+    parser.add_argument('--failed_dir', default=None, help="directory for failed files, <directory>/failed by default")
+    parser.add_argument('--context_file', default=None, help="context json file name")
+    parser.add_argument('--processes', default=0, type=int, help="number of worker processes (0 - single thread)")
+    parser.add_argument('--interval', default=1.0, type=float, help="polling interval in seconds")
+    parser.add_argument('--settle', default=1.0, type=float,
+                        help="seconds file has to stay unchanged before it's analysed")
+    args = parser.parse_args()
+
+    daemon = IngestionDaemon(args.directory,
+                             args.output_dir or os.path.join(args.directory, 'results'),
+                             args.processed_dir or os.path.join(args.directory, 'processed'),
+                             args.failed_dir or os.path.join(args.directory, 'failed'),
+                             args.context_file, args.processes, args.interval, args.settle)
+
+    def report(finished):
+        print(f'{finished["file"]}: {finished["status"]} in {finished["latency"]:.2f} seconds '
+              f'{finished.get("error", "")}'.rstrip(), flush=True)
+
+    try:
+        daemon.run(report)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        daemon.stop()
+        print(f'stats: {daemon.stats()}')